@@ -15,6 +15,7 @@ Structure:
       - dataroom.py
       - folder.py
       - file.py
+      - upload_session.py
 """
 
 from fastapi import APIRouter
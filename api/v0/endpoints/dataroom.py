@@ -4,26 +4,60 @@ from sqlalchemy.orm import Session
 from fastapi import (
     APIRouter,
     HTTPException,
-    Depends
+    Depends,
+    Response,
 )
 
 from database import get_db
 from models import DataRoom, User
 from dependencies import get_current_user
 from api.v0.schemas import dataroom
+from api.v0.schemas.folder import FolderResponse
+from hierarchy import load_dataroom_tree
+from storage import (
+    collect_archive_entries,
+    zip_response,
+)
+from bandwidth import (
+    throttle,
+    user_limit,
+)
+from pagination import (
+    Page,
+    paginate,
+)
 
 router = APIRouter(prefix="/datarooms")
 
 
+def _tree_response(db: Session, db_dataroom: DataRoom) -> dataroom.DataRoomResponse:
+    """The dataroom with its folder tree, loaded at once, top level folders holding the others"""
+    return dataroom.DataRoomResponse(
+        id=db_dataroom.id,
+        name=db_dataroom.name,
+        description=db_dataroom.description,
+        created_at=db_dataroom.created_at,
+        updated_at=db_dataroom.updated_at,
+        folders=[FolderResponse.model_validate(folder) for folder in load_dataroom_tree(db, db_dataroom)],
+    )
+
+
 @router.get("", response_model=List[dataroom.DataRoomListResponse])
-def list_datarooms(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_datarooms(
+    response: Response,
+    page: Page = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    Get all data rooms for the current authenticated user.
+    Get the data rooms of the current authenticated user, a page at a time.
+
+    The X-Next-Cursor response header holds the cursor of the next page, if any.
 
     Requires: Valid JWT token in Authorization header
     """
-    datarooms = db.query(DataRoom).filter(DataRoom.owner_id == current_user.id).all()
-    return datarooms
+    query = db.query(DataRoom).filter(DataRoom.owner_id == current_user.id)
+    return paginate(query, DataRoom.id, page, response)
 
 
 @router.post("", response_model=dataroom.DataRoomResponse)
@@ -58,6 +92,8 @@ def get_dataroom(
     """
     Get a specific data room with all its folders and files.
 
+    folders only holds the top level folders, the others are nested in their parents.
+
     Requires: Valid JWT token and ownership of the dataroom
     """
     db_dataroom = db.query(DataRoom).filter(DataRoom.id == dataroom_id).first()
@@ -68,7 +104,32 @@ def get_dataroom(
     if db_dataroom.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    return db_dataroom
+    return _tree_response(db, db_dataroom)
+
+
+@router.get("/{dataroom_id}/download")
+def download_dataroom(
+    dataroom_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download a whole data room as a ZIP archive, folders becoming directories.
+
+    The archive is streamed while it is generated, whatever the size of the data room.
+
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    db_dataroom = db.query(DataRoom).filter(DataRoom.id == dataroom_id).first()
+    if not db_dataroom:
+        raise HTTPException(status_code=404, detail="Data room not found")
+
+    # Check ownership
+    if db_dataroom.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    entries = collect_archive_entries(db, db_dataroom)
+    return throttle(zip_response(entries, f"{db_dataroom.name}.zip"), user_limit(current_user))
 
 
 @router.put("/{dataroom_id}", response_model=dataroom.DataRoomResponse)
@@ -102,7 +163,7 @@ def update_dataroom(
 
     db.commit()
     db.refresh(db_dataroom)
-    return db_dataroom
+    return _tree_response(db, db_dataroom)
 
 
 @router.delete("/{dataroom_id}", status_code=204)
@@ -1,18 +1,23 @@
 import os
-from datetime import datetime
+from functools import partial
+from datetime import (
+    datetime,
+    timedelta,
+)
 from typing import (
     List,
     Optional,
 )
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     HTTPException,
     Depends,
     UploadFile,
     File as FastAPIFile,
     Query,
+    Response,
 )
-from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
 from database import get_db
@@ -21,157 +26,264 @@ from models import (
     File as FileModel,
     FileShare,
     DataRoom,
+    PageIndex,
     User
 )
-from dependencies import get_current_user
+from dependencies import (
+    get_current_user,
+    get_owned_file,
+    get_owned_file_share,
+    get_owned_folder,
+)
 from api.v0.schemas import file as file_schemas
-
-# Directory where uploaded files will be stored
-# Files are organized in subdirectories by date (yyyy/mm/dd)
-UPLOAD_DIR = "uploads"
+from settings import (
+    UPLOAD_BATCH_MAX_FILES,
+    SIGNED_SHARE_EXPIRE_HOURS,
+    SIGNED_SHARE_MAX_EXPIRE_DAYS,
+)
+from processing import (
+    ProcessingError,
+    process_file,
+    process_files,
+    extract_file_pages,
+)
+from storage import (
+    store_upload_file,
+    store_upload_files,
+    StoredFileResponse,
+    PageRangeResponse,
+    content_disposition,
+)
+from usage import record_download
+from bandwidth import (
+    throttle,
+    user_limit,
+    share_limit,
+)
+from sharing import (
+    create_signed_share,
+    verify_signed_share,
+    is_revoked,
+    revoke_signed_shares,
+    share_cache,
+    cache_share,
+)
+from pagination import (
+    Page,
+    paginate,
+)
 
 router = APIRouter(prefix="/files")
 
+
+def _download_response(db_file: FileModel) -> StoredFileResponse:
+    """
+    Build the response sending the content of a file.
+
+    The content is looked up in storage while the response is sent,
+    and decompressed on the fly if it is compressed at rest.
+    Clients revalidate on every open (no-cache), which costs a 304 as long as the file is unchanged.
+    The download is counted by the response, once it sends the file.
+    """
+    return StoredFileResponse(
+        key=db_file.file_path,
+        filename=f"{db_file.name}.pdf",
+        media_type="application/pdf",
+        headers={"cache-control": "private, no-cache"},
+        compression=db_file.blob.compression if db_file.blob else None,
+        size=db_file.file_size,
+        etag=db_file.checksum,
+        last_modified=db_file.updated_at,
+        on_download=partial(record_download, db_file.id)
+    )
+
+
 @router.get("", response_model=List[file_schemas.FileResponse])
 def list_files(
+    response: Response,
     folder_id: Optional[int] = Query(None),
+    dataroom_id: Optional[int] = Query(None),
+    page: Page = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get all files in a folder (requires authentication).
+    Get the files of a folder, of a dataroom, or the files of the user, a page at a time (requires authentication).
+
+    The X-Next-Cursor response header holds the cursor of the next page, if any.
 
     Requires: Valid JWT token and ownership of the dataroom
     """
-    query = db.query(FileModel)
+    query = db.query(FileModel).filter(FileModel.owner_id == current_user.id)
     if folder_id:
         # Verify the folder belongs to user's dataroom
-        folder = db.query(Folder).filter(Folder.id == folder_id).first()
-        if not folder:
-            raise HTTPException(status_code=404, detail="Folder not found")
+        get_owned_folder(folder_id, current_user, db)
+        query = query.filter(FileModel.folder_id == folder_id)
+    if dataroom_id:
+        dataroom = db.query(DataRoom.owner_id).filter(DataRoom.id == dataroom_id).first()
+        if not dataroom:
+            raise HTTPException(status_code=404, detail="Data room not found")
 
-        dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
         if dataroom.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
 
-        query = query.filter(FileModel.folder_id == folder_id)
+        query = query.filter(FileModel.dataroom_id == dataroom_id)
 
-    return query.all()
+    return paginate(query, FileModel.id, page, response)
 
 
 @router.post("", response_model=file_schemas.FileResponse)
 async def upload_file(
-    folder_id: int = Query(..., description="ID of the folder"),
+    background_tasks: BackgroundTasks,
+    db_folder: Folder = Depends(get_owned_folder),
     name: str = Query(..., description="Name for the file"),
     file: UploadFile = FastAPIFile(...),
-    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Upload a PDF file to a folder (requires authentication).
 
+    The document is validated and its metadata extracted in the background after the response,
+    poll GET /files/{id}/processing for the results.
+
     Requires: Valid JWT token and ownership of the dataroom
     """
-    # Check if folder exists
-    db_folder = db.query(Folder).filter(Folder.id == folder_id).first()
-    if not db_folder:
-        raise HTTPException(status_code=404, detail="Folder not found")
-
-    # Verify ownership through dataroom
-    dataroom = db.query(DataRoom).filter(DataRoom.id == db_folder.dataroom_id).first()
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
     try:
-        # Read file content
-        contents = await file.read()
-
-        # Create file path (organize by date)
-        now = datetime.utcnow()
-        file_dir = os.path.join(UPLOAD_DIR, str(now.year), str(now.month), str(now.day))
-        os.makedirs(file_dir, exist_ok=True)
-
-        # Generate unique filename
-        file_path = os.path.join(file_dir, file.filename)
-        file_count = 1
-        base_path = file_path
-        while os.path.exists(file_path):
-            name_part, ext = os.path.splitext(file.filename)
-            file_path = os.path.join(file_dir, f"{name_part}_{file_count}{ext}")
-            file_count += 1
-
-        # Write file to disk
-        with open(file_path, "wb") as f:
-            f.write(contents)
-
-        # Get file size
-        file_size = len(contents)
+        # Store the content once, identical uploads share the same blob
+        blob = await store_upload_file(db, file)
 
         # Create database record
         db_file = FileModel(
             name=name,
-            folder_id=folder_id,
-            file_path=file_path,
-            file_size=file_size,
-            file_type="pdf"
+            folder_id=db_folder.id,
+            dataroom_id=db_folder.dataroom_id,
+            owner_id=db_folder.owner_id,
+            file_path=blob.file_path,
+            file_size=blob.size,
+            stored_size=blob.stored_size,
+            file_type="pdf",
+            checksum=blob.checksum,
+            blob_id=blob.id
         )
         db.add(db_file)
         db.commit()
         db.refresh(db_file)
+
+        background_tasks.add_task(process_file, db.get_bind(), db_file.id)
         return db_file
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
 
+@router.post("/batch", response_model=file_schemas.FileBatchResponse)
+async def upload_files_batch(
+    background_tasks: BackgroundTasks,
+    db_folder: Folder = Depends(get_owned_folder),
+    files: List[UploadFile] = FastAPIFile(..., description="PDF files to upload"),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload many PDF files to a folder in one request (requires authentication).
+
+    Files are named after their filename without the extension.
+    Ownership is checked once, the files are stored concurrently and all records are created in one commit.
+    A file that fails does not fail the others: the result of every file is returned in request order.
+
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {UPLOAD_BATCH_MAX_FILES} files can be uploaded at once")
+
+    results = [
+        file_schemas.FileBatchResult(filename=file.filename, success=False, error="Only PDF files are allowed")
+        for file in files
+    ]
+    pdf_indexes = [index for index, file in enumerate(files) if file.filename.lower().endswith('.pdf')]
+
+    try:
+        blobs = await store_upload_files(db, [files[index] for index in pdf_indexes])
+
+        created = []
+        for index, blob in zip(pdf_indexes, blobs):
+            if isinstance(blob, Exception):
+                results[index].error = f"Error uploading file: {str(blob)}"
+                continue
+
+            db_file = FileModel(
+                name=os.path.splitext(files[index].filename)[0],
+                folder_id=db_folder.id,
+                dataroom_id=db_folder.dataroom_id,
+                owner_id=db_folder.owner_id,
+                file_path=blob.file_path,
+                file_size=blob.size,
+                stored_size=blob.stored_size,
+                file_type="pdf",
+                checksum=blob.checksum,
+                blob_id=blob.id
+            )
+            created.append((index, db_file))
+
+        # Insert all records at once, then build the results before the commit expires them
+        db.add_all([db_file for _, db_file in created])
+        db.flush()
+        for index, db_file in created:
+            results[index] = file_schemas.FileBatchResult(
+                filename=files[index].filename,
+                success=True,
+                file=file_schemas.FileResponse.model_validate(db_file)
+            )
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error uploading files: {str(e)}")
+
+    background_tasks.add_task(process_files, db.get_bind(), [result.file.id for result in results if result.success])
+
+    uploaded = sum(1 for result in results if result.success)
+    return file_schemas.FileBatchResponse(
+        uploaded=uploaded,
+        failed=len(results) - uploaded,
+        results=results
+    )
+
+
 @router.get("/{file_id}", response_model=file_schemas.FileResponse)
 def get_file(
-    file_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db_file: FileModel = Depends(get_owned_file)
 ):
     """
     Get file details (requires authentication and ownership).
     """
-    db_file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
+    return db_file
 
-    # Verify ownership through folder and dataroom
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
 
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+@router.get("/{file_id}/processing", response_model=file_schemas.FileProcessingResponse)
+def get_file_processing(
+    db_file: FileModel = Depends(get_owned_file)
+):
+    """
+    Get the state and results of the post-upload processing of a file (requires authentication and ownership).
 
+    Clients poll this endpoint until processing_status is done or failed.
+    """
     return db_file
 
 
 @router.patch("/{file_id}", response_model=file_schemas.FileResponse)
 def update_file(
-    file_id: int,
     file_update: file_schemas.FileUpdate,
-    current_user: User = Depends(get_current_user),
+    db_file: FileModel = Depends(get_owned_file),
     db: Session = Depends(get_db)
 ):
     """
     Update a file (rename - requires authentication and ownership).
     """
-    db_file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
-
-    # Verify ownership
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
-
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     db_file.name = file_update.name
     db_file.updated_at = datetime.utcnow()
     db.commit()
@@ -181,29 +293,13 @@ def update_file(
 
 @router.delete("/{file_id}")
 def delete_file(
-    file_id: int,
-    current_user: User = Depends(get_current_user),
+    db_file: FileModel = Depends(get_owned_file),
     db: Session = Depends(get_db)
 ):
     """
     Delete a file from the system (requires authentication and ownership).
     """
-    db_file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
-
-    # Verify ownership
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
-
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    # Delete file from disk if it exists
-    if os.path.exists(db_file.file_path):
-        os.remove(db_file.file_path)
-
-    # Delete database record
+    # Delete database record, the content is removed from disk with its last reference
     db.delete(db_file)
     db.commit()
     return {"message": "File deleted successfully"}
@@ -211,32 +307,73 @@ def delete_file(
 
 @router.get("/{file_id}/download")
 def download_file(
-    file_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db_file: FileModel = Depends(get_owned_file),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Download a file (requires authentication and ownership).
     """
-    db_file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
+    return throttle(_download_response(db_file), user_limit(current_user))
 
-    # Verify ownership
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
 
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+@router.get("/{file_id}/pages")
+async def download_file_pages(
+    db_file: FileModel = Depends(get_owned_file),
+    first: int = Query(..., ge=1, description="First page to extract, starting at 1"),
+    last: Optional[int] = Query(None, ge=1, description="Last page to extract, defaults to the first one"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download some pages of a file as a standalone PDF (requires authentication and ownership).
 
-    if not os.path.exists(db_file.file_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
+    Indexed documents are assembled from the objects the pages need, read from storage without parsing
+    the document. Documents without page index (not processed yet, or not indexable) are parsed instead.
 
-    return FileResponse(
-        path=db_file.file_path,
-        filename=f"{db_file.name}.pdf",
-        media_type="application/pdf"
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    last = last or first
+    if last < first:
+        raise HTTPException(status_code=400, detail="Last page must not come before the first page")
+
+    if first == last:
+        filename = f"{db_file.name} (page {first}).pdf"
+    else:
+        filename = f"{db_file.name} (pages {first}-{last}).pdf"
+    compression = db_file.blob.compression if db_file.blob else None
+
+    indexed = db_file.blob_id is not None and db.query(PageIndex.id).filter(
+        PageIndex.blob_id == db_file.blob_id
+    ).first() is not None
+    if indexed:
+        pages = db.query(PageIndex).filter(
+            PageIndex.blob_id == db_file.blob_id,
+            PageIndex.page_number.between(first, last)
+        ).order_by(PageIndex.page_number).all()
+        if len(pages) != last - first + 1:
+            raise HTTPException(status_code=404, detail="Page not found")
+        response = PageRangeResponse(db_file.file_path, filename, pages, compression=compression)
+        return throttle(response, user_limit(current_user))
+
+    if db_file.page_count is not None and last > db_file.page_count:
+        raise HTTPException(status_code=404, detail="Page not found")
+    key = db_file.file_path
+    # Nothing is loaded from the database while the document is parsed
+    db.close()
+    try:
+        content = await extract_file_pages(key, compression, first, last)
+    except ProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on disk")
+    if content is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    response = Response(
+        content,
+        media_type="application/pdf",
+        headers={"content-disposition": content_disposition(filename)},
     )
+    return throttle(response, user_limit(current_user))
 
 
 @router.get("/share/{share_token}/download")
@@ -245,36 +382,116 @@ def download_shared_file(share_token: str, db: Session = Depends(get_db)):
     Download a file using a share token (PUBLIC - no authentication required).
 
     Anyone with a valid share token can download the file.
+    Repeated downloads with the same token are answered from the share cache, without database queries.
+    """
+    share = share_cache.get(share_token)
+    if share is None:
+        # Find the share record
+        db_share = db.query(FileShare).filter(FileShare.token == share_token).first()
+        if not db_share:
+            raise HTTPException(status_code=404, detail="Share not found")
+
+        # Check if share has expired
+        if db_share.expires_at < datetime.utcnow():
+            raise HTTPException(status_code=403, detail="Share link has expired")
+
+        # Get the file
+        db_file = db.query(FileModel).filter(FileModel.id == db_share.file_id).first()
+        if not db_file:
+            raise HTTPException(status_code=404, detail="File not found")
+
+        share = cache_share(share_token, db_share, db_file)
+
+    response = StoredFileResponse(
+        key=share.key,
+        filename=share.filename,
+        media_type="application/pdf",
+        headers={"cache-control": "private, no-cache"},
+        compression=share.compression,
+        size=share.size,
+        etag=share.checksum,
+        last_modified=share.updated_at,
+        on_download=partial(record_download, share.file_id, share.share_id)
+    )
+    return throttle(response, share_limit(str(share.share_id), share.download_rate_limit))
+
+
+@router.get("/signed/{token}/download")
+def download_signed_file(token: str, db: Session = Depends(get_db)):
+    """
+    Download a file using a signed share token (PUBLIC - no authentication required).
+
+    The token carries the file and is verified with its signature, without database queries.
     """
-    # Find the share record
-    db_share = db.query(FileShare).filter(FileShare.token == share_token).first()
-    if not db_share:
+    share = verify_signed_share(token)
+    if share is None:
         raise HTTPException(status_code=404, detail="Share not found")
 
-    # Check if share has expired
-    if db_share.expires_at < datetime.utcnow():
+    if share.expired:
         raise HTTPException(status_code=403, detail="Share link has expired")
 
-    # Get the file
-    db_file = db.query(FileModel).filter(FileModel.id == db_share.file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
+    if is_revoked(db, share):
+        raise HTTPException(status_code=403, detail="Share link has been revoked")
+
+    response = StoredFileResponse(
+        key=share.key,
+        filename=share.filename,
+        media_type="application/pdf",
+        headers={"cache-control": "private, no-cache"},
+        compression=share.compression,
+        size=share.size,
+        on_download=partial(record_download, share.file_id)
+    )
+    # Every signed link of a file is issued at its own time
+    return throttle(response, share_limit(f"signed:{share.file_id}:{share.issued_at}", share.rate_limit))
 
-    if not os.path.exists(db_file.file_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
 
-    return FileResponse(
-        path=db_file.file_path,
-        filename=f"{db_file.name}.pdf",
-        media_type="application/pdf"
-    )
+@router.post("/{file_id}/signed-share", response_model=file_schemas.SignedShareResponse)
+def create_file_signed_share(
+    share_data: file_schemas.SignedShareCreate,
+    db_file: FileModel = Depends(get_owned_file),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a signed share link for a file (requires authentication and ownership).
+
+    Signed links are downloaded without any database query. They cannot be deleted one by one,
+    DELETE /files/{file_id}/signed-shares revokes all signed links of the file.
+    """
+    now = datetime.utcnow()
+    expires_at = share_data.expires_at or now + timedelta(hours=SIGNED_SHARE_EXPIRE_HOURS)
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.replace(tzinfo=None) - expires_at.utcoffset()
+    if expires_at <= now:
+        raise HTTPException(status_code=400, detail="Expiration date must be in the future")
+    if expires_at > now + timedelta(days=SIGNED_SHARE_MAX_EXPIRE_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Signed share links cannot last more than {SIGNED_SHARE_MAX_EXPIRE_DAYS} days"
+        )
+
+    token, share = create_signed_share(db, db_file, expires_at, share_data.download_rate_limit)
+    db.commit()
+    return {"file_id": db_file.id, "token": token, "expires_at": share.expires_at_datetime}
+
+
+@router.delete("/{file_id}/signed-shares")
+def delete_file_signed_shares(
+    db_file: FileModel = Depends(get_owned_file),
+    db: Session = Depends(get_db)
+):
+    """
+    Revoke all signed share links of a file (requires authentication and ownership).
+    """
+    revoke_signed_shares(db, db_file)
+    db.commit()
+    return {"message": "Signed shares revoked successfully"}
 
 
 @router.post("/{file_id}/share", response_model=file_schemas.FileShareResponse)
 def create_file_share(
-    file_id: int,
     share_data: file_schemas.FileShareCreate,
-    current_user: User = Depends(get_current_user),
+    db_file: FileModel = Depends(get_owned_file),
     db: Session = Depends(get_db)
 ):
     """
@@ -282,21 +499,11 @@ def create_file_share(
 
     Returns a shareable token that can be used to download the file without authentication.
     """
-    db_file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
-
-    # Verify ownership
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
-
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     # Create a new file share
     db_share = FileShare(
-        file_id=file_id,
-        expires_at=share_data.expires_at
+        file_id=db_file.id,
+        expires_at=share_data.expires_at,
+        download_rate_limit=share_data.download_rate_limit
     )
     db.add(db_share)
     db.commit()
@@ -306,48 +513,28 @@ def create_file_share(
 
 @router.get("/{file_id}/shares", response_model=List[file_schemas.FileShareResponse])
 def list_file_shares(
-    file_id: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    page: Page = Depends(),
+    db_file: FileModel = Depends(get_owned_file),
     db: Session = Depends(get_db)
 ):
     """
-    Get all shares for a file (requires authentication and ownership).
-    """
-    db_file = db.query(FileModel).filter(FileModel.id == file_id).first()
-    if not db_file:
-        raise HTTPException(status_code=404, detail="File not found")
-
-    # Verify ownership
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
-
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    Get the shares of a file, a page at a time (requires authentication and ownership).
 
-    return db.query(FileShare).filter(FileShare.file_id == file_id).all()
+    The X-Next-Cursor response header holds the cursor of the next page, if any.
+    """
+    query = db.query(FileShare).filter(FileShare.file_id == db_file.id)
+    return paginate(query, FileShare.id, page, response)
 
 
 @router.delete("/share/{share_id}")
 def delete_file_share(
-    share_id: int,
-    current_user: User = Depends(get_current_user),
+    db_share: FileShare = Depends(get_owned_file_share),
     db: Session = Depends(get_db)
 ):
     """
     Delete a file share (revoke access - requires authentication).
     """
-    db_share = db.query(FileShare).filter(FileShare.id == share_id).first()
-    if not db_share:
-        raise HTTPException(status_code=404, detail="Share not found")
-
-    # Verify ownership
-    db_file = db.query(FileModel).filter(FileModel.id == db_share.file_id).first()
-    folder = db.query(Folder).filter(Folder.id == db_file.folder_id).first()
-    dataroom = db.query(DataRoom).filter(DataRoom.id == folder.dataroom_id).first()
-
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
     db.delete(db_share)
     db.commit()
     return {"message": "Share deleted successfully"}
@@ -8,6 +8,7 @@ from fastapi import (
     HTTPException,
     Depends,
     Query,
+    Response,
 )
 from sqlalchemy.orm import Session
 
@@ -17,23 +18,46 @@ from models import (
     Folder,
     User
 )
-from dependencies import get_current_user
+from dependencies import (
+    get_current_user,
+    get_owned_folder,
+)
 from api.v0.schemas import folder as folder_schemas
+from storage import (
+    collect_archive_entries,
+    zip_response,
+)
+from hierarchy import (
+    load_ancestors,
+    load_folder_tree,
+)
+from bandwidth import (
+    throttle,
+    user_limit,
+)
+from pagination import (
+    Page,
+    paginate,
+)
 
 router = APIRouter(prefix="/folders")
 
 @router.get("", response_model=List[folder_schemas.FolderResponse])
 def list_folders(
+    response: Response,
     dataroom_id: Optional[int] = Query(None),
+    page: Page = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get all folders in a dataroom (requires authentication).
+    Get the folders in a dataroom, or the folders of the user, a page at a time (requires authentication).
+
+    The X-Next-Cursor response header holds the cursor of the next page, if any.
 
     Requires: Valid JWT token and ownership of the dataroom
     """
-    query = db.query(Folder)
+    query = db.query(Folder).filter(Folder.owner_id == current_user.id)
     if dataroom_id:
         # Verify ownership of dataroom
         dataroom = db.query(DataRoom).filter(DataRoom.id == dataroom_id).first()
@@ -45,7 +69,7 @@ def list_folders(
 
         query = query.filter(Folder.dataroom_id == dataroom_id)
 
-    return query.all()
+    return paginate(query, Folder.id, page, response)
 
 
 @router.post("", response_model=folder_schemas.FolderResponse)
@@ -81,7 +105,9 @@ def create_folder(
     db_folder = Folder(
         name=folder.name,
         dataroom_id=folder.dataroom_id,
-        parent_id=folder.parent_id
+        owner_id=dataroom_exists.owner_id,
+        parent_id=folder.parent_id,
+        path=parent_exists.subtree_path if folder.parent_id else "/"
     )
     db.add(db_folder)
     db.commit()
@@ -91,8 +117,7 @@ def create_folder(
 
 @router.get("/{folder_id}", response_model=folder_schemas.FolderResponse)
 def get_folder(
-    folder_id: int,
-    current_user: User = Depends(get_current_user),
+    db_folder: Folder = Depends(get_owned_folder),
     db: Session = Depends(get_db)
 ):
     """
@@ -100,23 +125,43 @@ def get_folder(
 
     Requires: Valid JWT token and ownership of the dataroom
     """
-    db_folder = db.query(Folder).filter(Folder.id == folder_id).first()
-    if not db_folder:
-        raise HTTPException(status_code=404, detail="Folder not found")
+    return load_folder_tree(db, db_folder)
 
-    # Verify ownership through dataroom
-    dataroom = db.query(DataRoom).filter(DataRoom.id == db_folder.dataroom_id).first()
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
 
-    return db_folder
+@router.get("/{folder_id}/ancestors", response_model=List[folder_schemas.FolderSummary])
+def get_folder_ancestors(
+    db_folder: Folder = Depends(get_owned_folder),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the ancestors of a folder, from the top level folder down to its parent, e.g. for breadcrumbs.
+
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    return load_ancestors(db, db_folder)
+
+
+@router.get("/{folder_id}/download")
+def download_folder(
+    db_folder: Folder = Depends(get_owned_folder),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download a folder with all its files and subfolders as a ZIP archive (requires authentication).
+
+    The archive is streamed while it is generated, whatever the size of the folder.
+
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    entries = collect_archive_entries(db, db_folder.dataroom, db_folder)
+    return throttle(zip_response(entries, f"{db_folder.name}.zip"), user_limit(current_user))
 
 
 @router.patch("/{folder_id}", response_model=folder_schemas.FolderResponse)
 def update_folder(
-    folder_id: int,
     folder: folder_schemas.FolderUpdate,
-    current_user: User = Depends(get_current_user),
+    db_folder: Folder = Depends(get_owned_folder),
     db: Session = Depends(get_db)
 ):
     """
@@ -124,26 +169,45 @@ def update_folder(
 
     Requires: Valid JWT token and ownership of the dataroom
     """
-    db_folder = db.query(Folder).filter(Folder.id == folder_id).first()
-    if not db_folder:
-        raise HTTPException(status_code=404, detail="Folder not found")
+    db_folder.name = folder.name
+    db_folder.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(db_folder)
+    return load_folder_tree(db, db_folder)
 
-    # Verify ownership through dataroom
-    dataroom = db.query(DataRoom).filter(DataRoom.id == db_folder.dataroom_id).first()
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
 
-    db_folder.name = folder.name
+@router.post("/{folder_id}/move", response_model=folder_schemas.FolderResponse)
+def move_folder(
+    move: folder_schemas.FolderMove,
+    db_folder: Folder = Depends(get_owned_folder),
+    db: Session = Depends(get_db)
+):
+    """
+    Move a folder with all its contents under another folder of the same dataroom, or to its top level.
+
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    if move.parent_id:
+        parent = db.query(Folder).filter(Folder.id == move.parent_id).first()
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent folder not found")
+
+        if parent.dataroom_id != db_folder.dataroom_id:
+            raise HTTPException(status_code=400, detail="Parent folder must be in the same dataroom")
+
+        if parent.id == db_folder.id or parent.path.startswith(db_folder.subtree_path):
+            raise HTTPException(status_code=400, detail="A folder cannot be moved into itself or its subfolders")
+
+    db_folder.parent_id = move.parent_id or None
     db_folder.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_folder)
-    return db_folder
+    return load_folder_tree(db, db_folder)
 
 
 @router.delete("/{folder_id}", status_code=204)
 def delete_folder(
-    folder_id: int,
-    current_user: User = Depends(get_current_user),
+    db_folder: Folder = Depends(get_owned_folder),
     db: Session = Depends(get_db)
 ):
     """
@@ -151,14 +215,6 @@ def delete_folder(
 
     Requires: Valid JWT token and ownership of the dataroom
     """
-    db_folder = db.query(Folder).filter(Folder.id == folder_id).first()
-    if not db_folder:
-        raise HTTPException(status_code=404, detail="Folder not found")
-
-    # Verify ownership through dataroom
-    dataroom = db.query(DataRoom).filter(DataRoom.id == db_folder.dataroom_id).first()
-    if dataroom.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    db.delete(db_folder)
+    # The whole subtree is loaded at once, the cascade then does not load it folder by folder
+    db.delete(load_folder_tree(db, db_folder))
     db.commit()
@@ -0,0 +1,257 @@
+import os
+import re
+from datetime import datetime
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    HTTPException,
+    Depends,
+    Header,
+    Request,
+)
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import (
+    Folder,
+    File as FileModel,
+    UploadSession,
+    User
+)
+from dependencies import (
+    get_current_user,
+    get_owned_folder,
+)
+from api.v0.schemas import file as file_schemas
+from api.v0.schemas import upload_session as upload_session_schemas
+from processing import process_file
+from storage import (
+    session_part_path,
+    write_stream_at,
+    checksum_file,
+    store_blob,
+)
+
+# Content-Range header of a chunk: "bytes <first>-<last>/<total>"
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+router = APIRouter(prefix="/upload-sessions")
+
+
+def _get_upload_session(session_id: int, current_user: User, db: Session, lock: bool = False) -> UploadSession:
+    """
+    Load an upload session of the current user.
+
+    With lock, the session row stays locked until the transaction ends.
+
+    Raises:
+        - HTTPException 404 if the session does not exist
+        - HTTPException 403 if the session belongs to another user
+        - HTTPException 410 if the session has expired
+    """
+    query = db.query(UploadSession).filter(UploadSession.id == session_id)
+    if lock:
+        query = query.with_for_update()
+    db_session = query.first()
+    if not db_session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    if db_session.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if db_session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="Upload session has expired")
+
+    return db_session
+
+
+@router.post("", response_model=upload_session_schemas.UploadSessionResponse)
+def create_upload_session(
+    session_data: upload_session_schemas.UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable upload of a PDF file into a folder (requires authentication).
+
+    The file is then sent in byte ranges with PUT /upload-sessions/{id}
+    and turned into a file with POST /upload-sessions/{id}/complete.
+
+    Requires: Valid JWT token and ownership of the dataroom
+    """
+    # Check if folder exists and user owns its dataroom
+    get_owned_folder(session_data.folder_id, current_user, db)
+
+    # Validate file type
+    if not session_data.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    db_session = UploadSession(
+        user_id=current_user.id,
+        folder_id=session_data.folder_id,
+        name=session_data.name,
+        filename=session_data.filename,
+        total_size=session_data.total_size,
+        received_size=0
+    )
+    db.add(db_session)
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+
+@router.get("/{session_id}", response_model=upload_session_schemas.UploadSessionResponse)
+def get_upload_session(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the state of an upload session (requires authentication).
+
+    received_size tells the client where to resume after a dropped connection.
+    """
+    return _get_upload_session(session_id, current_user, db)
+
+
+@router.put("/{session_id}", response_model=upload_session_schemas.UploadSessionResponse)
+async def upload_session_chunk(
+    session_id: int,
+    request: Request,
+    content_range: str = Header(..., description="Byte range of the chunk: bytes <first>-<last>/<total>"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a byte range of the file (requires authentication).
+
+    The range has to start at the committed offset (received_size).
+    If the connection drops mid-chunk, the bytes that did arrive are kept.
+    """
+    # Concurrent chunks of the same session wait for each other on the session row
+    db_session = _get_upload_session(session_id, current_user, db, lock=True)
+
+    match = CONTENT_RANGE_PATTERN.match(content_range.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range header")
+
+    first, last, total = (int(value) for value in match.groups())
+    if total != db_session.total_size or first > last or last >= total:
+        raise HTTPException(status_code=416, detail="Content-Range does not fit the file")
+
+    if first != db_session.received_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Chunk must start at offset {db_session.received_size}"
+        )
+
+    try:
+        written = await write_stream_at(
+            request.stream(),
+            session_part_path(db_session.id),
+            offset=first,
+            limit=last - first + 1
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Only moves the offset from where this chunk started, in case the database has no row locks
+    updated = db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == db_session.id, UploadSession.received_size == first)
+        .values(received_size=first + written, updated_at=datetime.utcnow()),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not updated:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Upload session was changed by another request")
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+
+@router.post("/{session_id}/complete", response_model=file_schemas.FileResponse)
+async def complete_upload_session(
+    session_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Finalize a fully received upload session into a file (requires authentication).
+
+    Like a regular upload, the document is processed in the background after the response.
+    """
+    db_session = _get_upload_session(session_id, current_user, db)
+
+    if db_session.received_size != db_session.total_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload is incomplete: {db_session.received_size} of {db_session.total_size} bytes received"
+        )
+
+    # The folder may have been deleted while the upload was running
+    db_folder = db.query(Folder).filter(Folder.id == db_session.folder_id).first()
+    if not db_folder:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    # The partial file may have been cut short or removed on disk since its chunks were committed
+    try:
+        stored = await checksum_file(session_part_path(db_session.id))
+    except FileNotFoundError:
+        stored = None
+    stored_size = stored.size if stored else 0
+    if stored_size != db_session.total_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload is incomplete: {stored_size} of {db_session.total_size} bytes stored"
+        )
+
+    try:
+        # Store the content once, identical uploads share the same blob
+        blob = await store_blob(db, stored)
+
+        # Create database record
+        db_file = FileModel(
+            name=db_session.name,
+            folder_id=db_session.folder_id,
+            dataroom_id=db_folder.dataroom_id,
+            owner_id=db_folder.owner_id,
+            file_path=blob.file_path,
+            file_size=blob.size,
+            stored_size=blob.stored_size,
+            file_type="pdf",
+            checksum=blob.checksum,
+            blob_id=blob.id
+        )
+        db.add(db_file)
+        db.delete(db_session)
+        db.commit()
+        db.refresh(db_file)
+
+        background_tasks.add_task(process_file, db.get_bind(), db_file.id)
+        return db_file
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
+
+
+@router.delete("/{session_id}")
+def delete_upload_session(
+    session_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Abort an upload session and drop the bytes received so far (requires authentication).
+    """
+    db_session = _get_upload_session(session_id, current_user, db)
+
+    part_path = session_part_path(db_session.id)
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+    db.delete(db_session)
+    db.commit()
+    return {"message": "Upload session deleted successfully"}
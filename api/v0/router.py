@@ -8,6 +8,7 @@ Each resource router handles its own resource endpoints, for example:
  - dataroom: /datarooms, /datarooms/{id}, etc.
  - folder: /folders, /folders/{id}, etc.
  - file: /files, /files/{id}, etc.
+ - upload_session: /upload-sessions, /upload-sessions/{id}, etc.
 """
 
 from fastapi import APIRouter
@@ -15,7 +16,8 @@ from .endpoints import (
     auth,
     dataroom,
     folder,
-    file
+    file,
+    upload_session
 )
 
 # This router will have /api/v0 prefix added by the main api router
@@ -25,3 +27,4 @@ router.include_router(auth.router, tags=["auth"])
 router.include_router(dataroom.router, tags=["dataroom"])
 router.include_router(folder.router, tags=["folder"])
 router.include_router(file.router, tags=["file"])
+router.include_router(upload_session.router, tags=["upload_session"])
@@ -31,7 +31,8 @@ class DataRoomUpdate(BaseModel):
 class DataRoomResponse(DataRoomBase):
     """
     Schema for data room responses - includes all nested folders and files.
-    This is the complete hierarchical structure.
+    This is the complete hierarchical structure: folders holds the top level folders,
+    every other folder is in the subfolders of its parent.
     """
     id: int
     created_at: datetime
@@ -9,7 +9,11 @@ from pydantic import (
     Field,
 )
 from datetime import datetime
-from typing import Optional
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
 
 
 class FileBase(BaseModel):
@@ -34,9 +38,16 @@ class FileResponse(FileBase):
     This is what the API returns when you request file data.
     """
     id: int
-    file_path: str = Field(..., description="Path to the file on disk")
+    file_path: str = Field(..., description="Storage key of the file content")
     file_size: int = Field(..., description="Size of the file in bytes")
+    stored_size: Optional[int] = Field(None, description="Size of the file in storage, smaller than file_size if it is compressed")
     file_type: str = Field(default="pdf", description="Type of file")
+    checksum: Optional[str] = Field(None, description="SHA-256 checksum of the file content")
+    processing_status: str = Field(default="pending", description="State of the post-upload processing")
+    page_count: Optional[int] = Field(None, description="Number of pages, once processed")
+    document_metadata: Optional[Dict[str, str]] = Field(None, description="Document information, once processed")
+    download_count: int = Field(default=0, description="Number of downloads, directly and through shares")
+    last_downloaded_at: Optional[datetime] = Field(None, description="Timestamp of the last download")
     created_at: datetime
     updated_at: datetime
 
@@ -45,9 +56,40 @@ class FileResponse(FileBase):
         from_attributes = True
 
 
+class FileProcessingResponse(BaseModel):
+    """Schema for polling the post-upload processing of a file"""
+    id: int
+    processing_status: str = Field(..., description="pending, processing, done or failed")
+    processing_error: Optional[str] = Field(None, description="Why the processing failed, if it did")
+    page_count: Optional[int] = None
+    document_metadata: Optional[Dict[str, str]] = None
+    processed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class FileBatchResult(BaseModel):
+    """Outcome of one file of a batch upload"""
+    filename: str = Field(..., description="Original name of the uploaded file")
+    success: bool = Field(..., description="Whether the file was stored")
+    file: Optional[FileResponse] = Field(None, description="The created file, if it was stored")
+    error: Optional[str] = Field(None, description="Why the file was not stored")
+
+
+class FileBatchResponse(BaseModel):
+    """Schema for batch upload responses - one result per uploaded file, in request order"""
+    uploaded: int = Field(..., description="Number of stored files")
+    failed: int = Field(..., description="Number of files that could not be stored")
+    results: List[FileBatchResult]
+
+
 class FileShareCreate(BaseModel):
     """Schema for creating a file share"""
     expires_at: Optional[datetime] = Field(None, description="Optional expiration date for the share")
+    download_rate_limit: Optional[int] = Field(
+        None, ge=1, description="Optional download limit of the share in bytes per second"
+    )
 
 
 class FileShareResponse(BaseModel):
@@ -57,6 +99,24 @@ class FileShareResponse(BaseModel):
     token: str = Field(..., description="Unique token for the share link")
     created_at: datetime
     expires_at: Optional[datetime]
+    download_count: int = Field(default=0, description="Number of downloads through the share")
+    last_accessed_at: Optional[datetime] = Field(None, description="Timestamp of the last download through the share")
+    download_rate_limit: Optional[int] = Field(None, description="Download limit of the share in bytes per second")
 
     class Config:
         from_attributes = True
+
+
+class SignedShareCreate(BaseModel):
+    """Schema for creating a signed share link"""
+    expires_at: Optional[datetime] = Field(None, description="Optional expiration date, 24 hours from now by default")
+    download_rate_limit: Optional[int] = Field(
+        None, ge=1, description="Optional download limit of the link in bytes per second"
+    )
+
+
+class SignedShareResponse(BaseModel):
+    """Schema for signed share link responses"""
+    file_id: int
+    token: str = Field(..., description="Signed token for the share link, verified without the database")
+    expires_at: datetime
@@ -33,6 +33,21 @@ class FolderUpdate(BaseModel):
     name: str = Field(..., description="New name for the folder")
 
 
+class FolderMove(BaseModel):
+    """Schema for moving a folder under another folder of its dataroom"""
+    parent_id: Optional[int] = Field(None, description="ID of the new parent folder, none to move it to the top level")
+
+
+class FolderSummary(BaseModel):
+    """Schema for a folder without its contents, e.g. in breadcrumbs"""
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
 class FolderResponse(FolderBase):
     """
     Schema for folder responses - includes nested files and subfolders.
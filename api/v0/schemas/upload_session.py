@@ -0,0 +1,37 @@
+"""
+Pydantic Schemas Module
+
+Pydantic schemas define the structure of data sent to and from the API.
+They provide data validation and automatic documentation in Swagger.
+"""
+from pydantic import (
+    BaseModel,
+    Field,
+)
+from datetime import datetime
+
+
+class UploadSessionCreate(BaseModel):
+    """Schema for starting a resumable upload"""
+    folder_id: int = Field(..., description="ID of the folder the file will be stored in")
+    name: str = Field(..., description="Name for the file")
+    filename: str = Field(..., description="Original name of the uploaded file")
+    total_size: int = Field(..., gt=0, description="Size of the whole file in bytes")
+
+
+class UploadSessionResponse(BaseModel):
+    """
+    Schema for upload session responses.
+    received_size is the committed offset the next chunk has to start at.
+    """
+    id: int
+    folder_id: int
+    name: str
+    filename: str
+    total_size: int
+    received_size: int = Field(..., description="Number of bytes received so far")
+    created_at: datetime
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
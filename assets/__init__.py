@@ -0,0 +1,16 @@
+"""
+Assets Module
+
+Build and serving of the static frontend: fingerprinted file names, precompressed variants
+and cache headers letting browsers keep the assets until they change.
+"""
+from .build import (
+    AssetManifest,
+    BuiltFile,
+    build_assets,
+    load_manifest,
+)
+from .files import (
+    AssetFiles,
+    negotiate_encoding,
+)
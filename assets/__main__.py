@@ -0,0 +1,33 @@
+"""
+Build commands of the static frontend.
+
+Usage:
+    python -m assets build [--source DIRECTORY] [--output DIRECTORY]
+"""
+import argparse
+
+from settings import (
+    STATIC_DIRECTORY,
+    STATIC_BUILD_DIRECTORY,
+)
+from .build import build_assets
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m assets", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Build the frontend, unless it is built already")
+    build_parser.add_argument("--source", default=STATIC_DIRECTORY, help="Directory of the frontend sources")
+    build_parser.add_argument("--output", default=STATIC_BUILD_DIRECTORY, help="Directory of the builds")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_assets(args.source, args.output)
+        print(manifest.directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Build of the static frontend.
+
+The sources in STATIC_DIRECTORY are copied to a directory of STATIC_BUILD_DIRECTORY named after a hash
+of the sources, so workers starting together agree on it and a build is never modified once written:
+
+- Stylesheets and scripts get a fingerprint of their content in their name (css/style.3f2a9b1c04de.css),
+  and the references of the HTML pages are rewritten to it. A new version gets a new name,
+  so browsers may cache them forever. The plain name is kept for pages cached before the build
+- HTML pages keep their name, browsers revalidate them on every load
+- Text files get gzip and brotli (with the brotli package) variants next to them, e.g. app.<hash>.js.gz,
+  kept when they are smaller
+- manifest.json lists the fingerprinted names, and the ETag and variants of every file
+
+The application builds at startup, which is a no-op once the build exists (e.g. python -m assets build in the image).
+"""
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import (
+    Dict,
+    Optional,
+)
+
+from logger import logger
+from settings import (
+    STATIC_DIRECTORY,
+    STATIC_BUILD_DIRECTORY,
+    STATIC_COMPRESS_MIN_SIZE,
+)
+
+# Bumped when the build output changes for the same sources, so existing builds are not reused
+BUILD_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+
+FINGERPRINTED_EXTENSIONS = {".css", ".js"}
+COMPRESSED_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt"}
+# Content codings of the precompressed variants and their file extensions, preferred first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass
+class BuiltFile:
+    """
+    A file of a build.
+
+    Attrs:
+        - etag: ETag of the file, a hash of its content, the same on every host
+        - encodings: Content coding -> ETag of the precompressed variant
+    """
+    etag: str
+    encodings: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class AssetManifest:
+    """
+    What a build contains.
+
+    Attrs:
+        - directory: Build directory
+        - fingerprinted: Source path -> fingerprinted path, relative and slash separated
+        - files: Path -> built file, for every file of the build
+    """
+    directory: str
+    fingerprinted: Dict[str, str]
+    files: Dict[str, BuiltFile]
+
+    def __post_init__(self):
+        self._immutable = set(self.fingerprinted.values())
+
+    def is_immutable(self, path: str) -> bool:
+        """Whether the file has a fingerprinted name, its content never changes"""
+        return path in self._immutable
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _read_sources(source: str) -> Dict[str, bytes]:
+    """Relative slash separated path -> content of every source file, hidden files excluded"""
+    contents = {}
+    for root, directories, names in os.walk(source):
+        directories[:] = sorted(name for name in directories if not name.startswith("."))
+        for name in sorted(names):
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                contents[os.path.relpath(path, source).replace(os.sep, "/")] = f.read()
+    return contents
+
+
+def _build_id(contents: Dict[str, bytes]) -> str:
+    digest = hashlib.sha256(f"format {BUILD_FORMAT}\n".encode())
+    for path, content in sorted(contents.items()):
+        digest.update(f"{path}\n{len(content)}\n".encode())
+        digest.update(content)
+    return digest.hexdigest()[:16]
+
+
+def _fingerprint(path: str, content: bytes) -> str:
+    root, extension = posixpath.splitext(path)
+    return f"{root}.{_digest(content)[:12]}{extension}"
+
+
+def _rewrite_references(page: str, html: bytes, fingerprinted: Dict[str, str]) -> bytes:
+    """Point the quoted relative references of a page to the fingerprinted names"""
+    directory = posixpath.dirname(page)
+    for source, target in fingerprinted.items():
+        reference = posixpath.relpath(source, directory or ".").encode()
+        replacement = posixpath.relpath(target, directory or ".").encode()
+        pattern = re.compile(rb"([\"'])(\./)?" + re.escape(reference) + rb"\1")
+        html = pattern.sub(lambda match: match.group(1) + replacement + match.group(1), html)
+    return html
+
+
+def _compress(path: str, content: bytes) -> Dict[str, bytes]:
+    """Precompressed variants of a file worth keeping, by content coding"""
+    if posixpath.splitext(path)[1] not in COMPRESSED_EXTENSIONS or len(content) < STATIC_COMPRESS_MIN_SIZE:
+        return {}
+    variants = {}
+    brotli = _brotli()
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=11)
+    # No timestamp, the same sources give the same bytes
+    variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+
+def load_manifest(directory: str) -> AssetManifest:
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        data = json.load(f)
+    return AssetManifest(
+        directory=directory,
+        fingerprinted=data["fingerprinted"],
+        files={path: BuiltFile(**built) for path, built in data["files"].items()},
+    )
+
+
+def build_assets(source: str = STATIC_DIRECTORY, output: Optional[str] = None) -> AssetManifest:
+    """
+    Build the frontend, unless a build of the same sources exists already.
+
+    The build is written to a temporary directory and renamed into place,
+    a worker never serves, nor overwrites, a partial build.
+    """
+    output = output or STATIC_BUILD_DIRECTORY
+    contents = _read_sources(source)
+    directory = os.path.join(output, _build_id(contents))
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return load_manifest(directory)
+
+    fingerprinted = {
+        path: _fingerprint(path, content)
+        for path, content in contents.items()
+        if posixpath.splitext(path)[1] in FINGERPRINTED_EXTENSIONS
+    }
+    files = {}
+    for path, content in contents.items():
+        if posixpath.splitext(path)[1] == ".html":
+            content = _rewrite_references(path, content, fingerprinted)
+        files[path] = content
+        if path in fingerprinted:
+            files[fingerprinted[path]] = content
+
+    os.makedirs(output, exist_ok=True)
+    temp = tempfile.mkdtemp(prefix=".build-", dir=output)
+    try:
+        manifest = {"fingerprinted": fingerprinted, "files": {}}
+        for path, content in files.items():
+            target = os.path.join(temp, *path.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(content)
+            built = {"etag": _digest(content)[:32], "encodings": {}}
+            for encoding, data in _compress(path, content).items():
+                with open(target + ENCODINGS[encoding], "wb") as f:
+                    f.write(data)
+                built["encodings"][encoding] = _digest(data)[:32]
+            manifest["files"][path] = built
+        with open(os.path.join(temp, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.chmod(temp, 0o755)
+
+        try:
+            os.rename(temp, directory)
+        except OSError:
+            # Another worker finished the same build first
+            shutil.rmtree(temp, ignore_errors=True)
+        else:
+            logger.info(f"Built the frontend to {directory}")
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    return load_manifest(directory)
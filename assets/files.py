@@ -0,0 +1,99 @@
+import os
+from mimetypes import guess_type
+from typing import (
+    Dict,
+    Optional,
+)
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import (
+    FileResponse,
+    NotModifiedResponse,
+    StaticFiles,
+)
+from starlette.types import Scope
+
+from settings import STATIC_IMMUTABLE_MAX_AGE
+from .build import (
+    ENCODINGS,
+    AssetManifest,
+)
+
+
+def negotiate_encoding(accept_encoding: str, available: Dict[str, str]) -> Optional[str]:
+    """
+    Pick the precompressed variant to send for an Accept-Encoding header.
+
+    The variant with the highest quality value wins, ties go to the best compression.
+    Returns None if the file should be sent as it is.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.strip().partition(";")
+        quality = 1.0
+        name, _, value = parameters.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                continue
+        qualities[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class AssetFiles(StaticFiles):
+    """
+    StaticFiles serving a build of the frontend, see assets.build.
+
+    - Fingerprinted files are cached by browsers for STATIC_IMMUTABLE_MAX_AGE without revalidation
+    - Other files (the HTML pages) are revalidated on every load, and answered with 304 while their ETag matches
+    - The precompressed variant accepted by the client is sent, with its own ETag
+    """
+
+    def __init__(self, manifest: AssetManifest, html: bool = True):
+        super().__init__(directory=manifest.directory, html=html)
+        self.manifest = manifest
+        self.root = os.path.realpath(manifest.directory)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+        built = self.manifest.files.get(path)
+        if built is None:
+            # Not part of the build, e.g. the manifest
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        headers = {}
+        if self.manifest.is_immutable(path):
+            headers["cache-control"] = f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            headers["cache-control"] = "no-cache"
+
+        media_type = guess_type(path)[0] or "text/plain"
+        etag = built.etag
+        if built.encodings:
+            headers["vary"] = "Accept-Encoding"
+            encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), built.encodings)
+            if encoding is not None:
+                full_path = f"{full_path}{ENCODINGS[encoding]}"
+                stat_result = os.stat(full_path)
+                headers["content-encoding"] = encoding
+                etag = built.encodings[encoding]
+
+        response = FileResponse(
+            full_path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result
+        )
+        # The stat based ETag differs between hosts, the content hash does not
+        response.headers["etag"] = f'"{etag}"'
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
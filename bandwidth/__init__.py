@@ -0,0 +1,20 @@
+"""
+Bandwidth Module
+
+Shapes downloads: per user and per share link limits with token buckets,
+and a worker-wide bandwidth shared fairly between everyone downloading.
+"""
+from .buckets import (
+    TokenBucket,
+    BucketRegistry,
+    FairShare,
+    buckets,
+    fair_share,
+    fair_share_enabled,
+)
+from .responses import (
+    ThrottledResponse,
+    throttle,
+    user_limit,
+    share_limit,
+)
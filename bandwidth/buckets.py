@@ -0,0 +1,157 @@
+"""
+Token buckets and fair sharing of the bandwidth of a worker.
+
+- Every user and share link with a download limit has a token bucket, shared by all its concurrent downloads.
+  A download takes tokens for the bytes it is about to send and waits while the bucket is in debt
+- With DOWNLOAD_WORKER_BYTES_PER_SECOND, all downloads of the worker also draw from one bucket,
+  granted round robin between the owners (users or share links) waiting, one quantum each per round.
+  An owner streaming ten downloads gets the same share as an owner streaming one
+
+Everything runs on the event loop, waiting downloads only cost a sleeping coroutine.
+"""
+import asyncio
+import time
+import weakref
+from collections import (
+    OrderedDict,
+    deque,
+)
+from typing import (
+    Dict,
+    Optional,
+)
+
+from settings import (
+    DOWNLOAD_BURST_BYTES,
+    DOWNLOAD_WORKER_BYTES_PER_SECOND,
+)
+
+
+class TokenBucket:
+    """
+    Token bucket filled with rate tokens (bytes) per second, holding up to burst tokens.
+
+    Tokens are reserved rather than waited for: the bucket may go into debt, and whoever reserved
+    waits until the debt is paid. Concurrent reservations are therefore served in order.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or DOWNLOAD_BURST_BYTES
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, size: int) -> float:
+        """Take size tokens, returns how many seconds to wait before using them"""
+        self._refill()
+        self.tokens -= size
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class BucketRegistry:
+    """
+    Token buckets by owner key, e.g. "user:12".
+
+    A bucket outlives the downloads using it until it has refilled, so reconnecting does not reset a limit.
+    """
+
+    # Idle buckets are swept once the registry has grown past this many entries, and twice the size of the last sweep
+    SWEEP_THRESHOLD = 1024
+
+    def __init__(self):
+        # Key -> [bucket, number of downloads using it]
+        self._buckets: Dict[str, list] = {}
+        self._sweep_at = self.SWEEP_THRESHOLD
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, rate: int) -> TokenBucket:
+        entry = self._buckets.get(key)
+        if entry is None:
+            if len(self._buckets) >= self._sweep_at:
+                self.sweep()
+            entry = self._buckets[key] = [TokenBucket(rate), 0]
+        # The limit may have changed since the bucket was created
+        entry[0].rate = rate
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, key: str) -> None:
+        entry = self._buckets.get(key)
+        if entry is not None:
+            entry[1] -= 1
+
+    def sweep(self) -> None:
+        """Drop the buckets no download uses which have refilled"""
+        for key, (bucket, users) in list(self._buckets.items()):
+            if users <= 0 and bucket.is_full:
+                del self._buckets[key]
+        self._sweep_at = max(self.SWEEP_THRESHOLD, 2 * len(self._buckets))
+
+
+class FairShare:
+    """Bandwidth of the worker, granted round robin between the owners waiting for it"""
+
+    def __init__(self, rate: int):
+        self.bucket = TokenBucket(rate)
+        # Owner -> (size, future) of the grants it waits for, in the order the owners get their turn
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(self, owner: str, size: int) -> None:
+        """Wait until the owner gets its turn and the worker bandwidth allows size more bytes"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(owner, deque()).append((size, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiting:
+            owner, grants = next(iter(self._waiting.items()))
+            size, future = grants.popleft()
+            if grants:
+                # Next turn goes to the next owner
+                self._waiting.move_to_end(owner)
+            else:
+                del self._waiting[owner]
+            if future.done():
+                # The download was cancelled while waiting
+                continue
+            delay = self.bucket.reserve(size)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not future.done():
+                future.set_result(None)
+
+
+buckets = BucketRegistry()
+
+# One fair share per event loop, its futures and dispatcher belong to the loop
+_fair_shares: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, FairShare]" = weakref.WeakKeyDictionary()
+
+
+def fair_share_enabled() -> bool:
+    return DOWNLOAD_WORKER_BYTES_PER_SECOND > 0
+
+
+def fair_share() -> Optional[FairShare]:
+    """The worker bandwidth shared by the downloads of the running loop, None without DOWNLOAD_WORKER_BYTES_PER_SECOND"""
+    if not fair_share_enabled():
+        return None
+    loop = asyncio.get_running_loop()
+    share = _fair_shares.get(loop)
+    if share is None:
+        share = _fair_shares[loop] = FairShare(DOWNLOAD_WORKER_BYTES_PER_SECOND)
+    return share
@@ -0,0 +1,102 @@
+import asyncio
+from typing import (
+    Optional,
+    Tuple,
+)
+
+from starlette.responses import Response
+from starlette.types import (
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+
+from settings import (
+    DOWNLOAD_USER_BYTES_PER_SECOND,
+    DOWNLOAD_SHARE_BYTES_PER_SECOND,
+    DOWNLOAD_QUANTUM_BYTES,
+)
+from storage.sendfile import without_zerocopy
+from .buckets import (
+    TokenBucket,
+    buckets,
+    fair_share,
+    fair_share_enabled,
+)
+
+# (owner key, bytes per second or 0 for no limit)
+Limit = Tuple[str, int]
+
+
+def user_limit(user) -> Limit:
+    """Download limit of a user, its own one or DOWNLOAD_USER_BYTES_PER_SECOND"""
+    return f"user:{user.id}", user.download_rate_limit or DOWNLOAD_USER_BYTES_PER_SECOND
+
+
+def share_limit(key: str, rate: Optional[int] = None) -> Limit:
+    """Download limit of a share link, its own one or DOWNLOAD_SHARE_BYTES_PER_SECOND"""
+    return f"share:{key}", rate or DOWNLOAD_SHARE_BYTES_PER_SECOND
+
+
+class ThrottledResponse(Response):
+    """
+    Response sending another response at the pace its download limit and the worker bandwidth allow.
+
+    Every body chunk the wrapped response sends waits for its bytes, one DOWNLOAD_QUANTUM_BYTES slice at a time,
+    in the bucket of the limit and in the fair share of the worker, where the limit key is the owner of the download.
+    Works with any response: files, streams, archives. Responses handing the file to nginx (X-Accel-Redirect)
+    get an X-Accel-Limit-Rate header instead, nginx then applies the limit to the connection.
+    The wrapped response does not see the zerocopysend extension, so files are sent in paced chunks too.
+    """
+
+    def __init__(self, response: Response, limit: Limit):
+        self.response = response
+        self.owner, self.rate = limit
+        self.status_code = response.status_code
+        self.background = None
+
+    async def _wait(self, bucket: Optional[TokenBucket], size: int) -> None:
+        share = fair_share()
+        for offset in range(0, size, DOWNLOAD_QUANTUM_BYTES):
+            quantum = min(DOWNLOAD_QUANTUM_BYTES, size - offset)
+            if bucket is not None:
+                delay = bucket.reserve(quantum)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if share is not None:
+                await share.acquire(self.owner, quantum)
+
+    def _accel_limit(self, message: Message) -> Message:
+        headers = list(message.get("headers", []))
+        if self.rate > 0 and any(name.lower() == b"x-accel-redirect" for name, _ in headers):
+            headers.append((b"x-accel-limit-rate", str(self.rate).encode("latin-1")))
+            message = {**message, "headers": headers}
+        return message
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.background is not None and self.response.background is None:
+            self.response.background = self.background
+
+        bucket = buckets.acquire(self.owner, self.rate) if self.rate > 0 else None
+
+        async def throttled_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = self._accel_limit(message)
+            elif message["type"] == "http.response.body":
+                await self._wait(bucket, len(message.get("body", b"")))
+            await send(message)
+
+        try:
+            await self.response(without_zerocopy(scope), receive, throttled_send)
+        finally:
+            if bucket is not None:
+                buckets.release(self.owner)
+
+
+def throttle(response: Response, limit: Limit) -> Response:
+    """Wrap a download response in a ThrottledResponse, unless nothing limits it"""
+    _, rate = limit
+    if rate <= 0 and not fair_share_enabled():
+        return response
+    return ThrottledResponse(response, limit)
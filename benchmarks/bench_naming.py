@@ -0,0 +1,104 @@
+"""
+Benchmark of the storage naming scheme.
+
+Stores N files that were all uploaded as "report.pdf" on the same day and reports the
+per-upload cost in buckets, with both the legacy probing scheme and the current one:
+
+- legacy: uploads/yyyy/m/d/report_<n>.pdf, found by probing os.path.exists() until a free name
+- current: checksum addressed key with bounded fanout (blobs/ab/cd/<sha256>), no probing
+
+The legacy cost grows linearly with the number of files already in the directory,
+the current one stays flat.
+
+Usage:
+    python -m benchmarks.bench_naming --files 10000
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import (
+    Callable,
+    List,
+)
+
+from storage.naming import (
+    blob_key,
+    unique_name,
+)
+
+FILENAME = "report.pdf"
+
+
+def store_legacy(root: str, filename: str, content: bytes) -> str:
+    """The naming scheme used before content addressing, kept here as the baseline"""
+    now = datetime.utcnow()
+    file_dir = os.path.join(root, str(now.year), str(now.month), str(now.day))
+    os.makedirs(file_dir, exist_ok=True)
+
+    file_path = os.path.join(file_dir, filename)
+    file_count = 1
+    while os.path.exists(file_path):
+        name_part, ext = os.path.splitext(filename)
+        file_path = os.path.join(file_dir, f"{name_part}_{file_count}{ext}")
+        file_count += 1
+
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return file_path
+
+
+def store_current(root: str, filename: str, content: bytes) -> str:
+    """The current scheme: write under a random temporary name, then move to the checksum key"""
+    temp_dir = os.path.join(root, ".tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, unique_name())
+    with open(temp_path, "wb") as f:
+        f.write(content)
+
+    path = os.path.join(root, *blob_key(hashlib.sha256(content).hexdigest()).split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return path
+
+
+def run(store: Callable[[str, str, bytes], str], files: int, bucket_size: int) -> List[float]:
+    """Store `files` same-named files and return the mean per-upload time of every bucket in microseconds"""
+    root = tempfile.mkdtemp()
+    try:
+        buckets = []
+        for start in range(0, files, bucket_size):
+            count = min(bucket_size, files - start)
+            began = time.perf_counter()
+            for i in range(start, start + count):
+                store(root, FILENAME, f"%PDF-1.4\n%{i}".encode())
+            buckets.append((time.perf_counter() - began) / count * 1_000_000)
+        return buckets
+    finally:
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10000, help="Number of same-named files to store")
+    parser.add_argument("--bucket-size", type=int, default=1000, help="Number of uploads per reported bucket")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the current scheme")
+    args = parser.parse_args()
+
+    schemes = [("current", store_current)]
+    if not args.skip_legacy:
+        schemes.insert(0, ("legacy", store_legacy))
+
+    print(f"Storing {args.files} files named {FILENAME!r} on the same day")
+    print(f"{'scheme':<10}" + "".join(f"{f'#{i * args.bucket_size}':>10}" for i in range(-(-args.files // args.bucket_size))))
+    for name, store in schemes:
+        buckets = run(store, args.files, args.bucket_size)
+        print(f"{name:<10}" + "".join(f"{value:>8.1f}us" for value in buckets))
+        print(f"{'':<10}last/first bucket ratio: {buckets[-1] / buckets[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
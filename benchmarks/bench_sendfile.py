@@ -0,0 +1,135 @@
+"""
+Benchmark of the CPU cost of sending local files.
+
+Sends one file repeatedly through a socket to a separate process draining it, and reports the CPU time
+(user and system, all threads) the sending process spent per GB, for each way a download can be sent:
+
+- fileresponse: starlette FileResponse, 64KB chunks read in the threadpool, the former download path
+- chunked: SendfileResponse on a server without zerocopysend, DOWNLOAD_CHUNK_SIZE chunks read with pread
+- zerocopysend: SendfileResponse on a server with zerocopysend, the file is sent with os.sendfile
+
+The ASGI server is emulated in process: body messages are written to the socket with sendall,
+zerocopysend messages with os.sendfile, as a server implementing the extension would.
+The file is read once before measuring, so every mode reads it from the page cache.
+
+Usage:
+    python -m benchmarks.bench_sendfile --size 256MB --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import (
+    Callable,
+    Dict,
+    Tuple,
+)
+
+from starlette.responses import (
+    FileResponse,
+    Response,
+)
+
+from storage.sendfile import (
+    ZEROCOPY_EXTENSION,
+    SendfileResponse,
+)
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# Reads and drops everything sent, in its own process so its CPU time is not counted
+DRAIN = "import sys\nwhile sys.stdin.buffer.raw.read(4 * 1024 * 1024):\n    pass\n"
+
+MODES: Dict[str, Tuple[Callable[[str, int], Response], dict]] = {
+    "fileresponse": (lambda path, size: FileResponse(path), {}),
+    "chunked": (lambda path, size: SendfileResponse(path, size), {}),
+    "zerocopysend": (lambda path, size: SendfileResponse(path, size), {ZEROCOPY_EXTENSION: {}}),
+}
+
+
+def parse_size(value: str) -> int:
+    """Parse a size like 64MB, 1GB or 4096"""
+    units = {"KB": 1024, "MB": MB, "GB": GB}
+    value = value.strip().upper()
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def serve(response: Response, extensions: dict, sock: socket.socket) -> int:
+    """Send a response as an ASGI server would, returns the number of body bytes written to the socket"""
+    sent = 0
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sock.sendall(message.get("body", b""))
+            sent += len(message.get("body", b""))
+        elif message["type"] == ZEROCOPY_EXTENSION:
+            fd, offset, count = message["file"].fileno(), message.get("offset", 0), message["count"]
+            while count > 0:
+                written = os.sendfile(sock.fileno(), fd, offset, count)
+                offset += written
+                count -= written
+                sent += written
+
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": extensions}
+    asyncio.run(response(scope, receive, send))
+    return sent
+
+
+def run(mode: str, path: str, size: int, rounds: int) -> Tuple[float, float]:
+    """Send the file rounds times, returns (CPU seconds per GB, MB/s)"""
+    factory, extensions = MODES[mode]
+    server, client = socket.socketpair()
+    drainer = subprocess.Popen([sys.executable, "-c", DRAIN], stdin=client)
+    client.close()
+    try:
+        started, cpu_started = time.perf_counter(), time.process_time()
+        total = 0
+        for _ in range(rounds):
+            total += serve(factory(path, size), extensions, server)
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    finally:
+        server.close()
+        drainer.wait()
+    assert total == size * rounds, f"{mode} sent {total} bytes instead of {size * rounds}"
+    return cpu / (total / GB), total / MB / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=parse_size, default=parse_size("256MB"), help="Size of the file sent")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of times the file is sent per mode")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated modes to run")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".bin")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for _ in range(0, args.size, MB):
+                f.write(os.urandom(min(MB, args.size - f.tell())))
+        with open(path, "rb") as f:
+            while f.read(16 * 1024 * 1024):
+                pass
+
+        print(f"Sending a {args.size / MB:.0f}MB file {args.rounds} times per mode")
+        print(f"{'mode':<14}{'CPU s/GB':>10}{'MB/s':>10}")
+        for mode in args.modes.split(","):
+            cpu_per_gb, throughput = run(mode.strip(), path, args.size, args.rounds)
+            print(f"{mode:<14}{cpu_per_gb:>10.3f}{throughput:>10.0f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from database import get_db
 from models.user import User
+from models.data_room import Folder, File, FileShare
 from auth import decode_token
 
 security = HTTPBearer()
@@ -55,3 +56,80 @@ def get_current_user(
         )
 
     return user
+
+
+def get_owned_folder(
+    folder_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Folder:
+    """
+    Get a folder of a dataroom owned by the current user.
+
+    The folder carries the owner of its dataroom, the check is a primary key lookup without join.
+
+    Raises:
+        - HTTPException 404 if the folder does not exist
+        - HTTPException 403 if the dataroom belongs to another user
+    """
+    db_folder = db.query(Folder).filter(Folder.id == folder_id).first()
+    if db_folder is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    if db_folder.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return db_folder
+
+
+def get_owned_file(
+    file_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> File:
+    """
+    Get a file of a dataroom owned by the current user.
+
+    The file carries the owner of its dataroom, the check is a primary key lookup without join.
+    The blob is loaded along, downloads need its compression.
+
+    Raises:
+        - HTTPException 404 if the file does not exist
+        - HTTPException 403 if the dataroom belongs to another user
+    """
+    db_file = db.query(File).options(joinedload(File.blob)).filter(File.id == file_id).first()
+    if db_file is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if db_file.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return db_file
+
+
+def get_owned_file_share(
+    share_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> FileShare:
+    """
+    Get a share of a file in a dataroom owned by the current user, in one query.
+
+    Raises:
+        - HTTPException 404 if the share does not exist
+        - HTTPException 403 if the dataroom belongs to another user
+    """
+    row = (
+        db.query(FileShare, File.owner_id)
+        .join(FileShare.file)
+        .filter(FileShare.id == share_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Share not found")
+
+    db_share, owner_id = row
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return db_share
@@ -91,6 +91,30 @@ const API = {
         });
     },
 
+    /**
+     * Get every item of a paginated list endpoint
+     * Requests the pages one after the other, following the X-Next-Cursor header
+     *
+     * @param {string} url - URL of the list endpoint, with its filters
+     */
+    requestAllPages: function(url) {
+        const items = [];
+        const separator = url.indexOf('?') === -1 ? '?' : '&';
+
+        const requestPage = function(cursor) {
+            return API.request({
+                url: cursor ? url + separator + 'cursor=' + encodeURIComponent(cursor) : url,
+                type: 'GET',
+                dataType: 'json'
+            }).then(function(page, textStatus, jqXHR) {
+                items.push.apply(items, page);
+                const nextCursor = jqXHR.getResponseHeader('X-Next-Cursor');
+                return nextCursor ? requestPage(nextCursor) : items;
+            });
+        };
+        return requestPage(null);
+    },
+
     /**
      * Health check endpoint
      * Verifies the API server is running
@@ -152,11 +176,7 @@ const API = {
          * GET /api/v0/datarooms
          */
         list: function() {
-            return API.request({
-                url: API_BASE_URL + '/datarooms',
-                type: 'GET',
-                dataType: 'json'
-            });
+            return API.requestAllPages(API_BASE_URL + '/datarooms');
         },
 
         /**
@@ -233,11 +253,7 @@ const API = {
          */
         list: function(dataroomId) {
             const params = dataroomId ? '?dataroom_id=' + dataroomId : '';
-            return API.request({
-                url: API_BASE_URL + '/folders' + params,
-                type: 'GET',
-                dataType: 'json'
-            });
+            return API.requestAllPages(API_BASE_URL + '/folders' + params);
         },
 
         /**
@@ -314,11 +330,7 @@ const API = {
          */
         list: function(folderId) {
             const params = folderId ? '?folder_id=' + folderId : '';
-            return API.request({
-                url: API_BASE_URL + '/files' + params,
-                type: 'GET',
-                dataType: 'json'
-            });
+            return API.requestAllPages(API_BASE_URL + '/files' + params);
         },
 
         /**
@@ -429,11 +441,7 @@ const API = {
          * @param {number} id - File ID
          */
         listShares: function(id) {
-            return API.request({
-                url: API_BASE_URL + '/files/' + id + '/shares',
-                type: 'GET',
-                dataType: 'json'
-            });
+            return API.requestAllPages(API_BASE_URL + '/files/' + id + '/shares');
         },
 
         /**
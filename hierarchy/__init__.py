@@ -0,0 +1,16 @@
+"""
+Hierarchy Module
+
+Loading of the folder trees of data rooms. A whole tree, folders and files, is loaded
+in a fixed number of queries and assembled in memory, so serializing it does not lazy load
+the subfolders and files of every folder one by one.
+
+Every folder stores the ids of its ancestors in its path, e.g. /1/5/, so the subtree of a folder
+and its ancestors are each selected with one indexed query, without walking the tree level by level.
+"""
+from .tree import (
+    load_ancestors,
+    load_dataroom_tree,
+    load_folder_tree,
+    subtree_folders,
+)
@@ -0,0 +1,75 @@
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+from sqlalchemy.orm import (
+    Session,
+    defer,
+)
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import (
+    DataRoom,
+    File,
+    Folder,
+)
+
+
+def _assemble(folders: Iterable[Folder], files: Iterable[File]) -> Dict[Optional[int], List[Folder]]:
+    """
+    Set the subfolders and files of every folder from rows loaded at once, returns the folders by parent id.
+
+    The collections are set as loaded from the database, reading them issues no query
+    and changing them afterwards works as usual.
+    """
+    children: Dict[Optional[int], List[Folder]] = {}
+    files_by_folder: Dict[int, List[File]] = {}
+    for folder in folders:
+        children.setdefault(folder.parent_id, []).append(folder)
+    for file in files:
+        files_by_folder.setdefault(file.folder_id, []).append(file)
+
+    for siblings in children.values():
+        for folder in siblings:
+            set_committed_value(folder, "subfolders", children.get(folder.id, []))
+            set_committed_value(folder, "files", files_by_folder.get(folder.id, []))
+    return children
+
+
+def _files_query(db: Session):
+    # The extracted text is never part of a tree
+    return db.query(File).options(defer(File.text_content)).order_by(File.id)
+
+
+def load_dataroom_tree(db: Session, dataroom: DataRoom) -> List[Folder]:
+    """Top level folders of a dataroom, their subfolders and files loaded down to the leaves, in two queries"""
+    folders = db.query(Folder).filter(Folder.dataroom_id == dataroom.id).order_by(Folder.id).all()
+    files = _files_query(db).filter(File.dataroom_id == dataroom.id).all()
+    return _assemble(folders, files).get(None, [])
+
+
+def subtree_folders(db: Session, folder: Folder):
+    """Query of the folders below a folder, down to the leaves, one range scan of the path index"""
+    return db.query(Folder).filter(Folder.path.like(f"{folder.subtree_path}%"))
+
+
+def load_folder_tree(db: Session, folder: Folder) -> Folder:
+    """A folder with its subfolders and files loaded down to the leaves, in two queries"""
+    subtree = [folder] + subtree_folders(db, folder).order_by(Folder.id).all()
+    files = _files_query(db).filter(File.folder_id.in_([row.id for row in subtree])).all()
+
+    # The folder is in the identity map, it is the same object as the one loaded with the others
+    _assemble(subtree, files)
+    return folder
+
+
+def load_ancestors(db: Session, folder: Folder) -> List[Folder]:
+    """Ancestors of a folder from the top level folder down to its parent, in one query"""
+    ancestor_ids = folder.ancestor_ids
+    if not ancestor_ids:
+        return []
+    by_id = {row.id: row for row in db.query(Folder).filter(Folder.id.in_(ancestor_ids))}
+    return [by_id[ancestor_id] for ancestor_id in ancestor_ids]
@@ -1,10 +1,26 @@
 import os
+import asyncio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from api.router import api_router
+from assets import (
+    AssetFiles,
+    build_assets,
+)
 from logger import logger
+from database import engine
+from storage import (
+    close_storage,
+    collect_released,
+    run_garbage_collector,
+)
+from processing import shutdown_executor
+from usage import (
+    flush_usage,
+    run_usage_flusher,
+)
 from settings import (
     API_TITLE,
     API_DESCRIPTION,
@@ -16,8 +32,9 @@ from settings import (
     CORS_ALLOW_CREDENTIALS,
     CORS_ALLOW_METHODS,
     CORS_ALLOW_HEADERS,
-    UPLOADS_DIRECTORY,
+    CORS_EXPOSE_HEADERS,
     STATIC_DIRECTORY,
+    GC_ENABLED,
 )
 
 
@@ -38,6 +55,11 @@ async def lifespan(app: FastAPI):
     logger.info("Starting the server...")
     logger.info("-" * 40)
 
+    # Remove the contents released by deletes in the background
+    gc_task = asyncio.create_task(run_garbage_collector(engine)) if GC_ENABLED else None
+    # Write the download counters in batches
+    usage_task = asyncio.create_task(run_usage_flusher(engine))
+
     # yield control to the application
     # The application runs while we're "inside" this context
     yield
@@ -45,6 +67,30 @@ async def lifespan(app: FastAPI):
     # SHUTDOWN: This code runs when the server shuts down
     # You can add cleanup logic here if needed
     logger.info(">> Shutting down application...")
+    # Stop the counters writer, then write the downloads of the last requests
+    usage_task.cancel()
+    try:
+        await usage_task
+    except asyncio.CancelledError:
+        pass
+    try:
+        await run_in_threadpool(flush_usage, engine)
+    except Exception:
+        logger.exception("Writing download counters failed")
+    # Stop the garbage collector, then collect what the last requests released
+    if gc_task is not None:
+        gc_task.cancel()
+        try:
+            await gc_task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await collect_released(engine)
+        except Exception:
+            logger.exception("Collecting released contents failed")
+    # Close pooled storage connections and stop the processing pool
+    await close_storage()
+    shutdown_executor()
     logger.info("-" * 40)
     logger.info(">> Cleanup completed. The server has stopped.")
     logger.info("-" * 40)
@@ -67,13 +113,9 @@ app.add_middleware(
     allow_credentials=CORS_ALLOW_CREDENTIALS,
     allow_methods=CORS_ALLOW_METHODS,
     allow_headers=CORS_ALLOW_HEADERS,
+    expose_headers=CORS_EXPOSE_HEADERS,
 )
 
-# Mount static files directory for serving uploaded files
-# This allows clients to download files from /uploads/ URL
-app.mount("/uploads", StaticFiles(directory=UPLOADS_DIRECTORY), name=UPLOADS_DIRECTORY)
-
-
 # Define API endpoints BEFORE mounting static files
 # This ensures they take precedence over the catch-all static mount
 @app.get("/health")
@@ -90,5 +132,5 @@ def health_check():
 # This makes all the endpoints defined in routes.py available
 app.include_router(api_router)
 
-# Serve static frontend files
-app.mount("/", StaticFiles(directory=STATIC_DIRECTORY, html=True), name=STATIC_DIRECTORY)
+# Serve the static frontend, built when the sources changed since the last build
+app.mount("/", AssetFiles(build_assets(), html=True), name=STATIC_DIRECTORY)
@@ -0,0 +1,45 @@
+"""add materialized path to folders
+
+Revision ID: 0529fd3b80ad
+Revises: 7238d951cef3
+Create Date: 2026-10-17 01:32:18.897550
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0529fd3b80ad'
+down_revision: Union[str, None] = '7238d951cef3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Added nullable, filled from the top level down, then made mandatory and indexed
+    op.add_column('folder', sa.Column('path', sa.String(length=1024), nullable=True))
+
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        bind.execute(sa.text("UPDATE folder SET path = '/' WHERE parent_id IS NULL"))
+        # One statement per level of the deepest tree, each one fills the children of the folders filled before
+        while bind.execute(sa.text(
+            "UPDATE folder SET path = ("
+            "SELECT parent.path || CAST(parent.id AS VARCHAR) || '/' FROM folder AS parent "
+            "WHERE parent.id = folder.parent_id"
+            ") WHERE path IS NULL AND parent_id IN (SELECT id FROM folder WHERE path IS NOT NULL)"
+        )).rowcount:
+            pass
+
+    with op.batch_alter_table('folder') as batch_op:
+        batch_op.alter_column('path', existing_type=sa.String(length=1024), nullable=False)
+        batch_op.create_index('ix_folder_path', ['path'], unique=False, postgresql_ops={'path': 'varchar_pattern_ops'})
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('folder') as batch_op:
+        batch_op.drop_index('ix_folder_path', postgresql_ops={'path': 'varchar_pattern_ops'})
+        batch_op.drop_column('path')
@@ -0,0 +1,45 @@
+"""index list keys for keyset pagination
+
+Revision ID: 20f98bb2ca39
+Revises: 0529fd3b80ad
+Create Date: 2026-10-17 01:39:11.043964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20f98bb2ca39'
+down_revision: Union[str, None] = '0529fd3b80ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column) of the lists paged by id, each single column index is replaced by a (column, id) one
+LIST_KEYS = [
+    ('dataroom', 'owner_id'),
+    ('folder', 'dataroom_id'),
+    ('folder', 'owner_id'),
+    ('file', 'folder_id'),
+    ('file', 'dataroom_id'),
+    ('file', 'owner_id'),
+    ('file_share', 'file_id'),
+]
+
+
+def upgrade() -> None:
+    # The new indexes are created first, lookups by the column never go without one
+    for table, column in LIST_KEYS:
+        op.create_index(f'ix_{table}_{column}_id', table, [column, 'id'], unique=False)
+    for table, column in LIST_KEYS:
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
+
+
+def downgrade() -> None:
+    for table, column in LIST_KEYS:
+        op.create_index(f'ix_{table}_{column}', table, [column], unique=False)
+    for table, column in LIST_KEYS:
+        op.drop_index(f'ix_{table}_{column}_id', table_name=table)
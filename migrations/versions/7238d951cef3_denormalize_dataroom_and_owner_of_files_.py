@@ -0,0 +1,74 @@
+"""Denormalize dataroom and owner of files and folders
+
+Revision ID: 7238d951cef3
+Revises: 884367ae7886
+Create Date: 2026-10-17 01:21:46.399896
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7238d951cef3'
+down_revision: Union[str, None] = '884367ae7886'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Rows are backfilled in id ranges of this size, each range committed on its own so no lock is held for long
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _backfill(table: str, statement: str) -> None:
+    bind = op.get_bind()
+    last_id = bind.execute(sa.text(f"SELECT MAX(id) FROM {table}")).scalar() or 0
+    with op.get_context().autocommit_block():
+        for start in range(0, last_id + 1, BACKFILL_BATCH_SIZE):
+            bind.execute(sa.text(statement), {"start": start, "end": start + BACKFILL_BATCH_SIZE})
+
+
+def upgrade() -> None:
+    # Added nullable, filled from the parents, then made mandatory and indexed
+    op.add_column('folder', sa.Column('owner_id', sa.Integer(), nullable=True))
+    op.add_column('file', sa.Column('dataroom_id', sa.Integer(), nullable=True))
+    op.add_column('file', sa.Column('owner_id', sa.Integer(), nullable=True))
+
+    _backfill("folder", (
+        "UPDATE folder SET owner_id = (SELECT dataroom.owner_id FROM dataroom WHERE dataroom.id = folder.dataroom_id) "
+        "WHERE id >= :start AND id < :end"
+    ))
+    _backfill("file", (
+        "UPDATE file SET "
+        "dataroom_id = (SELECT folder.dataroom_id FROM folder WHERE folder.id = file.folder_id), "
+        "owner_id = (SELECT folder.owner_id FROM folder WHERE folder.id = file.folder_id) "
+        "WHERE id >= :start AND id < :end"
+    ))
+
+    with op.batch_alter_table('folder') as batch_op:
+        batch_op.alter_column('owner_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_folder_owner_id'), ['owner_id'], unique=False)
+        batch_op.create_foreign_key('fk_folder_owner_id_user', 'user', ['owner_id'], ['id'])
+    with op.batch_alter_table('file') as batch_op:
+        batch_op.alter_column('dataroom_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('owner_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_file_dataroom_id'), ['dataroom_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_file_owner_id'), ['owner_id'], unique=False)
+        batch_op.create_foreign_key('fk_file_dataroom_id_dataroom', 'dataroom', ['dataroom_id'], ['id'])
+        batch_op.create_foreign_key('fk_file_owner_id_user', 'user', ['owner_id'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('file') as batch_op:
+        batch_op.drop_constraint('fk_file_owner_id_user', type_='foreignkey')
+        batch_op.drop_constraint('fk_file_dataroom_id_dataroom', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_file_owner_id'))
+        batch_op.drop_index(batch_op.f('ix_file_dataroom_id'))
+        batch_op.drop_column('owner_id')
+        batch_op.drop_column('dataroom_id')
+    with op.batch_alter_table('folder') as batch_op:
+        batch_op.drop_constraint('fk_folder_owner_id_user', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_folder_owner_id'))
+        batch_op.drop_column('owner_id')
@@ -0,0 +1,43 @@
+"""Store storage keys instead of upload paths
+
+Revision ID: e63bff1b184c
+Revises: 00f886690c40
+Create Date: 2026-10-16 23:39:48.122378
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e63bff1b184c'
+down_revision: Union[str, None] = '00f886690c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Paths used to be relative to the working directory and start with the uploads directory.
+# Storage keys are relative to the root of the storage backend instead.
+UPLOADS_PREFIX = 'uploads/'
+
+
+def upgrade() -> None:
+    for table in ('file', 'blob'):
+        op.execute(
+            sa.text(
+                f"UPDATE {table} SET file_path = substr(file_path, :start) "
+                f"WHERE file_path LIKE :prefix"
+            ).bindparams(start=len(UPLOADS_PREFIX) + 1, prefix=f"{UPLOADS_PREFIX}%")
+        )
+
+
+def downgrade() -> None:
+    for table in ('file', 'blob'):
+        op.execute(
+            sa.text(
+                f"UPDATE {table} SET file_path = :prefix || file_path "
+                f"WHERE file_path NOT LIKE '/%'"
+            ).bindparams(prefix=UPLOADS_PREFIX)
+        )
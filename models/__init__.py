@@ -5,3 +5,7 @@ from .data_room import (
     FileShare,
 )
 from .user import User
+from .blob import Blob
+from .upload_session import UploadSession
+from .share_revocation import ShareRevocation
+from .page_index import PageIndex
@@ -0,0 +1,36 @@
+from database import Base
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.orm import relationship
+
+
+class Blob(Base):
+    """
+    Blob Model - Represents a stored file content, addressed by its SHA-256 checksum.
+
+    Identical uploads share one blob, so their content is written to disk only once.
+    The blob is removed when the last File pointing at it is deleted.
+
+    Attrs:
+        - id: Unique identifier (primary key)
+        - checksum: Hex encoded SHA-256 digest of the content (unique)
+        - file_path: Storage key of the content in the storage backend
+        - size: Size of the content in bytes, as uploaded
+        - stored_size: Size of the content in storage, smaller than size if it is compressed
+        - compression: Codec the content is compressed with in storage (zlib, zstd), None if it is not
+        - ref_count: Number of File rows pointing at this blob
+        - created_at: Timestamp when the content was first stored
+        - files: Relationship to all files sharing this content
+    """
+    __tablename__ = "blob"
+
+    id = Column(Integer, primary_key=True, index=True)
+    checksum = Column(String(64), nullable=False, unique=True, index=True)
+    file_path = Column(String(512), nullable=False)
+    size = Column(BigInteger, nullable=False, default=0)
+    stored_size = Column(BigInteger, nullable=True)
+    compression = Column(String(10), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    files = relationship("File", back_populates="blob")
@@ -1,8 +1,10 @@
 import secrets
 from database import Base
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, BigInteger
+from typing import List
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, BigInteger, JSON, Index, event, func, literal, select, update
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import get_history
 
 
 class DataRoom(Base):
@@ -20,11 +22,15 @@ class DataRoom(Base):
         - folders: Relationship to all folders in this data room
     """
     __tablename__ = "dataroom"
+    __table_args__ = (
+        # Lists of an owner's data rooms are paged by id
+        Index("ix_dataroom_owner_id_id", "owner_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
     description = Column(Text, nullable=True)
-    owner_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -44,23 +50,45 @@ class Folder(Base):
         - id: Unique identifier (primary key)
         - name: The name of the folder
         - dataroom_id: Foreign key linking to the DataRoom
+        - owner_id: Owner of the dataroom, copied from it so ownership checks need no join
         - parent_id: Foreign key linking to parent Folder (for nesting)
+        - path: Ids of the ancestors from the top level down, as /1/5/ ("/" for top level folders)
         - created_at: Timestamp when the folder was created
         - updated_at: Timestamp when the folder was last updated
         - dataroom: Relationship to the parent DataRoom
         - parent: Relationship to parent Folder
         - subfolders: Relationship to child Folders
         - files: Relationship to all files in this folder
+        - upload_sessions: Relationship to unfinished uploads into this folder
     """
     __tablename__ = "folder"
+    __table_args__ = (
+        # Subtrees are selected with path LIKE '/1/5/%', which on PostgreSQL needs pattern ops whatever the collation
+        Index("ix_folder_path", "path", postgresql_ops={"path": "varchar_pattern_ops"}),
+        # Lists of folders are paged by id within a dataroom or an owner
+        Index("ix_folder_dataroom_id_id", "dataroom_id", "id"),
+        Index("ix_folder_owner_id_id", "owner_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
-    dataroom_id = Column(Integer, ForeignKey("dataroom.id"), nullable=False, index=True)
+    dataroom_id = Column(Integer, ForeignKey("dataroom.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     parent_id = Column(Integer, ForeignKey("folder.id"), nullable=True, index=True)
+    path = Column(String(1024), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    @property
+    def subtree_path(self) -> str:
+        """Prefix of the path of every folder below this one"""
+        return f"{self.path}{self.id}/"
+
+    @property
+    def ancestor_ids(self) -> List[int]:
+        """Ids of the ancestors, from the top level folder down to the parent"""
+        return [int(part) for part in self.path.split("/") if part]
+
     # Relationship: many Folders belong to one DataRoom
     dataroom = relationship("DataRoom", back_populates="folders")
 
@@ -83,6 +111,9 @@ class Folder(Base):
     # Relationship: one Folder has many Files
     files = relationship("File", back_populates="folder", cascade="all, delete-orphan")
 
+    # Relationship: unfinished uploads targeting this folder are dropped together with it
+    upload_sessions = relationship("UploadSession", back_populates="folder", cascade="all, delete-orphan")
+
 
 class File(Base):
     """
@@ -92,29 +123,133 @@ class File(Base):
         - id: Unique identifier (primary key)
         - name: The display name of the file
         - folder_id: Foreign key linking to the Folder
-        - file_path: The actual path to the file on disk
-        - file_size: Size of the file in bytes
+        - dataroom_id: DataRoom of the folder, copied from it so access checks and listings need no join
+        - owner_id: Owner of the dataroom, copied from the folder as well
+        - file_path: Storage key of the file content (shared by files with identical content)
+        - file_size: Size of the file in bytes, as uploaded
+        - stored_size: Size of the file content in storage, smaller than file_size if it is compressed
         - file_type: The type of file (always 'pdf' for now)
+        - checksum: Hex encoded SHA-256 digest of the file content
+        - blob_id: Foreign key linking to the Blob holding the content
+        - processing_status: State of the post-upload processing (pending, processing, done, failed)
+        - processing_error: Why the processing failed, if it did
+        - page_count: Number of pages, once processed
+        - document_metadata: Document information (title, author, ...), once processed
+        - text_content: Text extracted from the document, once processed
+        - processed_at: Timestamp when the processing finished
+        - signed_share_expires_at: Expiry of the last signed share link of the file still to expire, if any
+        - download_count: Number of downloads, directly and through shares (written in batches, may lag a little)
+        - last_downloaded_at: Timestamp of the last download
         - created_at: Timestamp when the file was created
         - updated_at: Timestamp when the file was last updated
         - folder: Relationship to the parent Folder
+        - blob: Relationship to the stored content
     """
     __tablename__ = "file"
+    __table_args__ = (
+        # Lists of files are paged by id within a folder, a dataroom or an owner
+        Index("ix_file_folder_id_id", "folder_id", "id"),
+        Index("ix_file_dataroom_id_id", "dataroom_id", "id"),
+        Index("ix_file_owner_id_id", "owner_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
-    folder_id = Column(Integer, ForeignKey("folder.id"), nullable=False, index=True)
+    folder_id = Column(Integer, ForeignKey("folder.id"), nullable=False)
+    dataroom_id = Column(Integer, ForeignKey("dataroom.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     file_path = Column(String(512), nullable=False)
     file_size = Column(BigInteger, default=0)
+    stored_size = Column(BigInteger, nullable=True)
     file_type = Column(String(50), default="pdf")
+    checksum = Column(String(64), nullable=True)
+    blob_id = Column(Integer, ForeignKey("blob.id"), nullable=True, index=True)
+    processing_status = Column(String(20), nullable=False, default="pending", index=True)
+    processing_error = Column(Text, nullable=True)
+    page_count = Column(Integer, nullable=True)
+    document_metadata = Column(JSON, nullable=True)
+    text_content = Column(Text, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    signed_share_expires_at = Column(DateTime, nullable=True)
+    download_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_downloaded_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship: many Files belong to one Folder
     folder = relationship("Folder", back_populates="files")
+    blob = relationship("Blob", back_populates="files")
     shares = relationship("FileShare", back_populates="file", cascade="all, delete-orphan")
 
 
+def _copy_folder_owner(connection, target: Folder) -> None:
+    target.owner_id = connection.execute(
+        select(DataRoom.owner_id).where(DataRoom.id == target.dataroom_id)
+    ).scalar()
+
+
+def _copy_file_location(connection, target: File) -> None:
+    row = connection.execute(
+        select(Folder.dataroom_id, Folder.owner_id).where(Folder.id == target.folder_id)
+    ).first()
+    if row is not None:
+        target.dataroom_id, target.owner_id = row
+
+
+def _parent_path(connection, parent_id) -> str:
+    if parent_id is None:
+        return "/"
+    path = connection.execute(select(Folder.path).where(Folder.id == parent_id)).scalar()
+    return f"{path}{parent_id}/"
+
+
+def _move_subtree(connection, target: Folder, old_path: str) -> None:
+    """Rewrite the paths below a folder whose path changed from old_path, in one statement"""
+    old_prefix = f"{old_path}{target.id}/"
+    connection.execute(
+        update(Folder)
+        .where(Folder.path.like(f"{old_prefix}%"))
+        .values(path=literal(target.subtree_path) + func.substr(Folder.path, len(old_prefix) + 1))
+    )
+
+
+# The owner_id of folders and the dataroom_id and owner_id of files are copies, kept in line by these hooks.
+# Endpoints creating rows set them from the parent they already loaded, the lookups only run for rows
+# created without them and for rows moved to another parent.
+# The same goes for the path of folders. Moving a folder rewrites the paths of its subtree in the database,
+# descendants already loaded keep their former path until they are expired, as at the end of the transaction.
+
+@event.listens_for(Folder, "before_insert")
+def _folder_inserted(mapper, connection, target):
+    if target.owner_id is None:
+        _copy_folder_owner(connection, target)
+    if target.path is None:
+        target.path = _parent_path(connection, target.parent_id)
+
+
+@event.listens_for(Folder, "before_update")
+def _folder_updated(mapper, connection, target):
+    if get_history(target, "dataroom_id").has_changes():
+        _copy_folder_owner(connection, target)
+    if get_history(target, "parent_id").has_changes():
+        old_path = target.path
+        target.path = _parent_path(connection, target.parent_id)
+        if target.path != old_path:
+            _move_subtree(connection, target, old_path)
+
+
+@event.listens_for(File, "before_insert")
+def _file_inserted(mapper, connection, target):
+    if target.dataroom_id is None or target.owner_id is None:
+        _copy_file_location(connection, target)
+
+
+@event.listens_for(File, "before_update")
+def _file_updated(mapper, connection, target):
+    if get_history(target, "folder_id").has_changes():
+        _copy_file_location(connection, target)
+
+
 class FileShare(Base):
     """
     FileShare Model - Represents a shareable link for a file.
@@ -125,14 +260,24 @@ class FileShare(Base):
         - token: Unique token for the share link
         - created_at: Timestamp when the share was created
         - expires_at: Optional expiration timestamp (None = never expires)
+        - download_count: Number of downloads through the share (written in batches, may lag a little)
+        - last_accessed_at: Timestamp of the last download through the share
+        - download_rate_limit: Download limit of the share in bytes per second, None for the default one
         - file: Relationship to the shared File
     """
     __tablename__ = "file_share"
+    __table_args__ = (
+        # Lists of the shares of a file are paged by id
+        Index("ix_file_share_file_id_id", "file_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    file_id = Column(Integer, ForeignKey("file.id"), nullable=False, index=True)
+    file_id = Column(Integer, ForeignKey("file.id"), nullable=False)
     token = Column(String(64), nullable=False, unique=True, index=True, default=lambda: secrets.token_urlsafe(48))
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=False, default=lambda: datetime.utcnow() + timedelta(days=1))
+    download_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_accessed_at = Column(DateTime, nullable=True)
+    download_rate_limit = Column(BigInteger, nullable=True)
 
     file = relationship("File", back_populates="shares")
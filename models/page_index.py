@@ -0,0 +1,35 @@
+from database import Base
+from sqlalchemy import Column, Integer, ForeignKey, Text, JSON, UniqueConstraint
+
+
+class PageIndex(Base):
+    """
+    PageIndex Model - Where the objects of one page of a stored PDF content are.
+
+    Built by the processing pipeline once per blob, so identical uploads share it.
+    Lets a page range be extracted from range reads of the stored file, without parsing the document.
+    The rows are deleted together with their blob.
+
+    Attrs:
+        - id: Unique identifier (primary key)
+        - blob_id: Foreign key to the indexed content
+        - page_number: Position of the page in the document, starting at 1
+        - object_number: Object number of the page dictionary
+        - generation: Generation number of the page dictionary
+        - dictionary: Serialized page dictionary, with inherited attributes and without /Parent
+        - objects: [object number, generation, offset, length] of every object the page needs, by offset
+        - inline_objects: Serialized objects the page needs which are compressed in the file, by object number
+    """
+    __tablename__ = "page_index"
+    __table_args__ = (
+        UniqueConstraint("blob_id", "page_number", name="uq_page_index_blob_page"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    blob_id = Column(Integer, ForeignKey("blob.id"), nullable=False, index=True)
+    page_number = Column(Integer, nullable=False)
+    object_number = Column(Integer, nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+    dictionary = Column(Text, nullable=False)
+    objects = Column(JSON, nullable=False)
+    inline_objects = Column(JSON, nullable=False)
@@ -0,0 +1,25 @@
+from database import Base
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime
+
+
+class ShareRevocation(Base):
+    """
+    ShareRevocation Model - Revokes the signed share links of a file.
+
+    Signed share links are verified without the database, so they cannot be deleted like FileShare rows.
+    Instead, every signed link of the file issued up to revoked_at is rejected.
+    The file id is not a foreign key, the row outlives the file when the file is deleted.
+
+    Attrs:
+        - id: Unique identifier (primary key)
+        - file_id: Id of the file whose signed links are revoked
+        - revoked_at: Links issued up to this timestamp are revoked
+        - expires_at: Timestamp after which every revoked link has expired anyway, the row can be dropped
+    """
+    __tablename__ = "share_revocation"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,46 @@
+from database import Base
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy.orm import relationship
+
+from settings import UPLOAD_SESSION_EXPIRE_HOURS
+
+
+class UploadSession(Base):
+    """
+    UploadSession Model - Represents a resumable upload that is still in progress.
+
+    The bytes received so far are kept in a partial file on disk. Once all of them
+    have arrived, the session is finalized into a regular File and removed.
+
+    Attrs:
+        - id: Unique identifier (primary key)
+        - user_id: Foreign key linking to the User who started the upload
+        - folder_id: Foreign key linking to the Folder the file will be stored in
+        - name: The display name the file will get
+        - filename: The original name of the uploaded file
+        - total_size: Announced size of the whole file in bytes
+        - received_size: Number of bytes persisted so far (the committed offset)
+        - created_at: Timestamp when the session was created
+        - updated_at: Timestamp when the last chunk was received
+        - expires_at: Timestamp after which the session can no longer be resumed
+        - folder: Relationship to the target Folder
+    """
+    __tablename__ = "upload_session"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
+    folder_id = Column(Integer, ForeignKey("folder.id"), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    filename = Column(String(255), nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received_size = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = Column(
+        DateTime,
+        nullable=False,
+        default=lambda: datetime.utcnow() + timedelta(hours=UPLOAD_SESSION_EXPIRE_HOURS)
+    )
+
+    folder = relationship("Folder", back_populates="upload_sessions")
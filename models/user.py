@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -15,6 +15,7 @@ class User(Base):
         - hashed_password: Bcrypt hashed password
         - is_active: Whether the account is active
         - created_at: Timestamp when the account was created
+        - download_rate_limit: Download limit of the user in bytes per second, None for the default one
         - datarooms: Relationship to all datarooms owned by this user
     """
     __tablename__ = "user"
@@ -25,6 +26,7 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    download_rate_limit = Column(BigInteger, nullable=True)
 
     # Relationship: one User has many DataRooms
     datarooms = relationship("DataRoom", back_populates="owner", cascade="all, delete-orphan")
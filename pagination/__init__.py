@@ -0,0 +1,14 @@
+"""
+Pagination Module
+
+Keyset pagination of list endpoints. A page is the next rows after the key of the last row of the previous page,
+in the order of an indexed column, so every page costs the same whatever its position and the size of the table.
+The key travels in an opaque cursor, sent back in the X-Next-Cursor header while more rows follow.
+"""
+from .keyset import (
+    NEXT_CURSOR_HEADER,
+    Page,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
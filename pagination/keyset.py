@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from typing import (
+    List,
+    Optional,
+)
+
+from fastapi import (
+    HTTPException,
+    Query,
+    Response,
+)
+from sqlalchemy.orm import (
+    InstrumentedAttribute,
+    Query as SqlQuery,
+)
+
+from settings import (
+    PAGE_SIZE,
+    PAGE_SIZE_MAX,
+)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(key: int) -> str:
+    """Opaque cursor of the page starting after key"""
+    return base64.urlsafe_b64encode(json.dumps([key]).encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Key a cursor starts after, raises a 400 for cursors not made by encode_cursor"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        key = None
+    if not isinstance(key, list) or len(key) != 1 or type(key[0]) is not int:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key[0]
+
+
+class Page:
+    """Dependency reading the page a list request asks for: ?cursor=...&limit=..."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        limit: int = Query(PAGE_SIZE, ge=1, le=PAGE_SIZE_MAX, description="Maximum number of items in the page"),
+    ):
+        self.after = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+
+
+def paginate(query: SqlQuery, key: InstrumentedAttribute, page: Page, response: Response) -> List:
+    """
+    Rows of a page of a query, ordered by key, an indexed column with unique values such as the id.
+
+    Fetches one row more than the page holds to know whether another page follows,
+    and sets the cursor of that page in the response headers if so.
+    """
+    if page.after is not None:
+        query = query.filter(key > page.after)
+    rows = query.order_by(key).limit(page.limit + 1).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(rows[-1], key.key))
+    return rows
@@ -0,0 +1,27 @@
+"""
+Processing Module
+
+Post-upload pipeline: validates stored documents, extracts their page count,
+metadata and text and indexes their pages in a background process pool.
+"""
+from .pipeline import (
+    ProcessingError,
+    ProcessingResult,
+    process_document,
+)
+from .pages import (
+    IndexedPage,
+    build_page_index,
+    extract_pages,
+)
+from .runner import (
+    PROCESSING_PENDING,
+    PROCESSING_RUNNING,
+    PROCESSING_DONE,
+    PROCESSING_FAILED,
+    get_executor,
+    shutdown_executor,
+    process_file,
+    process_files,
+    extract_file_pages,
+)
@@ -0,0 +1,255 @@
+"""
+Page index of PDF documents.
+
+Built once per stored content by the processing pipeline. For every page, it records the objects the page
+needs (content streams, resources, fonts, images, annotations) and where they are in the stored file,
+so a standalone PDF of a few pages is assembled from range reads, without parsing the document again.
+
+- Objects written as they are in the file are copied byte for byte from their offset
+- Objects inside compressed object streams cannot be read on their own, they are serialized into the index
+- The page dictionary is serialized into the index too, with the attributes it inherits from the page tree
+- References to other pages and to the page tree are left out and dangle in the extract,
+  PDF readers treat them as null (e.g. links to pages which are not part of the extract)
+
+Runs in the processing pool, like the other stages.
+"""
+import mmap
+import re
+from dataclasses import (
+    dataclass,
+    field,
+)
+from io import BytesIO
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+# Indirect references in raw object bytes, "12 0 R"
+REFERENCE_PATTERN = re.compile(rb"(\d+)\s+(\d+)\s+R(?![A-Za-z])")
+STREAM_PATTERN = re.compile(rb"stream(?:\r\n|\n)")
+# Length of a stream, direct or as a reference, not to be confused with /Length1 and co. of font files
+LENGTH_PATTERN = re.compile(rb"/Length(?![0-9A-Za-z])\s*(\d+)(?:\s+(\d+)\s+R)?")
+
+
+@dataclass
+class IndexedPage:
+    """
+    What extracting one page of a document takes.
+
+    Attrs:
+        - page_number: Position of the page in the document, starting at 1
+        - object_number: Object number of the page dictionary
+        - generation: Generation number of the page dictionary
+        - dictionary: Serialized page dictionary, with inherited attributes and without /Parent
+        - objects: [object number, generation, offset, length] of every object to copy from the file
+        - inline_objects: Serialized objects which are compressed in the file, by object number
+    """
+    page_number: int
+    object_number: int
+    generation: int
+    dictionary: str
+    objects: List[List[int]] = field(default_factory=list)
+    inline_objects: Dict[str, str] = field(default_factory=dict)
+
+
+def _serialize(obj) -> str:
+    stream = BytesIO()
+    obj.write_to_stream(stream)
+    # PDF syntax is bytes, latin-1 keeps every byte of binary strings as one character
+    return stream.getvalue().decode("latin-1")
+
+
+def _references(obj) -> Iterator[Tuple[int, int]]:
+    """Object and generation numbers of the references in an object, /Parent links excluded"""
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        IndirectObject,
+    )
+
+    pending = [obj]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, IndirectObject):
+            yield value.idnum, value.generation
+        elif isinstance(value, DictionaryObject):
+            pending.extend(item for key, item in value.items() if key != "/Parent")
+        elif isinstance(value, ArrayObject):
+            pending.extend(value)
+
+
+def _page_tree_objects(reader) -> Set[int]:
+    """Object numbers of the catalog and the intermediate nodes of the page tree, which no extract copies"""
+    root = reader.trailer.raw_get("/Root")
+    numbers = {root.idnum}
+    pending = [root.get_object().raw_get("/Pages")]
+    while pending:
+        reference = pending.pop()
+        node = reference.get_object()
+        if reference.idnum in numbers or node.get("/Type") != "/Pages":
+            continue
+        numbers.add(reference.idnum)
+        pending.extend(node["/Kids"])
+    return numbers
+
+
+class _Indexer:
+    """Walks the objects of a document once, remembering the references and bounds of each of them"""
+
+    def __init__(self, reader, data):
+        self.reader = reader
+        self.data = data
+        self.offsets: Dict[int, Tuple[int, int]] = {}
+        for generation, numbers in reader.xref.items():
+            for number, offset in numbers.items():
+                self.offsets[number] = (generation, offset)
+        self._references: Dict[int, Set[Tuple[int, int]]] = {}
+        self._bounds: Dict[int, Tuple[int, int]] = {}
+        self._inline: Dict[int, str] = {}
+
+    def _raw_bounds(self, number: int, obj) -> Tuple[int, int]:
+        """Offset and length of an object written as it is, from "N G obj" to "endobj" """
+        from pypdf.generic import (
+            IndirectObject,
+            StreamObject,
+        )
+
+        _, offset = self.offsets[number]
+        end = offset
+        if isinstance(obj, StreamObject):
+            match = STREAM_PATTERN.search(self.data, offset)
+            length = match and LENGTH_PATTERN.search(self.data, offset, match.start())
+            if not length:
+                raise ValueError(f"Stream of object {number} not found")
+            if length.group(2) is None:
+                end = match.end() + int(length.group(1))
+            else:
+                end = match.end() + int(IndirectObject(int(length.group(1)), int(length.group(2)), self.reader).get_object())
+        end = self.data.find(b"endobj", end)
+        if end < 0:
+            raise ValueError(f"End of object {number} not found")
+        return offset, end + len(b"endobj") - offset
+
+    def visit(self, number: int, generation: int) -> Set[Tuple[int, int]]:
+        """References of an object, and where to find its content"""
+        if number in self._references:
+            return self._references[number]
+
+        from pypdf.generic import IndirectObject
+
+        obj = IndirectObject(number, generation, self.reader).get_object()
+        references = set(_references(obj))
+        if number in self.offsets:
+            offset, length = self._bounds[number] = self._raw_bounds(number, obj)
+            # The raw bytes may hold references pypdf resolved while reading, e.g. an indirect stream /Length
+            header = self.data[offset:offset + length]
+            match = STREAM_PATTERN.search(header)
+            if match is not None:
+                header = header[:match.start()]
+            for ref_number, ref_generation in REFERENCE_PATTERN.findall(header):
+                if int(ref_number) != number:
+                    references.add((int(ref_number), int(ref_generation)))
+        elif obj is not None:
+            self._inline[number] = _serialize(obj)
+        self._references[number] = references
+        return references
+
+    def index_page(self, page_number: int, page, excluded: Set[int]) -> IndexedPage:
+        from pypdf.generic import (
+            DictionaryObject,
+            NameObject,
+        )
+
+        reference = page.indirect_reference
+        dictionary = DictionaryObject({
+            NameObject(key): value for key, value in page.items() if key != "/Parent"
+        })
+        indexed = IndexedPage(
+            page_number=page_number,
+            object_number=reference.idnum,
+            generation=reference.generation,
+            dictionary=_serialize(dictionary),
+        )
+
+        seen = {reference.idnum}
+        pending = list(_references(dictionary))
+        while pending:
+            number, generation = pending.pop()
+            if number in seen or number in excluded:
+                continue
+            seen.add(number)
+            pending.extend(self.visit(number, generation))
+            if number in self._bounds:
+                offset, length = self._bounds[number]
+                indexed.objects.append([number, self.offsets[number][0], offset, length])
+            elif number in self._inline:
+                indexed.inline_objects[str(number)] = self._inline[number]
+        indexed.objects.sort(key=lambda item: item[2])
+        return indexed
+
+
+def build_page_index(path: str) -> Optional[List[IndexedPage]]:
+    """
+    Index the pages of a PDF document.
+
+    Returns None if the document cannot be indexed (encrypted, or damaged in a way pypdf repaired while
+    reading), its pages are then extracted by parsing the whole document.
+    """
+    # Imported here so the API process does not pay for it
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
+
+    with open(path, "rb") as f:
+        if not f.read(1):
+            return None
+        f.seek(0)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            reader = PdfReader(f)
+            if reader.is_encrypted:
+                return None
+            excluded = _page_tree_objects(reader)
+            page_numbers = {page.indirect_reference.idnum for page in reader.pages}
+            excluded |= page_numbers
+            indexer = _Indexer(reader, data)
+            return [indexer.index_page(number, page, excluded) for number, page in enumerate(reader.pages, 1)]
+        except (PdfReadError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        finally:
+            data.close()
+
+
+def extract_pages(path: str, first: int, last: int) -> Optional[bytes]:
+    """
+    Extract pages first to last (both inclusive, starting at 1) of a PDF document by parsing it.
+
+    Used for documents without a page index. Returns None if the document has fewer than last pages.
+
+    Raises:
+        - ProcessingError if the document is not a readable PDF
+    """
+    from pypdf import (
+        PdfReader,
+        PdfWriter,
+    )
+    from pypdf.errors import PdfReadError
+
+    from .pipeline import ProcessingError
+
+    try:
+        reader = PdfReader(path)
+        if len(reader.pages) < last:
+            return None
+        writer = PdfWriter()
+        for page in reader.pages[first - 1:last]:
+            writer.add_page(page)
+        buffer = BytesIO()
+        writer.write(buffer)
+    except (PdfReadError, ValueError, KeyError, TypeError) as e:
+        raise ProcessingError(f"Could not read PDF document: {e}")
+    return buffer.getvalue()
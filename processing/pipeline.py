@@ -0,0 +1,98 @@
+"""
+Post-upload processing stages.
+
+These functions run in worker processes of the processing pool, so they only take
+plain arguments and must not touch the database or the event loop.
+"""
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from .pages import (
+    IndexedPage,
+    build_page_index,
+)
+
+# PDF files start with this header, which may be preceded by up to 1024 bytes of garbage
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_SEARCH_LENGTH = 1024
+
+
+class ProcessingError(Exception):
+    """Raised when a document cannot be processed, the message is shown to the user"""
+
+
+@dataclass
+class ProcessingResult:
+    """
+    Everything extracted from a document.
+
+    Attrs:
+        - page_count: Number of pages
+        - metadata: Document information dictionary (title, author, ...) without the leading slashes
+        - text: Extracted text, truncated to the configured maximum length
+        - page_index: Index of the pages for extracting page ranges, None if the document cannot be indexed
+    """
+    page_count: int
+    metadata: Dict[str, str] = field(default_factory=dict)
+    text: Optional[str] = None
+    page_index: Optional[List[IndexedPage]] = None
+
+
+def validate_magic_bytes(path: str) -> None:
+    """
+    Check that the file really is a PDF and not just named like one.
+
+    Raises:
+        - ProcessingError if the PDF header is missing
+    """
+    with open(path, "rb") as f:
+        head = f.read(PDF_MAGIC_SEARCH_LENGTH)
+    if PDF_MAGIC not in head:
+        raise ProcessingError("File is not a PDF document")
+
+
+def process_document(path: str, max_text_length: int) -> ProcessingResult:
+    """
+    Run all processing stages on a stored PDF document.
+
+    Stages: magic-byte validation, page count, metadata extraction, text extraction and page indexing.
+    Text extraction stops once max_text_length characters have been collected.
+
+    Raises:
+        - ProcessingError if the document is not a readable PDF
+    """
+    validate_magic_bytes(path)
+
+    # Imported here so the API process does not pay for it
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
+
+    try:
+        reader = PdfReader(path)
+        page_count = len(reader.pages)
+
+        metadata = {}
+        for key, value in (reader.metadata or {}).items():
+            if value is not None:
+                metadata[key.lstrip("/")] = str(value)
+
+        parts = []
+        length = 0
+        for page in reader.pages:
+            if length >= max_text_length:
+                break
+            page_text = page.extract_text() or ""
+            parts.append(page_text)
+            length += len(page_text)
+        text = "\n".join(parts)[:max_text_length]
+    except (PdfReadError, ValueError, KeyError, TypeError) as e:
+        raise ProcessingError(f"Could not read PDF document: {e}")
+
+    return ProcessingResult(page_count=page_count, metadata=metadata, text=text, page_index=build_page_index(path))
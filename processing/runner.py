@@ -0,0 +1,201 @@
+"""
+Runs the post-upload pipeline after the upload request has returned.
+
+CPU-heavy stages run in a process pool, so they neither block the event loop
+nor compete with request handling for the GIL. Results are written to the File row,
+where clients can poll them.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import (
+    List,
+    Optional,
+)
+
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from logger import logger
+from models import (
+    File as FileModel,
+    PageIndex,
+)
+from settings import (
+    PROCESSING_WORKERS,
+    PROCESSING_MAX_TEXT_LENGTH,
+)
+from storage import local_copy
+from .pages import (
+    IndexedPage,
+    extract_pages,
+)
+from .pipeline import (
+    ProcessingError,
+    process_document,
+)
+
+# Processing states of a file
+PROCESSING_PENDING = "pending"
+PROCESSING_RUNNING = "processing"
+PROCESSING_DONE = "done"
+PROCESSING_FAILED = "failed"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Get the process pool shared by the whole worker, starting it on first use"""
+    global _executor
+    if _executor is None:
+        # Fresh interpreters instead of forks of a process running threads and an event loop
+        _executor = ProcessPoolExecutor(max_workers=PROCESSING_WORKERS, mp_context=get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the process pool on shutdown"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _copy_results(db_file: FileModel, source: FileModel) -> None:
+    db_file.page_count = source.page_count
+    db_file.document_metadata = source.document_metadata
+    db_file.text_content = source.text_content
+    db_file.processing_error = source.processing_error
+    db_file.processing_status = source.processing_status
+    db_file.processed_at = datetime.utcnow()
+
+
+def _store_page_index(db: Session, blob_id: int, pages: List[IndexedPage]) -> None:
+    """Add the page index of a blob to the transaction, unless a file sharing the blob was indexed first"""
+    if db.query(PageIndex.id).filter(PageIndex.blob_id == blob_id).first() is not None:
+        return
+    try:
+        with db.begin_nested():
+            db.add_all([
+                PageIndex(
+                    blob_id=blob_id,
+                    page_number=page.page_number,
+                    object_number=page.object_number,
+                    generation=page.generation,
+                    dictionary=page.dictionary,
+                    objects=page.objects,
+                    inline_objects=page.inline_objects,
+                )
+                for page in pages
+            ])
+    except IntegrityError:
+        # Indexed concurrently through another file sharing the blob
+        pass
+
+
+async def process_file(bind: Engine, file_id: int) -> None:
+    """
+    Run the pipeline on one file and store the results.
+
+    Files sharing their content with an already processed file get a copy of its results.
+    Uses its own session, since the session of the upload request is closed by now.
+    The file may be deleted while the pipeline runs, its results are then dropped.
+    """
+    db = Session(bind=bind)
+    try:
+        db_file = db.get(FileModel, file_id)
+        if db_file is None:
+            return
+
+        if db_file.blob_id is not None:
+            processed = db.query(FileModel).filter(
+                FileModel.blob_id == db_file.blob_id,
+                FileModel.id != db_file.id,
+                FileModel.processing_status.in_([PROCESSING_DONE, PROCESSING_FAILED])
+            ).first()
+            if processed:
+                _copy_results(db_file, processed)
+                db.commit()
+                return
+
+        key = db_file.file_path
+        blob_id = db_file.blob_id
+        compression = db_file.blob.compression if db_file.blob else None
+        db_file.processing_status = PROCESSING_RUNNING
+        # Committing returns the connection to the pool, nothing may load from the database
+        # until the pipeline is done, or every queued file would hold a connection while it waits
+        db.commit()
+
+        try:
+            async with local_copy(key, compression) as path:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    get_executor(),
+                    process_document,
+                    path,
+                    PROCESSING_MAX_TEXT_LENGTH
+                )
+        except ProcessingError as e:
+            result = None
+            values = {"processing_status": PROCESSING_FAILED, "processing_error": str(e)}
+        except Exception as e:
+            logger.exception(f"Processing of file {file_id} failed")
+            result = None
+            values = {"processing_status": PROCESSING_FAILED, "processing_error": f"Processing failed: {e}"}
+        else:
+            values = {
+                "page_count": result.page_count,
+                "document_metadata": result.metadata,
+                "text_content": result.text,
+                "processing_error": None,
+                "processing_status": PROCESSING_DONE,
+            }
+        values["processed_at"] = datetime.utcnow()
+
+        # The file, its folder or its dataroom may have been deleted meanwhile, the row is not loaded again:
+        # an update matching no row tells, and the page index is written in the same transaction,
+        # so it never outlives the blob of a file deleted concurrently
+        updated = db.execute(
+            update(FileModel).where(FileModel.id == file_id).values(**values),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        if not updated:
+            db.rollback()
+            logger.info(f"File {file_id} was deleted while it was processed")
+            return
+        if result is not None and result.page_index and blob_id is not None:
+            _store_page_index(db, blob_id, result.page_index)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def process_files(bind: Engine, file_ids: List[int]) -> None:
+    """
+    Run the pipeline on many files, e.g. a batch upload.
+
+    At most PROCESSING_WORKERS files are in flight at a time, which keeps the pool busy
+    without holding a database connection for every file of the batch.
+    """
+    semaphore = asyncio.Semaphore(PROCESSING_WORKERS)
+
+    async def _process(file_id: int) -> None:
+        async with semaphore:
+            await process_file(bind, file_id)
+
+    await asyncio.gather(*[_process(file_id) for file_id in file_ids])
+
+
+async def extract_file_pages(key: str, compression: Optional[str], first: int, last: int) -> Optional[bytes]:
+    """
+    Extract a page range of a stored document without page index, by parsing it in the process pool.
+
+    Returns None if the document has fewer than last pages.
+
+    Raises:
+        - ProcessingError if the document is not a readable PDF
+    """
+    async with local_copy(key, compression) as path:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), extract_pages, path, first, last)
@@ -57,17 +57,160 @@ CORS_ORIGINS: List[str] = [
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["*"]
 CORS_ALLOW_HEADERS = ["*"]
+# Response headers browsers let scripts of other origins read, the cursor of the next page of a list
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor"]
 
 # -------------------------------------------------------------------------------------------------------------------
 # STATIC SETTINGS
 # -------------------------------------------------------------------------------------------------------------------
 UPLOADS_DIRECTORY = "uploads"
 STATIC_DIRECTORY = os.path.join(os.path.dirname(__file__), "frontend")
+# Builds of the frontend, with fingerprinted and precompressed assets, one directory per version of the sources
+STATIC_BUILD_DIRECTORY = os.getenv("STATIC_BUILD_DIRECTORY", os.path.join(os.path.dirname(__file__), "build", "frontend"))
+# How long browsers keep fingerprinted assets without asking again
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Smaller files are not worth precompressing
+STATIC_COMPRESS_MIN_SIZE = 256
 
 # Create uploads directory if it doesn't exist
 if not os.path.exists(UPLOADS_DIRECTORY):
     os.makedirs(UPLOADS_DIRECTORY)
 
+# -------------------------------------------------------------------------------------------------------------------
+# STORAGE SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Where file contents are kept: "local" (below UPLOADS_DIRECTORY) or "s3" (an S3-compatible bucket)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+
+# S3-compatible storage, only used when STORAGE_BACKEND is "s3"
+# Set S3_ENDPOINT_URL to use MinIO or another S3-compatible service instead of AWS
+S3_BUCKET = os.getenv("S3_BUCKET", "dataroom")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+# Size of the pool of connections to S3 shared by all requests of a worker
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 20))
+# Files larger than this are uploaded to S3 in parts of this size (8 MB)
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Stored files are spread over this many levels of subdirectories named after
+# the first characters of their checksum (2 levels of 2 hex characters = 65536 leaf directories)
+STORAGE_FANOUT_DEPTH = 2
+STORAGE_FANOUT_WIDTH = 2
+
+# How downloads are sent:
+# - "direct": the worker streams the bytes itself
+# - "x-accel": the worker only authorizes and answers with an X-Accel-Redirect to DOWNLOAD_ACCEL_LOCATION,
+#   nginx then sends the file with sendfile (see nginx.conf). Only applies to uncompressed files of the
+#   local backend, anything else is still streamed by the worker.
+DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "direct")
+# Internal nginx location serving UPLOADS_DIRECTORY
+DOWNLOAD_ACCEL_LOCATION = os.getenv("DOWNLOAD_ACCEL_LOCATION", "/protected-uploads/")
+# In "direct" mode, uncompressed local files are sent with os.sendfile when the server implements the
+# ASGI zerocopysend extension. Otherwise, or with DOWNLOAD_ZEROCOPY off, they are read in chunks of
+# DOWNLOAD_CHUNK_SIZE bytes in the threadpool
+DOWNLOAD_ZEROCOPY = os.getenv("DOWNLOAD_ZEROCOPY", "true").lower() == "true"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Compression at rest of stored contents: "none", "zlib" or "zstd" (requires the zstandard package)
+STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "none")
+# A content is only compressed if samples of it, this many bytes in total (256 KB),
+# shrink to at most this fraction of their size
+STORAGE_COMPRESSION_PROBE_SIZE = 256 * 1024
+STORAGE_COMPRESSION_MIN_RATIO = 0.9
+
+# -------------------------------------------------------------------------------------------------------------------
+# UPLOAD SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Size of the chunks used to copy uploaded files to storage (1 MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploads are written here first, while their checksum is being computed
+UPLOAD_TEMP_DIRECTORY = os.path.join(UPLOADS_DIRECTORY, ".tmp")
+
+# Batch uploads accept at most this many files per request
+UPLOAD_BATCH_MAX_FILES = 500
+# Number of files of a batch upload that are checksummed and stored at the same time
+UPLOAD_BATCH_CONCURRENCY = 4
+
+# Resumable upload sessions keep the bytes received so far in this directory
+UPLOAD_SESSIONS_DIRECTORY = os.path.join(UPLOADS_DIRECTORY, ".sessions")
+# Unfinished upload sessions expire after this many hours
+UPLOAD_SESSION_EXPIRE_HOURS = 24
+
+
+# -------------------------------------------------------------------------------------------------------------------
+# GARBAGE COLLECTION SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Run the storage garbage collector in the background of every worker
+GC_ENABLED = os.getenv("GC_ENABLED", "true").lower() == "true"
+# Contents released by deletes are removed within this many seconds
+GC_QUEUE_INTERVAL_SECONDS = 5
+# The whole storage is reconciled against the database this often (1 hour)
+GC_SWEEP_INTERVAL_SECONDS = 60 * 60
+# Objects written less than this long ago are never collected, they may belong to an upload in progress (1 hour)
+GC_GRACE_PERIOD_SECONDS = 60 * 60
+# Number of storage keys checked against the database per query
+GC_BATCH_SIZE = 500
+# Upper bound of storage deletes per second, so the collector never saturates the disk or the S3 request rate
+GC_MAX_DELETES_PER_SECOND = 50
+
+# -------------------------------------------------------------------------------------------------------------------
+# PROCESSING SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Number of worker processes validating uploaded documents and extracting their metadata and text
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", 2))
+# Extracted text is truncated to this many characters
+PROCESSING_MAX_TEXT_LENGTH = 1_000_000
+# Objects of a page extract closer than this many bytes in the stored file are read with one range request
+PAGE_EXTRACT_READ_GAP = 64 * 1024
+
+# -------------------------------------------------------------------------------------------------------------------
+# SHARE SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Signed share links expire after this many hours unless another expiry is requested
+SIGNED_SHARE_EXPIRE_HOURS = 24
+# Signed share links cannot last longer than this, revocations are kept this long (30 days)
+SIGNED_SHARE_MAX_EXPIRE_DAYS = 30
+# Every worker reloads the revocations of signed share links at most this often,
+# revocations made by other workers take effect within this delay
+SIGNED_SHARE_REVOCATION_REFRESH_SECONDS = 30
+# Every worker keeps the resolutions of at most this many share tokens in memory
+SHARE_CACHE_MAX_ENTRIES = 10000
+# A cached share token resolution is used for this many seconds at most, and never past the expiry of the share.
+# Shares deleted through another worker may be served until then
+SHARE_CACHE_TTL_SECONDS = 60
+
+# -------------------------------------------------------------------------------------------------------------------
+# BANDWIDTH SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Download rates in bytes per second, 0 for no limit. Users and share links may have their own limit
+DOWNLOAD_USER_BYTES_PER_SECOND = int(os.getenv("DOWNLOAD_USER_BYTES_PER_SECOND", 0))
+DOWNLOAD_SHARE_BYTES_PER_SECOND = int(os.getenv("DOWNLOAD_SHARE_BYTES_PER_SECOND", 0))
+# Bandwidth of all downloads of a worker, shared fairly between the users and share links downloading, 0 for no limit
+DOWNLOAD_WORKER_BYTES_PER_SECOND = int(os.getenv("DOWNLOAD_WORKER_BYTES_PER_SECOND", 0))
+# Bytes a limited download may send at full speed before its limit applies
+DOWNLOAD_BURST_BYTES = 1024 * 1024
+# Bandwidth is granted in slices of this many bytes, smaller slices share more evenly
+DOWNLOAD_QUANTUM_BYTES = 64 * 1024
+
+# -------------------------------------------------------------------------------------------------------------------
+# PAGINATION SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Number of rows list endpoints return per page when the request does not ask for a page size
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 100))
+# Largest page size a request may ask for
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 1000))
+
+# -------------------------------------------------------------------------------------------------------------------
+# USAGE SETTINGS
+# -------------------------------------------------------------------------------------------------------------------
+# Download counters are kept in memory and written to the database every this many seconds
+USAGE_FLUSH_INTERVAL_SECONDS = 10
+# ...or as soon as this many downloads are waiting to be written
+USAGE_FLUSH_MAX_EVENTS = 1000
+
 
 # -------------------------------------------------------------------------------------------------------------------
 # PROJECT SETTINGS
@@ -0,0 +1,19 @@
+"""
+Sharing Module
+
+Public access to files without authentication: signed share links,
+verified without the database and revoked per file, and a cache of share token resolutions.
+"""
+from .signed import (
+    SignedShare,
+    create_signed_share,
+    verify_signed_share,
+    is_revoked,
+    revoke_signed_shares,
+)
+from .cache import (
+    CachedShare,
+    ShareCache,
+    share_cache,
+    cache_share,
+)
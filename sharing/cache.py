@@ -0,0 +1,210 @@
+"""
+In-process cache of share token resolutions.
+
+A share link posted to a large audience is downloaded over and over with the same token.
+The first download looks the FileShare and its File up, the following ones are answered from memory.
+
+- At most SHARE_CACHE_MAX_ENTRIES tokens are kept, the least recently used one is evicted first
+- An entry lives SHARE_CACHE_TTL_SECONDS at most, and never past the expiry of its share
+- Deleting a share, or the file it points at (also through folder and dataroom deletes),
+  drops the entries once the deleting transaction has committed; renaming the file does too
+
+The cache belongs to one worker: a share deleted through another worker
+may still be served here until its entry expires, SHARE_CACHE_TTL_SECONDS at most.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    Dict,
+    Optional,
+    Set,
+)
+
+from sqlalchemy import (
+    event,
+    inspect,
+)
+from sqlalchemy.orm import (
+    Session,
+    object_session,
+)
+
+from models import (
+    File as FileModel,
+    FileShare,
+)
+from settings import (
+    SHARE_CACHE_MAX_ENTRIES,
+    SHARE_CACHE_TTL_SECONDS,
+)
+
+# Key of the session info entry collecting the tokens and files whose cached shares are dropped
+# once the transaction commits
+PENDING_INVALIDATIONS_KEY = "sharing_pending_invalidations"
+
+
+@dataclass
+class CachedShare:
+    """
+    What a download through a share token needs, without the database.
+
+    Attrs:
+        - file_id: Id of the shared file
+        - share_id: Id of the FileShare
+        - key: Storage key of the file content
+        - filename: Name the file is downloaded as
+        - compression: Codec the content is compressed with at rest, None if it is not
+        - size: Size of the file in bytes, as uploaded
+        - checksum: Checksum of the content, sent as ETag
+        - updated_at: Timestamp when the file was last updated, sent as Last-Modified
+        - expires_at: Expiry of the share
+        - download_rate_limit: Download limit of the share in bytes per second, None for the default one
+    """
+    file_id: int
+    share_id: int
+    key: str
+    filename: str
+    compression: Optional[str]
+    size: Optional[int]
+    checksum: Optional[str]
+    updated_at: Optional[datetime]
+    expires_at: datetime
+    download_rate_limit: Optional[int] = None
+
+
+class ShareCache:
+    """Size-bounded LRU cache of share tokens, entries expiring after a TTL capped at the share expiry"""
+
+    def __init__(self, max_entries: int = SHARE_CACHE_MAX_ENTRIES, ttl: float = SHARE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Token -> (share, time.time() until which the entry may be used)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # File id -> tokens cached for the file
+        self._tokens_by_file: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, token: str) -> None:
+        share, _ = self._entries.pop(token)
+        tokens = self._tokens_by_file.get(share.file_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_file[share.file_id]
+
+    def get(self, token: str) -> Optional[CachedShare]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            share, valid_until = entry
+            if valid_until <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return share
+
+    def put(self, token: str, share: CachedShare) -> None:
+        expires_at = share.expires_at.replace(tzinfo=timezone.utc).timestamp()
+        valid_until = min(time.time() + self.ttl, expires_at)
+        if valid_until <= time.time() or self.max_entries <= 0:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (share, valid_until)
+            self._tokens_by_file.setdefault(share.file_id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+
+    def invalidate_file(self, file_id: int) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_file.get(file_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_file.clear()
+
+
+share_cache = ShareCache()
+
+
+def cache_share(token: str, db_share: FileShare, db_file: FileModel) -> CachedShare:
+    """Remember the resolution of a share token for the following downloads"""
+    share = CachedShare(
+        file_id=db_file.id,
+        share_id=db_share.id,
+        key=db_file.file_path,
+        filename=f"{db_file.name}.pdf",
+        compression=db_file.blob.compression if db_file.blob else None,
+        size=db_file.file_size,
+        checksum=db_file.checksum,
+        updated_at=db_file.updated_at,
+        expires_at=db_share.expires_at,
+        download_rate_limit=db_share.download_rate_limit,
+    )
+    share_cache.put(token, share)
+    return share
+
+
+def _schedule_invalidation(target, token: Optional[str] = None, file_id: Optional[int] = None) -> None:
+    """Remember a token, or all tokens of a file, to drop from the cache once the transaction commits"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).add((token, file_id))
+
+
+@event.listens_for(FileShare, "after_delete")
+def invalidate_deleted_share(mapper, connection, target: FileShare) -> None:
+    """
+    Drop the cached share of a deleted FileShare.
+
+    Runs for every share deleted through the ORM, including the cascades of file, folder and dataroom deletes.
+    The entry is dropped after the commit, a download in between would otherwise cache it again.
+    """
+    _schedule_invalidation(target, token=target.token)
+
+
+@event.listens_for(FileModel, "after_delete")
+def invalidate_deleted_file_shares(mapper, connection, target: FileModel) -> None:
+    """Drop the cached shares of a deleted File, also when its shares are not loaded to be deleted one by one"""
+    _schedule_invalidation(target, file_id=target.id)
+
+
+@event.listens_for(FileModel, "after_update")
+def invalidate_renamed_file_shares(mapper, connection, target: FileModel) -> None:
+    """Drop the cached shares of a renamed File, they carry its previous name"""
+    if inspect(target).attrs.name.history.has_changes():
+        _schedule_invalidation(target, file_id=target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def apply_invalidations(session: Session) -> None:
+    """Drop the cached shares deleted or changed by the committed transaction"""
+    for token, file_id in session.info.pop(PENDING_INVALIDATIONS_KEY, ()):
+        if token is not None:
+            share_cache.invalidate(token)
+        else:
+            share_cache.invalidate_file(file_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_invalidations(session: Session) -> None:
+    """The deletes and renames were rolled back, the cached shares are still accurate"""
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
@@ -0,0 +1,256 @@
+"""
+Signed share links.
+
+A signed share token carries everything needed to send a file: its id, storage key, name,
+size and compression, and the expiry of the link. It is signed with a key derived from SECRET_KEY,
+so a download through it is verified without the database, whatever the traffic on the link.
+
+Links cannot be deleted like FileShare rows, they are revoked per file instead:
+revoking the links of a file, or deleting the file (also through folder and dataroom deletes),
+records a ShareRevocation rejecting every link of the file issued until then.
+Each worker keeps the revocations in memory and reloads them at most every
+SIGNED_SHARE_REVOCATION_REFRESH_SECONDS, so a revocation made by another worker takes effect within that delay.
+Revocations are only recorded for files with signed links which have not expired yet.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+)
+
+from sqlalchemy import (
+    delete,
+    event,
+    insert,
+)
+from sqlalchemy.orm import (
+    Session,
+    object_session,
+)
+
+from models import (
+    File as FileModel,
+    ShareRevocation,
+)
+from settings import (
+    SECRET_KEY,
+    SIGNED_SHARE_MAX_EXPIRE_DAYS,
+    SIGNED_SHARE_REVOCATION_REFRESH_SECONDS,
+)
+
+# Share tokens are signed with their own key, so they can never pass for access tokens and the other way round
+_SIGNING_KEY = hmac.new(SECRET_KEY.encode(), b"signed-share", hashlib.sha256).digest()
+
+# Key of the session info entry collecting revocations to apply in memory once the transaction commits
+PENDING_REVOCATIONS_KEY = "sharing_pending_revocations"
+
+# File id -> the links of the file issued up to this time (milliseconds since the epoch) are revoked
+_revoked: Dict[int, int] = {}
+_revoked_loaded_at: Optional[float] = None
+_revoked_lock = threading.Lock()
+
+
+def _to_millis(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+@dataclass
+class SignedShare:
+    """
+    What a signed share token carries.
+
+    Attrs:
+        - file_id: Id of the shared file
+        - key: Storage key of the file content
+        - filename: Name the file is downloaded as
+        - size: Size of the file in bytes, as uploaded
+        - compression: Codec the content is compressed with at rest, None if it is not
+        - issued_at: When the link was created, in milliseconds since the epoch
+        - expires_at: When the link expires, in seconds since the epoch
+        - rate_limit: Download limit of the link in bytes per second, None for the default one
+    """
+    file_id: int
+    key: str
+    filename: str
+    size: Optional[int]
+    compression: Optional[str]
+    issued_at: int
+    expires_at: int
+    rate_limit: Optional[int] = None
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at < time.time()
+
+    @property
+    def expires_at_datetime(self) -> datetime:
+        return datetime.utcfromtimestamp(self.expires_at)
+
+    def sign(self) -> str:
+        payload = {
+            "f": self.file_id,
+            "k": self.key,
+            "n": self.filename,
+            "s": self.size,
+            "i": self.issued_at,
+            "e": self.expires_at,
+        }
+        if self.compression:
+            payload["c"] = self.compression
+        if self.rate_limit:
+            payload["r"] = self.rate_limit
+        body = _encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        signature = hmac.new(_SIGNING_KEY, body.encode("ascii"), hashlib.sha256).digest()
+        return f"{body}.{_encode(signature)}"
+
+
+def create_signed_share(
+    db: Session,
+    db_file: FileModel,
+    expires_at: datetime,
+    rate_limit: Optional[int] = None
+) -> Tuple[str, SignedShare]:
+    """
+    Create a signed share link of a file, valid until expires_at, downloaded at most at rate_limit bytes per second.
+
+    The expiry is remembered on the file, so deleting it records a revocation only while links may still be used.
+    The caller commits.
+    """
+    share = SignedShare(
+        file_id=db_file.id,
+        key=db_file.file_path,
+        filename=f"{db_file.name}.pdf",
+        size=db_file.file_size,
+        compression=db_file.blob.compression if db_file.blob else None,
+        issued_at=int(time.time() * 1000),
+        expires_at=int(expires_at.replace(tzinfo=timezone.utc).timestamp()),
+        rate_limit=rate_limit,
+    )
+    if db_file.signed_share_expires_at is None or db_file.signed_share_expires_at < expires_at:
+        db_file.signed_share_expires_at = expires_at
+    return share.sign(), share
+
+
+def verify_signed_share(token: str) -> Optional[SignedShare]:
+    """The share carried by a token, None if the token is malformed or its signature does not match"""
+    body, _, signature = token.partition(".")
+    try:
+        expected = hmac.new(_SIGNING_KEY, body.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _decode(signature)):
+            return None
+        payload = json.loads(_decode(body))
+        return SignedShare(
+            file_id=payload["f"],
+            key=payload["k"],
+            filename=payload["n"],
+            size=payload["s"],
+            compression=payload.get("c"),
+            issued_at=payload["i"],
+            expires_at=payload["e"],
+            rate_limit=payload.get("r"),
+        )
+    except (ValueError, KeyError, TypeError, UnicodeError):
+        return None
+
+
+def _remember_revocation(file_id: int, revoked_at: int) -> None:
+    with _revoked_lock:
+        _revoked[file_id] = max(_revoked.get(file_id, revoked_at), revoked_at)
+
+
+def _load_revocations(db: Session) -> None:
+    """Replace the revocations kept in memory with the ones recorded in the database"""
+    global _revoked_loaded_at
+    rows = db.query(ShareRevocation.file_id, ShareRevocation.revoked_at).filter(
+        ShareRevocation.expires_at >= datetime.utcnow()
+    ).all()
+    revoked = {}
+    for file_id, revoked_at in rows:
+        revoked[file_id] = max(revoked.get(file_id, 0), _to_millis(revoked_at))
+
+    # Revocations of this worker committed while the rows were loading are kept,
+    # as long as links they apply to may not have expired
+    cutoff = (time.time() - SIGNED_SHARE_MAX_EXPIRE_DAYS * 24 * 60 * 60) * 1000
+    with _revoked_lock:
+        for file_id, revoked_at in _revoked.items():
+            if revoked_at >= cutoff:
+                revoked[file_id] = max(revoked.get(file_id, 0), revoked_at)
+        _revoked.clear()
+        _revoked.update(revoked)
+        _revoked_loaded_at = time.monotonic()
+
+
+def is_revoked(db: Session, share: SignedShare) -> bool:
+    """
+    Whether the link of a share has been revoked.
+
+    Answered from memory. The session is only used to reload the revocations
+    once they are older than SIGNED_SHARE_REVOCATION_REFRESH_SECONDS.
+    """
+    if _revoked_loaded_at is None or time.monotonic() - _revoked_loaded_at >= SIGNED_SHARE_REVOCATION_REFRESH_SECONDS:
+        _load_revocations(db)
+    with _revoked_lock:
+        return _revoked.get(share.file_id, -1) >= share.issued_at
+
+
+def _record_revocation(session: Session, connection, file_id: int, expires_at: datetime) -> None:
+    """Insert a revocation of the links of a file issued until now, applied in memory once committed"""
+    now = datetime.utcnow()
+    connection.execute(delete(ShareRevocation).where(ShareRevocation.expires_at < now))
+    connection.execute(insert(ShareRevocation).values(file_id=file_id, revoked_at=now, expires_at=expires_at))
+    session.info.setdefault(PENDING_REVOCATIONS_KEY, []).append((file_id, _to_millis(now)))
+
+
+def revoke_signed_shares(db: Session, db_file: FileModel) -> None:
+    """Revoke every signed share link of a file issued so far. The caller commits."""
+    if db_file.signed_share_expires_at is None or db_file.signed_share_expires_at < datetime.utcnow():
+        return
+    _record_revocation(db, db.connection(), db_file.id, db_file.signed_share_expires_at)
+    db_file.signed_share_expires_at = None
+
+
+@event.listens_for(FileModel, "after_delete")
+def revoke_deleted_file_shares(mapper, connection, target: FileModel) -> None:
+    """
+    Revoke the signed share links of a deleted File.
+
+    Runs for every File deleted through the ORM, including the cascades of folder and dataroom deletes.
+    Without it, a link would keep serving the content as long as another file shares the same blob.
+    """
+    if target.signed_share_expires_at is None or target.signed_share_expires_at < datetime.utcnow():
+        return
+    session = object_session(target)
+    if session is not None:
+        _record_revocation(session, connection, target.id, target.signed_share_expires_at)
+
+
+@event.listens_for(Session, "after_commit")
+def apply_revocations(session: Session) -> None:
+    """Reject the revoked links in this worker right away, other workers pick them up on their next reload"""
+    for file_id, revoked_at in session.info.pop(PENDING_REVOCATIONS_KEY, []):
+        _remember_revocation(file_id, revoked_at)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_revocations(session: Session) -> None:
+    """Keep the links valid when the revoking transaction is rolled back"""
+    session.info.pop(PENDING_REVOCATIONS_KEY, None)
@@ -0,0 +1,70 @@
+"""
+Storage Module
+
+This module contains helpers for persisting uploaded documents.
+Everything that touches the bytes of a stored file should live here,
+so the API endpoints only deal with database records and authorization.
+
+File contents are kept by a storage backend (local filesystem or an S3-compatible bucket),
+selected with the STORAGE_BACKEND setting, and may be compressed at rest (STORAGE_COMPRESSION).
+"""
+from .base import (
+    StorageBackend,
+    StoredObject,
+)
+from .backends import (
+    get_storage,
+    set_storage,
+    close_storage,
+    local_copy,
+)
+from .compression import (
+    StoredContent,
+    prepare_for_storage,
+    decompress_stream,
+)
+from .naming import (
+    fanout_key,
+    blob_key,
+    unique_name,
+)
+from .uploads import (
+    StoredUpload,
+    temp_upload_path,
+    save_upload_file,
+    checksum_upload_file,
+    checksum_file,
+    session_part_path,
+    write_stream_at,
+)
+from .blobs import (
+    find_blob,
+    add_blob_reference,
+    store_blob,
+    store_upload_file,
+    store_upload_files,
+)
+from .responses import (
+    StoredFileResponse,
+    content_disposition,
+)
+from .sendfile import (
+    SendfileResponse,
+    supports_zerocopy,
+    without_zerocopy,
+)
+from .pages import PageRangeResponse
+from .archives import (
+    ArchiveEntry,
+    collect_archive_entries,
+    zip_stream,
+    zip_response,
+)
+from .gc import (
+    GCReport,
+    content_lock,
+    enqueue_removals,
+    collect_released,
+    sweep,
+    run_garbage_collector,
+)
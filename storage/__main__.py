@@ -0,0 +1,49 @@
+"""
+Maintenance commands of the storage.
+
+Usage:
+    python -m storage gc [--dry-run] [--grace-period SECONDS] [--max-deletes-per-second N]
+"""
+import argparse
+import asyncio
+import json
+from dataclasses import asdict
+
+from database import engine
+from settings import (
+    GC_GRACE_PERIOD_SECONDS,
+    GC_MAX_DELETES_PER_SECOND,
+)
+from .gc import sweep
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m storage", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gc_parser = commands.add_parser("gc", help="Remove the stored objects nothing in the database points at")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    gc_parser.add_argument(
+        "--grace-period", type=int, default=GC_GRACE_PERIOD_SECONDS,
+        help="Keep objects written less than this many seconds ago"
+    )
+    gc_parser.add_argument(
+        "--max-deletes-per-second", type=float, default=GC_MAX_DELETES_PER_SECOND,
+        help="Upper bound of deletes per second, 0 for no limit"
+    )
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        report = asyncio.run(sweep(
+            engine,
+            dry_run=args.dry_run,
+            grace_period=args.grace_period,
+            max_deletes_per_second=args.max_deletes_per_second,
+        ))
+        print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+ZIP archives of folders and datarooms, written while they are sent.
+
+The archive is generated on the fly from the storage backend, one entry after the other:
+no temporary file is written and only one chunk of content is held in memory at a time.
+Since sizes and checksums of the entries are only known once their content went through,
+every entry is followed by a data descriptor, which lets the archive be written front to back.
+ZIP64 records are added where sizes, offsets or the number of entries need them.
+
+PDFs are already compressed internally, deflating them again costs CPU for nothing,
+so they are stored as they are. Other contents are deflated.
+"""
+import struct
+import zlib
+from dataclasses import (
+    dataclass,
+    replace,
+)
+from datetime import datetime
+from typing import (
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
+
+from logger import logger
+from models import (
+    Blob,
+    DataRoom,
+    File as FileModel,
+    Folder,
+)
+from .backends import get_storage
+from .compression import decompress_stream
+from .responses import content_disposition
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+# Bit 3: sizes and CRC follow the content in a data descriptor, bit 11: names are UTF-8
+FLAGS = 0x0008 | 0x0800
+VERSION = 20
+VERSION_ZIP64 = 45
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# Extensions whose contents are stored as they are
+STORED_EXTENSIONS = (".pdf", ".zip", ".jpg", ".jpeg", ".png")
+
+# Unix permissions, kept by most unzip tools
+FILE_ATTRIBUTES = 0o100644 << 16
+DIRECTORY_ATTRIBUTES = (0o40755 << 16) | 0x10
+
+
+@dataclass
+class ArchiveEntry:
+    """
+    A file or directory of an archive.
+
+    Attrs:
+        - name: Path in the archive, directories end with a slash
+        - key: Storage key of the content, None for directories
+        - size: Size of the content in bytes as recorded with its blob, None to take it from storage.
+          Only decides whether the entry needs ZIP64 records, the archive records the bytes actually sent
+        - compression: Codec the content is compressed with at rest, None if it is not
+        - modified_at: Timestamp shown by unzip tools
+    """
+    name: str
+    key: Optional[str] = None
+    size: Optional[int] = 0
+    compression: Optional[str] = None
+    modified_at: Optional[datetime] = None
+
+    @property
+    def is_directory(self) -> bool:
+        return self.name.endswith("/")
+
+    @property
+    def method(self) -> int:
+        if self.is_directory or self.name.lower().endswith(STORED_EXTENSIONS):
+            return METHOD_STORED
+        return METHOD_DEFLATED
+
+    @property
+    def zip64(self) -> bool:
+        # Deflate may grow incompressible contents slightly, keep a margin for it
+        size = self.size or 0
+        return size + size // 1000 + 1024 >= ZIP64_LIMIT
+
+
+@dataclass
+class _Written:
+    """What the central directory needs to know about an entry once it has been written"""
+    entry: ArchiveEntry
+    offset: int
+    crc: int
+    size: int
+    compressed_size: int
+
+
+def _dos_datetime(value: Optional[datetime]):
+    """Date and time in the MS-DOS format of ZIP headers, which cannot go before 1980"""
+    value = value or datetime.utcnow()
+    if value.year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (value.hour << 11) | (value.minute << 5) | (value.second // 2)
+    dos_date = ((value.year - 1980) << 9) | (value.month << 5) | value.day
+    return dos_time, dos_date
+
+
+def _local_header(entry: ArchiveEntry) -> bytes:
+    name = entry.name.encode("utf-8")
+    dos_time, dos_date = _dos_datetime(entry.modified_at)
+    if entry.zip64:
+        # Sizes go to the ZIP64 extra field and the data descriptor, both filled later
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+        sizes = (ZIP64_LIMIT, ZIP64_LIMIT)
+    else:
+        extra = b""
+        sizes = (0, 0)
+    return struct.pack(
+        "<IHHHHHIIIHH",
+        0x04034B50,
+        VERSION_ZIP64 if entry.zip64 else VERSION,
+        FLAGS,
+        entry.method,
+        dos_time,
+        dos_date,
+        0,
+        *sizes,
+        len(name),
+        len(extra),
+    ) + name + extra
+
+
+def _data_descriptor(entry: ArchiveEntry, crc: int, size: int, compressed_size: int) -> bytes:
+    if entry.zip64:
+        return struct.pack("<IIQQ", 0x08074B50, crc, compressed_size, size)
+    return struct.pack("<IIII", 0x08074B50, crc, compressed_size, size)
+
+
+def _central_header(written: _Written) -> bytes:
+    entry = written.entry
+    name = entry.name.encode("utf-8")
+    dos_time, dos_date = _dos_datetime(entry.modified_at)
+
+    # ZIP64 fields come in this order, each only if its regular field overflows
+    zip64_fields = []
+    size, compressed_size, offset = written.size, written.compressed_size, written.offset
+    if entry.zip64 or size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT:
+        zip64_fields += [size, compressed_size]
+        size = compressed_size = ZIP64_LIMIT
+    if offset >= ZIP64_LIMIT:
+        zip64_fields.append(offset)
+        offset = ZIP64_LIMIT
+    extra = b""
+    if zip64_fields:
+        extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields)
+
+    version = VERSION_ZIP64 if zip64_fields else VERSION
+    return struct.pack(
+        "<IHHHHHHIIIHHHHHII",
+        0x02014B50,
+        (3 << 8) | version,
+        version,
+        FLAGS,
+        entry.method,
+        dos_time,
+        dos_date,
+        written.crc,
+        compressed_size,
+        size,
+        len(name),
+        len(extra),
+        0,
+        0,
+        0,
+        DIRECTORY_ATTRIBUTES if entry.is_directory else FILE_ATTRIBUTES,
+        offset,
+    ) + name + extra
+
+
+def _end_of_central_directory(count: int, offset: int, size: int) -> bytes:
+    records = b""
+    if count >= ZIP64_COUNT_LIMIT or offset >= ZIP64_LIMIT or size >= ZIP64_LIMIT:
+        zip64_offset = offset + size
+        records += struct.pack(
+            "<IQHHIIQQQQ",
+            0x06064B50,
+            44,
+            (3 << 8) | VERSION_ZIP64,
+            VERSION_ZIP64,
+            0,
+            0,
+            count,
+            count,
+            size,
+            offset,
+        )
+        records += struct.pack("<IIQI", 0x07064B50, 0, zip64_offset, 1)
+        count = min(count, ZIP64_COUNT_LIMIT)
+        offset = min(offset, ZIP64_LIMIT)
+        size = min(size, ZIP64_LIMIT)
+    return records + struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, size, offset, 0)
+
+
+async def zip_stream(entries: List[ArchiveEntry]) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive of the given entries.
+
+    Contents missing from storage are left out of the archive with a warning,
+    the response has already started by the time they are reached.
+    Sizes and checksums are those of the bytes sent, whatever the database recorded.
+    """
+    storage = get_storage()
+    written = []
+    offset = 0
+
+    for entry in entries:
+        if not entry.is_directory:
+            stored = await storage.stat(entry.key)
+            if stored is None:
+                logger.warning(f"Content {entry.key} of archive entry {entry.name} not found in storage")
+                continue
+            if entry.size is None:
+                # Contents without blob are stored as uploaded
+                entry = replace(entry, size=stored.size)
+
+        header = _local_header(entry)
+        yield header
+        crc = 0
+        size = 0
+        compressed_size = 0
+        if not entry.is_directory:
+            compressor = None
+            if entry.method == METHOD_DEFLATED:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            async for chunk in decompress_stream(storage.open_stream(entry.key), entry.compression):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                compressed_size += len(chunk)
+                if chunk:
+                    yield chunk
+            if compressor:
+                chunk = compressor.flush()
+                compressed_size += len(chunk)
+                yield chunk
+
+        descriptor = _data_descriptor(entry, crc, size, compressed_size)
+        yield descriptor
+        written.append(_Written(entry, offset, crc, size, compressed_size))
+        offset += len(header) + compressed_size + len(descriptor)
+
+    directory_size = 0
+    for item in written:
+        header = _central_header(item)
+        directory_size += len(header)
+        yield header
+    yield _end_of_central_directory(len(written), offset, directory_size)
+
+
+def _safe_name(name: str) -> str:
+    """A single path component, which cannot climb out of the extraction directory"""
+    name = name.replace("/", "_").replace("\\", "_").strip()
+    if name in ("", ".", ".."):
+        return "_"
+    return name
+
+
+def _unique_name(name: str, taken: Set[str], extension: str = "") -> str:
+    """Number names which already exist in the same directory, "report (2).pdf" after "report.pdf" """
+    candidate = name + extension
+    number = 2
+    # Compared case-insensitively, archives are also extracted on case-insensitive filesystems
+    while candidate.lower() in taken:
+        candidate = f"{name} ({number}){extension}"
+        number += 1
+    taken.add(candidate.lower())
+    return candidate
+
+
+def collect_archive_entries(db: Session, dataroom: DataRoom, folder: Optional[Folder] = None) -> List[ArchiveEntry]:
+    """
+    List the entries of the archive of a whole dataroom, or of the subtree of one of its folders.
+
+    Folder names become directories, under a top directory named after the dataroom or the folder.
+    Takes two queries whatever the size of the tree: one for the folders of the dataroom or of the subtree
+    and one for the files of the subtree, with the compression of their contents.
+    """
+    folders = db.query(Folder.id, Folder.parent_id, Folder.name, Folder.updated_at)
+    if folder:
+        folders = folders.filter(Folder.path.like(f"{folder.subtree_path}%"))
+    else:
+        folders = folders.filter(Folder.dataroom_id == dataroom.id)
+    folders = folders.order_by(Folder.name, Folder.id).all()
+    children: Dict[Optional[int], list] = {}
+    for row in folders:
+        children.setdefault(row.parent_id, []).append(row)
+
+    # Archive path of every folder of the subtree, parents before their children
+    root_name = _safe_name(folder.name if folder else dataroom.name)
+    paths: Dict[Optional[int], str] = {}
+    taken: Dict[Optional[int], Set[str]] = {}
+    entries = []
+    if folder:
+        paths[folder.id] = root_name + "/"
+        entries.append(ArchiveEntry(name=paths[folder.id], modified_at=folder.updated_at))
+        pending = [folder.id]
+    else:
+        paths[None] = root_name + "/"
+        entries.append(ArchiveEntry(name=paths[None], modified_at=dataroom.updated_at))
+        pending = [None]
+    while pending:
+        parent_id = pending.pop(0)
+        names = taken.setdefault(parent_id, set())
+        for row in children.get(parent_id, []):
+            paths[row.id] = paths[parent_id] + _unique_name(_safe_name(row.name), names) + "/"
+            entries.append(ArchiveEntry(name=paths[row.id], modified_at=row.updated_at))
+            pending.append(row.id)
+
+    folder_ids = [folder_id for folder_id in paths if folder_id is not None]
+    if not folder_ids:
+        return entries
+    if folder:
+        in_subtree = FileModel.folder_id.in_(folder_ids)
+    else:
+        # Files carry their dataroom, a whole dataroom needs no list of folders
+        in_subtree = FileModel.dataroom_id == dataroom.id
+    files = db.query(
+        FileModel.name,
+        FileModel.folder_id,
+        FileModel.file_path,
+        FileModel.file_type,
+        FileModel.updated_at,
+        Blob.size,
+        Blob.compression,
+    ).outerjoin(Blob, FileModel.blob_id == Blob.id).filter(
+        in_subtree
+    ).order_by(FileModel.name, FileModel.id).all()
+
+    for row in files:
+        names = taken.setdefault(row.folder_id, set())
+        name = _unique_name(_safe_name(row.name), names, f".{row.file_type or 'pdf'}")
+        entries.append(ArchiveEntry(
+            name=paths[row.folder_id] + name,
+            key=row.file_path,
+            size=row.size,
+            compression=row.compression,
+            modified_at=row.updated_at,
+        ))
+    return entries
+
+
+def zip_response(entries: List[ArchiveEntry], filename: str) -> StreamingResponse:
+    """Response streaming the archive of the given entries, sent as an attachment"""
+    return StreamingResponse(
+        zip_stream(entries),
+        media_type="application/zip",
+        headers={
+            "content-disposition": content_disposition(filename),
+            "cache-control": "private, no-store",
+        },
+    )
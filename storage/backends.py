@@ -0,0 +1,90 @@
+import os
+from contextlib import asynccontextmanager
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+import aiofiles
+import aiofiles.os
+
+from settings import (
+    STORAGE_BACKEND,
+    UPLOADS_DIRECTORY,
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_REGION,
+    S3_ACCESS_KEY_ID,
+    S3_SECRET_ACCESS_KEY,
+    S3_MAX_POOL_CONNECTIONS,
+)
+from .base import StorageBackend
+from .compression import decompress_stream
+from .local import LocalStorageBackend
+from .uploads import temp_upload_path
+
+_storage: Optional[StorageBackend] = None
+
+
+def _create_storage() -> StorageBackend:
+    """Create the storage backend selected in settings"""
+    if STORAGE_BACKEND == "local":
+        return LocalStorageBackend(UPLOADS_DIRECTORY)
+
+    if STORAGE_BACKEND == "s3":
+        from .s3 import S3StorageBackend
+        return S3StorageBackend(
+            bucket=S3_BUCKET,
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION,
+            access_key_id=S3_ACCESS_KEY_ID,
+            secret_access_key=S3_SECRET_ACCESS_KEY,
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+        )
+
+    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+
+def get_storage() -> StorageBackend:
+    """Get the storage backend shared by the whole worker"""
+    global _storage
+    if _storage is None:
+        _storage = _create_storage()
+    return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]) -> None:
+    """Replace the shared storage backend, e.g. to point tests at a different one"""
+    global _storage
+    _storage = storage
+
+
+async def close_storage() -> None:
+    """Release the resources of the shared storage backend on shutdown"""
+    if _storage is not None:
+        await _storage.close()
+
+
+@asynccontextmanager
+async def local_copy(key: str, compression: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Provide a path on the local filesystem holding the content of a stored object.
+
+    Uncompressed objects of the local backend are used in place. Other objects are downloaded
+    and decompressed to a temporary file, which is removed when the context exits.
+    """
+    storage = get_storage()
+    path = storage.local_path(key)
+    if path is not None and not compression:
+        yield path
+        return
+
+    path = temp_upload_path()
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            async for chunk in decompress_stream(storage.open_stream(key), compression):
+                await out.write(chunk)
+        yield path
+    finally:
+        if os.path.exists(path):
+            await aiofiles.os.remove(path)
@@ -0,0 +1,77 @@
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+from settings import UPLOAD_CHUNK_SIZE
+
+
+@dataclass
+class StoredObject:
+    """
+    Metadata of an object kept by a storage backend.
+
+    Attrs:
+        - key: The storage key of the object
+        - size: Size of the object in bytes
+        - modified_at: Timestamp when the object was last written
+    """
+    key: str
+    size: int
+    modified_at: datetime
+
+
+class StorageBackend(ABC):
+    """
+    Interface of the places where file contents are kept.
+
+    Objects are addressed by storage keys: relative, slash separated paths like "blobs/ab/cd/abcd...".
+    All operations are async, so no backend blocks the event loop.
+    """
+
+    @abstractmethod
+    async def put_file(self, key: str, source_path: str) -> StoredObject:
+        """Store a local file under the given key. The local file is consumed."""
+
+    @abstractmethod
+    def open_stream(self, key: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Stream the whole object in chunks"""
+
+    @abstractmethod
+    def get_range(
+        self,
+        key: str,
+        start: int,
+        end: int,
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """Stream the bytes from start to end (both inclusive) of the object in chunks"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete the object. Deleting a missing object is not an error."""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """Get the metadata of the object, or None if it does not exist"""
+
+    @abstractmethod
+    def list_objects(self) -> AsyncIterator[StoredObject]:
+        """Stream the metadata of every stored object, in no particular order"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Path of the object on the local filesystem, if the backend keeps it there.
+
+        Lets responses hand the file to the server directly instead of streaming it through Python.
+        """
+        return None
+
+    async def close(self) -> None:
+        """Release the resources held by the backend, e.g. pooled connections"""
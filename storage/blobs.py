@@ -0,0 +1,274 @@
+"""
+Content-addressed blob store.
+
+Every stored content is kept once under a storage key derived from its SHA-256 checksum,
+and File rows point at it through a reference-counted Blob row.
+Uploading a duplicate therefore only costs a checksum pass and a database insert.
+New contents may be compressed before they are stored, see storage.compression.
+"""
+import os
+import asyncio
+from collections import Counter
+from typing import (
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from fastapi import UploadFile
+from sqlalchemy import (
+    event,
+    update,
+    delete,
+    select,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import (
+    Session,
+    object_session,
+)
+
+from settings import UPLOAD_BATCH_CONCURRENCY
+from models import (
+    Blob,
+    File as FileModel,
+    PageIndex,
+)
+from .backends import get_storage
+from .compression import (
+    StoredContent,
+    prepare_for_storage,
+)
+from .gc import (
+    content_lock,
+    enqueue_removals,
+)
+from .naming import blob_key
+from .uploads import (
+    StoredUpload,
+    checksum_upload_file,
+    save_upload_file,
+    temp_upload_path,
+)
+
+# Key of the session info entry collecting storage keys to delete once the transaction commits
+PENDING_REMOVALS_KEY = "storage_pending_removals"
+
+
+def find_blob(db: Session, checksum: str) -> Optional[Blob]:
+    """Find the blob already holding the content with the given checksum"""
+    return db.query(Blob).filter(Blob.checksum == checksum).first()
+
+
+def add_blob_reference(db: Session, blob: Blob) -> Blob:
+    """
+    Count one more File pointing at the blob.
+
+    The increment is done in SQL so concurrent uploads of the same content do not lose updates.
+    """
+    db.execute(
+        update(Blob)
+        .where(Blob.id == blob.id)
+        .values(ref_count=Blob.ref_count + 1)
+    )
+    db.refresh(blob)
+    return blob
+
+
+async def store_blob(db: Session, stored: StoredUpload) -> Blob:
+    """
+    Move a checksummed local file into the storage backend and return its blob.
+
+    If the content is already stored, the file is dropped and the existing blob is referenced instead.
+    The caller is responsible for committing the transaction.
+    """
+    blob = find_blob(db, stored.checksum)
+    if blob:
+        os.remove(stored.path)
+        return add_blob_reference(db, blob)
+
+    key = blob_key(stored.checksum)
+    content = await prepare_for_storage(stored)
+    # Same checksum means same content, so overwriting a concurrently stored copy is harmless.
+    # The lock keeps the collector from removing a released copy of the content while it is written again
+    async with content_lock(key):
+        await get_storage().put_file(key, content.path)
+
+    try:
+        with db.begin_nested():
+            blob = Blob(
+                checksum=stored.checksum,
+                file_path=key,
+                size=stored.size,
+                stored_size=content.size,
+                compression=content.compression,
+                ref_count=1
+            )
+            db.add(blob)
+    except IntegrityError:
+        # Another request stored the same content in the meantime
+        return add_blob_reference(db, find_blob(db, stored.checksum))
+
+    return blob
+
+
+async def store_upload_file(db: Session, upload: UploadFile) -> Blob:
+    """
+    Store an uploaded file in the storage backend and return its blob.
+
+    The spooled upload is checksummed first, so a duplicate is never written to storage.
+    The caller is responsible for committing the transaction.
+    """
+    _, checksum = await checksum_upload_file(upload)
+    blob = find_blob(db, checksum)
+    if blob:
+        return add_blob_reference(db, blob)
+
+    stored = await save_upload_file(upload, temp_upload_path())
+    return await store_blob(db, stored)
+
+
+async def store_upload_files(db: Session, uploads: List[UploadFile]) -> List[Union[Blob, Exception]]:
+    """
+    Store many uploaded files at once and return the blob of every upload, or the error it failed with.
+
+    - All uploads are checksummed concurrently and looked up in the blob store with a single query
+    - Every new content is written to storage once, concurrently, even if it appears several times in the batch
+    - References are counted with one update per blob instead of one per upload
+
+    At most UPLOAD_BATCH_CONCURRENCY uploads are processed at the same time.
+    The caller is responsible for committing the transaction.
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+
+    async def _checksum(upload: UploadFile) -> str:
+        async with semaphore:
+            _, checksum = await checksum_upload_file(upload)
+            return checksum
+
+    async def _store(checksum: str, upload: UploadFile) -> Tuple[StoredUpload, StoredContent]:
+        async with semaphore:
+            stored = await save_upload_file(upload, temp_upload_path())
+            content = await prepare_for_storage(stored)
+            async with content_lock(blob_key(checksum)):
+                await get_storage().put_file(blob_key(checksum), content.path)
+            return stored, content
+
+    results: List[Union[str, Exception]] = await asyncio.gather(
+        *[_checksum(upload) for upload in uploads],
+        return_exceptions=True
+    )
+    checksums = [result for result in results if isinstance(result, str)]
+
+    blobs = {
+        blob.checksum: blob
+        for blob in db.query(Blob).filter(Blob.checksum.in_(set(checksums))).all()
+    }
+
+    # Store every new content once, using the first upload carrying it
+    new_uploads = {}
+    for upload, result in zip(uploads, results):
+        if isinstance(result, str) and result not in blobs and result not in new_uploads:
+            new_uploads[result] = upload
+
+    stored_results = await asyncio.gather(
+        *[_store(checksum, upload) for checksum, upload in new_uploads.items()],
+        return_exceptions=True
+    )
+    failed = {}
+    references = Counter(checksums)
+    for checksum, result in zip(new_uploads, stored_results):
+        if isinstance(result, Exception):
+            failed[checksum] = result
+            continue
+        stored, content = result
+        try:
+            with db.begin_nested():
+                blob = Blob(
+                    checksum=checksum,
+                    file_path=blob_key(checksum),
+                    size=stored.size,
+                    stored_size=content.size,
+                    compression=content.compression,
+                    ref_count=references[checksum]
+                )
+                db.add(blob)
+        except IntegrityError:
+            # Another request stored the same content in the meantime
+            blob = find_blob(db, checksum)
+            db.execute(
+                update(Blob)
+                .where(Blob.id == blob.id)
+                .values(ref_count=Blob.ref_count + references[checksum])
+            )
+            db.refresh(blob)
+        blobs[checksum] = blob
+
+    # Contents stored before this batch get all their new references at once
+    for checksum, blob in blobs.items():
+        if checksum not in new_uploads:
+            db.execute(
+                update(Blob)
+                .where(Blob.id == blob.id)
+                .values(ref_count=Blob.ref_count + references[checksum])
+            )
+
+    return [
+        result if isinstance(result, Exception) else failed.get(result, blobs.get(result))
+        for result in results
+    ]
+
+
+def _schedule_removal(target: FileModel, key: str) -> None:
+    """Remember a storage key to delete once the deleting transaction commits"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_REMOVALS_KEY, []).append(key)
+
+
+@event.listens_for(FileModel, "after_delete")
+def release_blob(mapper, connection, target: FileModel) -> None:
+    """
+    Drop the reference of a deleted File to its blob.
+
+    Runs for every File deleted through the ORM, including the cascades of folder and
+    dataroom deletes. The blob row goes away together with its last reference (and its page index), and its
+    content is collected from storage after the transaction has committed.
+    """
+    if target.blob_id is None:
+        # Files stored before the blob store own their storage key exclusively
+        _schedule_removal(target, target.file_path)
+        return
+
+    connection.execute(
+        update(Blob)
+        .where(Blob.id == target.blob_id)
+        .values(ref_count=Blob.ref_count - 1)
+    )
+    key = connection.execute(
+        select(Blob.file_path).where(Blob.id == target.blob_id, Blob.ref_count <= 0)
+    ).scalar()
+    if key is not None:
+        connection.execute(delete(PageIndex).where(PageIndex.blob_id == target.blob_id))
+        connection.execute(delete(Blob).where(Blob.id == target.blob_id, Blob.ref_count <= 0))
+        _schedule_removal(target, key)
+
+
+@event.listens_for(Session, "after_commit")
+def remove_released_contents(session: Session) -> None:
+    """
+    Hand the contents released by the committed transaction to the garbage collector.
+
+    Nothing is deleted from storage here, so a delete request does not wait on storage I/O
+    however many files it removed.
+    """
+    keys = session.info.pop(PENDING_REMOVALS_KEY, [])
+    if keys:
+        enqueue_removals(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_released_paths(session: Session) -> None:
+    """Keep the contents in storage when the deleting transaction is rolled back"""
+    session.info.pop(PENDING_REMOVALS_KEY, None)
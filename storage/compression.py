@@ -0,0 +1,240 @@
+"""
+Compression at rest of stored contents.
+
+When STORAGE_COMPRESSION selects a codec, every new content is probed before it is stored:
+a few samples spread over the file are compressed, and the whole file is only compressed
+if the samples shrink enough. Already compressed PDFs (most exports) are stored as uploaded,
+uncompressed scans and text-heavy exports are compressed.
+
+Checksums, deduplication and the size reported to clients always refer to the original bytes.
+Readers decompress while streaming, so a compressed content is never held in memory.
+"""
+import os
+import zlib
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+
+from settings import (
+    DOWNLOAD_CHUNK_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    STORAGE_COMPRESSION,
+    STORAGE_COMPRESSION_PROBE_SIZE,
+    STORAGE_COMPRESSION_MIN_RATIO,
+)
+from .naming import unique_name
+from .uploads import StoredUpload
+
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_ZSTD = "zstd"
+
+# Levels favouring speed, contents are compressed while the upload request waits
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Number of samples the probe compresses, taken at the start, the middle and the end of the file
+PROBE_SAMPLES = 3
+
+
+@dataclass
+class StoredContent:
+    """
+    Content ready to be put into the storage backend.
+
+    Attrs:
+        - path: Local path of the bytes to store
+        - size: Number of bytes to store
+        - compression: Codec the bytes are compressed with, None if they are stored as uploaded
+    """
+    path: str
+    size: int
+    compression: Optional[str] = None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstd compression requires the zstandard package") from e
+    return zstandard
+
+
+def get_compressor(codec: str):
+    """Incremental compressor of the codec, with compress() and flush() methods"""
+    if codec == COMPRESSION_ZLIB:
+        return zlib.compressobj(ZLIB_LEVEL)
+    if codec == COMPRESSION_ZSTD:
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def _compress_sample(codec: str, sample: bytes) -> int:
+    compressor = get_compressor(codec)
+    return len(compressor.compress(sample)) + len(compressor.flush())
+
+
+def probe_compression_ratio(path: str, codec: str, probe_size: int = STORAGE_COMPRESSION_PROBE_SIZE) -> float:
+    """
+    Estimate how much the file shrinks by compressing samples of it.
+
+    Reads at most probe_size bytes, whatever the size of the file.
+    Returns the compressed size of the samples divided by their size.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return 1.0
+
+    sample_size = max(1, probe_size // PROBE_SAMPLES)
+    if size <= probe_size:
+        offsets = [0]
+        sample_size = size
+    else:
+        offsets = [0, (size - sample_size) // 2, size - sample_size]
+
+    sampled = 0
+    compressed = 0
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            sample = f.read(sample_size)
+            sampled += len(sample)
+            compressed += _compress_sample(codec, sample)
+    return compressed / sampled
+
+
+def compress_file(source: str, destination: str, codec: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> int:
+    """Compress a file into another in fixed-size chunks and return the compressed size"""
+    compressor = get_compressor(codec)
+    size = 0
+    try:
+        with open(source, "rb") as src, open(destination, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                data = compressor.compress(chunk)
+                out.write(data)
+                size += len(data)
+            data = compressor.flush()
+            out.write(data)
+            size += len(data)
+    except Exception:
+        # Do not leave a truncated file behind
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+    return size
+
+
+def _prepare(stored: StoredUpload, codec: str) -> StoredContent:
+    uncompressed = StoredContent(path=stored.path, size=stored.size)
+    if probe_compression_ratio(stored.path, codec) > STORAGE_COMPRESSION_MIN_RATIO:
+        return uncompressed
+
+    destination = os.path.join(os.path.dirname(stored.path), unique_name())
+    size = compress_file(stored.path, destination, codec)
+    if size >= stored.size:
+        # The samples were not representative of the whole file
+        os.remove(destination)
+        return uncompressed
+
+    os.remove(stored.path)
+    return StoredContent(path=destination, size=size, compression=codec)
+
+
+async def prepare_for_storage(stored: StoredUpload, codec: Optional[str] = None) -> StoredContent:
+    """
+    Compress a checksummed local file if compression is enabled and the content is worth it.
+
+    The codec defaults to STORAGE_COMPRESSION. Probing and compressing read the file,
+    so both run in the threadpool. If the content gets compressed, the original file is removed.
+    """
+    if codec is None:
+        codec = STORAGE_COMPRESSION
+    if codec == COMPRESSION_NONE:
+        return StoredContent(path=stored.path, size=stored.size)
+    return await run_in_threadpool(_prepare, stored, codec)
+
+
+async def _next_chunk(chunks: AsyncIterator[bytes]) -> Optional[bytes]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class _ChunksReader:
+    """Blocking reader of an async stream of chunks, for decompressors pulling their input from a worker thread"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks
+        self.buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.buffer:
+            chunk = anyio.from_thread.run(_next_chunk, self.chunks)
+            if chunk is None:
+                return b""
+            self.buffer = chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+async def _decompress_zlib(chunks: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj()
+    async for chunk in chunks:
+        while True:
+            data = decompressor.decompress(chunk, chunk_size)
+            if data:
+                yield data
+            chunk = decompressor.unconsumed_tail
+            if not chunk and len(data) < chunk_size:
+                break
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+async def _decompress_zstd(chunks: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    # The zstd decompressor has no output limit per input chunk, its reader API has one
+    # but pulls its input, so it runs in the threadpool and reads the chunks back from the event loop
+    outputs = _zstandard().ZstdDecompressor().read_to_iter(_ChunksReader(chunks), write_size=chunk_size)
+    while True:
+        data = await anyio.to_thread.run_sync(next, outputs, None)
+        if data is None:
+            return
+        if data:
+            yield data
+
+
+async def decompress_stream(
+    chunks: AsyncIterator[bytes],
+    codec: Optional[str],
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Decompress a stream of stored chunks as they arrive. Uncompressed streams are passed through.
+
+    Decompressed chunks hold at most chunk_size bytes, however well the stored chunks were compressed.
+    """
+    if not codec:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    if codec == COMPRESSION_ZLIB:
+        stream = _decompress_zlib(chunks, chunk_size)
+    elif codec == COMPRESSION_ZSTD:
+        stream = _decompress_zstd(chunks, chunk_size)
+    else:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    async for data in stream:
+        yield data
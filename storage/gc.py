@@ -0,0 +1,334 @@
+"""
+Garbage collector of stored contents.
+
+Deleting files, folders or datarooms only removes database rows. The storage keys their
+last reference released are queued, and the collector removes them in the background,
+so delete requests never wait on storage I/O, however large the deleted subtree is.
+
+Every GC_SWEEP_INTERVAL_SECONDS the collector also reconciles the whole storage against
+the database and removes what nothing points at anymore: contents released by a worker
+that stopped before collecting them, temporary files of interrupted uploads, and the
+partial files of upload sessions that expired or were deleted with their folder.
+
+- Objects written within the grace period are never removed, they may belong to an upload in progress
+- Storage keys are checked against the database in batches of GC_BATCH_SIZE
+- Deletes are throttled to GC_MAX_DELETES_PER_SECOND
+- A dry run only reports what would be removed
+
+Run a sweep by hand with `python -m storage gc --dry-run`.
+"""
+import os
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import (
+    dataclass,
+    field,
+)
+from datetime import (
+    datetime,
+    timedelta,
+)
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import (
+    select,
+    union,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from logger import logger
+from models import (
+    Blob,
+    File as FileModel,
+    UploadSession,
+)
+from settings import (
+    GC_QUEUE_INTERVAL_SECONDS,
+    GC_SWEEP_INTERVAL_SECONDS,
+    GC_GRACE_PERIOD_SECONDS,
+    GC_BATCH_SIZE,
+    GC_MAX_DELETES_PER_SECOND,
+    UPLOAD_TEMP_DIRECTORY,
+    UPLOAD_SESSIONS_DIRECTORY,
+)
+from .backends import get_storage
+from .base import StoredObject
+
+# Storage keys released by committed deletes, waiting to be collected
+_released: Deque[str] = deque()
+
+# Storage key -> [lock, number of coroutines holding or waiting for it], entries live while the key is in use
+_key_locks: Dict[str, list] = {}
+
+
+@dataclass
+class GCReport:
+    """
+    What a garbage collection removed, or would remove in a dry run.
+
+    Attrs:
+        - dry_run: Whether anything was actually removed
+        - checked: Number of storage objects checked against the database
+        - removed: Storage keys and local paths that were removed
+        - removed_bytes: Total size of the removed objects
+        - skipped_recent: Number of unreferenced objects kept because they are within the grace period
+        - errors: Number of objects that could not be removed
+    """
+    dry_run: bool = False
+    checked: int = 0
+    removed: List[str] = field(default_factory=list)
+    removed_bytes: int = 0
+    skipped_recent: int = 0
+    errors: int = 0
+
+
+class _Throttle:
+    """Spaces out operations so at most `rate` of them run per second"""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+@asynccontextmanager
+async def content_lock(key: str) -> AsyncIterator[None]:
+    """
+    Hold a storage key against the collector.
+
+    Storing a content and collecting it both take the lock of its key, so a content written again
+    while the collector checks it is either written before the check, and kept, or after the delete.
+    """
+    entry = _key_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _key_locks[key]
+
+
+def enqueue_removals(keys: Iterable[str]) -> None:
+    """Queue storage keys released by a committed transaction for the collector"""
+    _released.extend(keys)
+
+
+def _referenced_keys(bind: Engine, keys: List[str]) -> Set[str]:
+    """The keys among the given ones that a blob or a legacy file still points at"""
+    with Session(bind=bind) as db:
+        return set(db.execute(union(
+            select(Blob.file_path).where(Blob.file_path.in_(keys)),
+            select(FileModel.file_path).where(FileModel.file_path.in_(keys)),
+        )).scalars())
+
+
+async def _collect_batch(
+    bind: Engine,
+    objects: List[StoredObject],
+    report: GCReport,
+    throttle: _Throttle,
+    cutoff: datetime,
+) -> None:
+    """
+    Remove the objects of a batch that nothing in the database points at.
+
+    The batch is checked at once, then every object is checked again under its content lock right before
+    it is deleted: throttled deletes happen long after the batch check, and the same content may have
+    been stored again in the meantime.
+    """
+    referenced = await run_in_threadpool(_referenced_keys, bind, [stored.key for stored in objects])
+    report.checked += len(objects)
+    storage = get_storage()
+
+    for stored in objects:
+        if stored.key in referenced:
+            continue
+        if stored.modified_at > cutoff:
+            report.skipped_recent += 1
+            continue
+        if not report.dry_run:
+            await throttle.wait()
+            async with content_lock(stored.key):
+                current = await storage.stat(stored.key)
+                if current is None:
+                    continue
+                if current.modified_at > cutoff:
+                    report.skipped_recent += 1
+                    continue
+                if await run_in_threadpool(_referenced_keys, bind, [stored.key]):
+                    continue
+                try:
+                    await storage.delete(stored.key)
+                except Exception as e:
+                    logger.warning(f"Could not delete unreferenced content {stored.key}: {e}")
+                    report.errors += 1
+                    continue
+        report.removed.append(stored.key)
+        report.removed_bytes += stored.size
+
+
+async def collect_released(
+    bind: Engine,
+    dry_run: bool = False,
+    grace_period: int = GC_GRACE_PERIOD_SECONDS,
+    batch_size: int = GC_BATCH_SIZE,
+    max_deletes_per_second: Optional[float] = GC_MAX_DELETES_PER_SECOND,
+) -> GCReport:
+    """
+    Remove the contents released by deletes since the last run.
+
+    Every key is checked again before it is removed, since the same content may have been uploaded
+    again in the meantime. Keys still within the grace period are left to the next sweep.
+    A dry run leaves the queue untouched.
+    """
+    report = GCReport(dry_run=dry_run)
+    throttle = _Throttle(max_deletes_per_second)
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_period)
+    storage = get_storage()
+
+    if dry_run:
+        keys = list(_released)
+    else:
+        keys = []
+        while _released:
+            keys.append(_released.popleft())
+    keys = list(dict.fromkeys(keys))
+
+    for start in range(0, len(keys), batch_size):
+        objects = []
+        for key in keys[start:start + batch_size]:
+            stored = await storage.stat(key)
+            if stored is not None:
+                objects.append(stored)
+        await _collect_batch(bind, objects, report, throttle, cutoff)
+    return report
+
+
+def _stale_upload_files(bind: Engine, cutoff: datetime) -> List[str]:
+    """
+    Local upload files nothing will ever use again.
+
+    - Temporary uploads older than the cutoff, left behind by interrupted requests
+    - Partial files of upload sessions that expired or are gone, e.g. deleted with their folder
+    """
+    paths = []
+    if os.path.isdir(UPLOAD_TEMP_DIRECTORY):
+        for entry in os.scandir(UPLOAD_TEMP_DIRECTORY):
+            if entry.is_file() and datetime.utcfromtimestamp(entry.stat().st_mtime) < cutoff:
+                paths.append(entry.path)
+
+    if os.path.isdir(UPLOAD_SESSIONS_DIRECTORY):
+        with Session(bind=bind) as db:
+            session_ids = set(db.execute(
+                select(UploadSession.id).where(UploadSession.expires_at >= datetime.utcnow())
+            ).scalars())
+        for entry in os.scandir(UPLOAD_SESSIONS_DIRECTORY):
+            name, ext = os.path.splitext(entry.name)
+            if (
+                entry.is_file()
+                and ext == ".part"
+                and not (name.isdigit() and int(name) in session_ids)
+                and datetime.utcfromtimestamp(entry.stat().st_mtime) < cutoff
+            ):
+                paths.append(entry.path)
+    return paths
+
+
+def _expire_upload_sessions(bind: Engine) -> int:
+    """Delete the upload sessions that can no longer be resumed, their partial files become stale"""
+    with Session(bind=bind) as db:
+        expired = db.query(UploadSession).filter(UploadSession.expires_at < datetime.utcnow()).all()
+        for db_session in expired:
+            db.delete(db_session)
+        db.commit()
+        return len(expired)
+
+
+async def sweep(
+    bind: Engine,
+    dry_run: bool = False,
+    grace_period: int = GC_GRACE_PERIOD_SECONDS,
+    batch_size: int = GC_BATCH_SIZE,
+    max_deletes_per_second: Optional[float] = GC_MAX_DELETES_PER_SECOND,
+) -> GCReport:
+    """
+    Reconcile the whole storage against the database and remove whatever nothing points at.
+
+    Objects below hidden top-level directories (".tmp", ".sessions") are not contents,
+    they are handled separately as leftovers of uploads.
+    """
+    report = GCReport(dry_run=dry_run)
+    throttle = _Throttle(max_deletes_per_second)
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_period)
+
+    batch = []
+    async for stored in get_storage().list_objects():
+        if stored.key.startswith("."):
+            continue
+        batch.append(stored)
+        if len(batch) >= batch_size:
+            await _collect_batch(bind, batch, report, throttle, cutoff)
+            batch = []
+    if batch:
+        await _collect_batch(bind, batch, report, throttle, cutoff)
+
+    if not dry_run:
+        await run_in_threadpool(_expire_upload_sessions, bind)
+    for path in await run_in_threadpool(_stale_upload_files, bind, cutoff):
+        size = os.path.getsize(path)
+        if not dry_run:
+            await throttle.wait()
+            try:
+                await run_in_threadpool(os.remove, path)
+            except OSError as e:
+                logger.warning(f"Could not delete stale upload file {path}: {e}")
+                report.errors += 1
+                continue
+        report.removed.append(path)
+        report.removed_bytes += size
+    return report
+
+
+async def run_garbage_collector(bind: Engine) -> None:
+    """
+    Collect released contents every GC_QUEUE_INTERVAL_SECONDS and sweep the storage
+    every GC_SWEEP_INTERVAL_SECONDS, until cancelled.
+
+    Runs as a task of the worker's event loop, started and cancelled by the application lifespan.
+    """
+    last_sweep = time.monotonic()
+    while True:
+        await asyncio.sleep(GC_QUEUE_INTERVAL_SECONDS)
+        try:
+            report = await collect_released(bind)
+            if time.monotonic() - last_sweep >= GC_SWEEP_INTERVAL_SECONDS:
+                last_sweep = time.monotonic()
+                swept = await sweep(bind)
+                report.removed.extend(swept.removed)
+                report.removed_bytes += swept.removed_bytes
+            if report.removed:
+                logger.info(f"Garbage collector removed {len(report.removed)} objects ({report.removed_bytes} bytes)")
+        except Exception:
+            logger.exception("Garbage collection failed")
+
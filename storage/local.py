@@ -0,0 +1,112 @@
+import os
+from datetime import datetime
+from typing import (
+    AsyncIterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import aiofiles
+import aiofiles.os
+from fastapi.concurrency import run_in_threadpool
+
+from settings import UPLOAD_CHUNK_SIZE
+from .base import (
+    StorageBackend,
+    StoredObject,
+)
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Storage backend keeping objects as files below a root directory.
+
+    Storage keys map to paths relative to the root.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    async def put_file(self, key: str, source_path: str) -> StoredObject:
+        path = self.local_path(key)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A rename within the same filesystem, no bytes are copied
+        await aiofiles.os.replace(source_path, path)
+        return await self.stat(key)
+
+    async def open_stream(self, key: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.local_path(key), "rb") as f:
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def get_range(
+        self,
+        key: str,
+        start: int,
+        end: int,
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        remaining = end - start + 1
+        async with aiofiles.open(self.local_path(key), "rb") as f:
+            await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        try:
+            await aiofiles.os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat_result = await aiofiles.os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(
+            key=key,
+            size=stat_result.st_size,
+            modified_at=datetime.utcfromtimestamp(stat_result.st_mtime)
+        )
+
+    async def list_objects(self) -> AsyncIterator[StoredObject]:
+        # One directory is scanned at a time, so huge trees are never listed in memory at once
+        directories = [self.root]
+        while directories:
+            directory = directories.pop()
+            for path, is_dir, size, mtime in await run_in_threadpool(_scan_directory, directory):
+                if is_dir:
+                    directories.append(path)
+                    continue
+                yield StoredObject(
+                    key=os.path.relpath(path, self.root).replace(os.sep, "/"),
+                    size=size,
+                    modified_at=datetime.utcfromtimestamp(mtime)
+                )
+
+
+def _scan_directory(directory: str) -> List[Tuple[str, bool, int, float]]:
+    """List the entries of a directory with their size and modification time"""
+    entries = []
+    try:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append((entry.path, True, 0, 0.0))
+                elif entry.is_file(follow_symlinks=False):
+                    stat_result = entry.stat(follow_symlinks=False)
+                    entries.append((entry.path, False, stat_result.st_size, stat_result.st_mtime))
+    except FileNotFoundError:
+        pass
+    return entries
@@ -0,0 +1,36 @@
+"""
+Storage naming scheme.
+
+Names are derived from the content checksum or generated at random, so a free name
+is known without looking at the storage: there is no probing and no race between
+concurrent uploads, no matter how many files share the same original filename.
+Keys are spread over a fixed number of prefix levels, which bounds the size of every
+directory on the local backend.
+"""
+import uuid
+
+from settings import (
+    STORAGE_FANOUT_DEPTH,
+    STORAGE_FANOUT_WIDTH,
+)
+
+
+def fanout_key(prefix: str, name: str, depth: int = STORAGE_FANOUT_DEPTH, width: int = STORAGE_FANOUT_WIDTH) -> str:
+    """
+    Build a storage key spreading names over `depth` levels of `width` character prefixes.
+
+    With hex names, every level holds at most 16 ** width entries,
+    e.g. fanout_key("blobs", "abcdef...") == "blobs/ab/cd/abcdef..." for depth 2 and width 2.
+    """
+    levels = [name[i * width:(i + 1) * width] for i in range(depth)]
+    return "/".join([prefix, *levels, name])
+
+
+def blob_key(checksum: str) -> str:
+    """Storage key of the content with the given SHA-256 checksum"""
+    return fanout_key("blobs", checksum)
+
+
+def unique_name() -> str:
+    """Random name for a file whose content is not known yet, e.g. an upload being received"""
+    return uuid.uuid4().hex
@@ -0,0 +1,190 @@
+"""
+Page range extracts of stored PDF documents.
+
+Assembled from the page index built by the processing pipeline (see processing.pages): the objects
+the pages need are copied from range reads of the stored content, and a new page tree, catalog
+and cross-reference table are written around them. The document is never parsed.
+"""
+from typing import (
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from starlette.responses import (
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.types import (
+    Receive,
+    Scope,
+    Send,
+)
+
+from settings import PAGE_EXTRACT_READ_GAP
+from .backends import get_storage
+from .responses import (
+    content_disposition,
+    read_stored_range,
+)
+
+# The binary comment tells transfer tools the file is not text
+PDF_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+
+# (object number, generation, offset in the stored content, length)
+CopiedObject = Tuple[int, int, int, int]
+
+
+def _object(number: int, generation: int, body: str) -> bytes:
+    return f"{number} {generation} obj\n{body}\nendobj\n".encode("latin-1")
+
+
+def _read_groups(copies: List[CopiedObject], compression: Optional[str]) -> List[List[CopiedObject]]:
+    """
+    Group the objects to copy into as few reads as reasonable.
+
+    Compressed contents are decompressed from their start whatever is read, so they are read once.
+    """
+    groups: List[List[CopiedObject]] = []
+    for copy in copies:
+        if groups:
+            _, _, offset, length = groups[-1][-1]
+            if compression or copy[2] - (offset + length) <= PAGE_EXTRACT_READ_GAP:
+                groups[-1].append(copy)
+                continue
+        groups.append([copy])
+    return groups
+
+
+async def _copy_objects(chunks: AsyncIterator[bytes], start: int, copies: List[CopiedObject]) -> AsyncIterator[bytes]:
+    """Keep the bytes of the objects, sorted by offset, from the chunks of a read starting at start"""
+    pending = iter(copies)
+    current = next(pending, None)
+    position = start
+    async for chunk in chunks:
+        chunk_start = position
+        position += len(chunk)
+        while current is not None:
+            _, _, offset, length = current
+            end = offset + length
+            low, high = max(offset, chunk_start), min(end, position)
+            if low < high:
+                yield chunk[low - chunk_start:high - chunk_start]
+            if end > position:
+                break
+            yield b"\n"
+            current = next(pending, None)
+        if current is None:
+            break
+
+
+class PageRangeResponse(Response):
+    """
+    Response sending a standalone PDF of some pages of a stored document.
+
+    pages are the indexed pages to extract, in order: PageIndex rows or IndexedPage.
+    The layout of the extract, and so its length, is computed before anything is read.
+    Like StoredFileResponse, the storage is only touched when the response is sent.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        filename: str,
+        pages: Sequence,
+        compression: Optional[str] = None,
+        headers: Optional[dict] = None,
+    ):
+        self.key = key
+        self.filename = filename
+        self.pages = pages
+        self.compression = compression
+        self.media_type = "application/pdf"
+        self.extra_headers = dict(headers or {})
+        self.status_code = 200
+        self.background = None
+
+    def _layout(self) -> Tuple[List[CopiedObject], bytes, int]:
+        """The objects to copy, by offset, the bytes written after them and the total length"""
+        copied: Dict[int, CopiedObject] = {}
+        inline: Dict[int, str] = {}
+        for page in self.pages:
+            for number, generation, offset, length in page.objects:
+                copied[number] = (number, generation, offset, length)
+            for number, body in page.inline_objects.items():
+                inline[int(number)] = body
+
+        numbers = [*copied, *inline, *(page.object_number for page in self.pages)]
+        tree = max(numbers) + 1
+        catalog = tree + 1
+
+        # Object number -> (generation, offset in the extract)
+        offsets: Dict[int, Tuple[int, int]] = {}
+        position = len(PDF_HEADER)
+        copies = sorted(copied.values(), key=lambda copy: copy[2])
+        for number, generation, _, length in copies:
+            offsets[number] = (generation, position)
+            position += length + 1
+
+        tail = []
+
+        def _write(number: int, generation: int, body: str) -> None:
+            nonlocal position
+            data = _object(number, generation, body)
+            offsets[number] = (generation, position)
+            position += len(data)
+            tail.append(data)
+
+        for number in sorted(inline):
+            _write(number, 0, inline[number])
+        for page in self.pages:
+            # The serialized dictionary starts with "<<", the page is attached to the new page tree
+            _write(page.object_number, page.generation, f"<<\n/Parent {tree} 0 R" + page.dictionary[2:])
+        kids = " ".join(f"{page.object_number} {page.generation} R" for page in self.pages)
+        _write(tree, 0, f"<<\n/Type /Pages\n/Kids [ {kids} ]\n/Count {len(self.pages)}\n>>")
+        _write(catalog, 0, f"<<\n/Type /Catalog\n/Pages {tree} 0 R\n>>")
+
+        # One subsection per run of consecutive object numbers, the numbers in between are free
+        xref = ["xref\n"]
+        entries = [(0, 65535, 0, "f")]
+        entries.extend((number, generation, offset, "n") for number, (generation, offset) in sorted(offsets.items()))
+        runs: List[list] = []
+        for entry in entries:
+            if runs and runs[-1][-1][0] + 1 == entry[0]:
+                runs[-1].append(entry)
+            else:
+                runs.append([entry])
+        for run in runs:
+            xref.append(f"{run[0][0]} {len(run)}\n")
+            xref.extend(f"{offset:010d} {generation:05d} {kind}\r\n" for _, generation, offset, kind in run)
+        xref.append(f"trailer\n<<\n/Size {catalog + 1}\n/Root {catalog} 0 R\n>>\nstartxref\n{position}\n%%EOF\n")
+        # The cross-reference table starts at position, right after the last object
+        tail.append("".join(xref).encode("latin-1"))
+        return copies, b"".join(tail), position + len(tail[-1])
+
+    async def _stream(self, copies: List[CopiedObject], tail: bytes) -> AsyncIterator[bytes]:
+        yield PDF_HEADER
+        for group in _read_groups(copies, self.compression):
+            start = group[0][2]
+            end = group[-1][2] + group[-1][3] - 1
+            async for chunk in _copy_objects(read_stored_range(self.key, self.compression, start, end), start, group):
+                yield chunk
+        yield tail
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stored = await get_storage().stat(self.key)
+        if stored is None:
+            response = JSONResponse({"detail": "File not found on disk"}, status_code=404)
+            await response(scope, receive, send)
+            return
+
+        copies, tail, length = self._layout()
+        headers = dict(self.extra_headers)
+        headers["content-length"] = str(length)
+        headers["content-disposition"] = content_disposition(self.filename)
+        response = StreamingResponse(self._stream(copies, tail), media_type=self.media_type, headers=headers)
+        await response(scope, receive, send)
@@ -0,0 +1,349 @@
+from datetime import (
+    datetime,
+    timezone,
+)
+from email.utils import (
+    format_datetime,
+    parsedate_to_datetime,
+)
+from typing import (
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import quote
+
+from settings import (
+    DOWNLOAD_MODE,
+    DOWNLOAD_ACCEL_LOCATION,
+)
+
+from starlette.datastructures import Headers
+from starlette.responses import (
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.types import (
+    Receive,
+    Scope,
+    Send,
+)
+
+from .backends import get_storage
+from .compression import decompress_stream
+from .naming import unique_name
+from .sendfile import SendfileResponse
+
+# Requests asking for more ranges than this get the whole file instead
+MAX_RANGES = 16
+
+
+def parse_range_header(value: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into (start, end) byte ranges, both inclusive, sorted and merged.
+
+    Returns None if the header is malformed or not about bytes, so the whole file is sent.
+    Returns an empty list if no range can be satisfied.
+    """
+    unit, _, specs = value.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+            else:
+                # Suffix range, the last N bytes
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start = max(0, size - suffix)
+                end = size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    """Parse an HTTP date into a naive UTC datetime"""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+    return parsed
+
+
+def content_disposition(filename: str) -> str:
+    """Content-Disposition of an attachment, with an RFC 5987 encoded name if it is not plain ASCII"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def _slice_stream(stream: AsyncIterator[bytes], start: int, end: int) -> AsyncIterator[bytes]:
+    """Keep the bytes from start to end (both inclusive) of a stream"""
+    position = 0
+    async for chunk in stream:
+        chunk_end = position + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(0, start - position):end + 1 - position]
+        position = chunk_end
+        if position > end:
+            break
+
+
+def read_stored_range(key: str, compression: Optional[str], start: int, end: int) -> AsyncIterator[bytes]:
+    """Stream the bytes from start to end (both inclusive) of a stored content, decompressed"""
+    storage = get_storage()
+    if not compression:
+        return storage.get_range(key, start, end)
+    # Compressed contents cannot be seeked, the bytes before the range are decompressed and dropped
+    return _slice_stream(decompress_stream(storage.open_stream(key), compression), start, end)
+
+
+class StoredFileResponse(Response):
+    """
+    Response sending a file kept by the storage backend.
+
+    The endpoint only authorizes and builds this response. The storage lookup happens
+    when the response is sent, on the event loop, so sync endpoints never wait on storage I/O.
+    Uncompressed local files, whole or a single range of them, are handed to SendfileResponse,
+    which uses os.sendfile when the server supports it. Everything else is streamed.
+    Contents compressed at rest are decompressed while streaming, size is their original size.
+
+    Conditional and partial requests are supported:
+    - The ETag (content checksum) and Last-Modified validators are answered with 304 when they match
+    - Range requests are answered with 206 (multipart/byteranges for several ranges) or 416
+
+    on_download is called once the response is known to send the file: a 200, or a 206 starting at the first byte.
+    Revalidations, errors and the later ranges of a file being read (e.g. by a PDF viewer) are not downloads.
+
+    With DOWNLOAD_MODE "x-accel", uncompressed local files are not sent by the worker at all:
+    the response only carries an X-Accel-Redirect header and nginx sends the file,
+    answering range requests itself.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        filename: str,
+        media_type: str = "application/pdf",
+        headers: Optional[dict] = None,
+        compression: Optional[str] = None,
+        size: Optional[int] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[datetime] = None,
+        on_download: Optional[Callable[[], None]] = None,
+    ):
+        # The status and headers are only known once the stored file has been looked up,
+        # so the inner response builds them and Response.__init__ is not used here
+        self.key = key
+        self.filename = filename
+        self.media_type = media_type
+        self.compression = compression
+        self.size = size
+        self.etag = f'"{etag}"' if etag else None
+        # HTTP dates have a resolution of one second
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+        self.extra_headers = dict(headers or {})
+        self.on_download = on_download
+        self.status_code = 200
+        self.background = None
+
+    def _validator_headers(self) -> dict:
+        headers = dict(self.extra_headers)
+        if self.etag:
+            headers["etag"] = self.etag
+        if self.last_modified:
+            last_modified = self.last_modified.replace(tzinfo=timezone.utc)
+            headers["last-modified"] = format_datetime(last_modified, usegmt=True)
+        return headers
+
+    def _is_not_modified(self, request_headers: Headers) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since
+        if "if-none-match" in request_headers:
+            if not self.etag:
+                return False
+            value = request_headers["if-none-match"].strip()
+            # Weak comparison, W/"x" matches "x"
+            return value == "*" or self.etag in [tag.strip().removeprefix("W/") for tag in value.split(",")]
+
+        if "if-modified-since" in request_headers and self.last_modified:
+            since = _parse_http_date(request_headers["if-modified-since"])
+            return since is not None and self.last_modified <= since
+        return False
+
+    def _range_applies(self, request_headers: Headers) -> bool:
+        """A Range header only applies while the If-Range validator, if any, still matches"""
+        if "range" not in request_headers:
+            return False
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+
+        if_range = if_range.strip()
+        if if_range.startswith(("\"", "W/")):
+            # Strong comparison, ranges of weakly validated contents cannot be combined
+            return self.etag is not None and if_range == self.etag
+        return self.last_modified is not None and _parse_http_date(if_range) == self.last_modified
+
+    def _count_download(self, ranges: Optional[List[Tuple[int, int]]]) -> None:
+        if self.on_download is not None and (ranges is None or (ranges and ranges[0][0] == 0)):
+            self.on_download()
+
+    def _read_range(self, start: int, end: int) -> AsyncIterator[bytes]:
+        return read_stored_range(self.key, self.compression, start, end)
+
+    def _part_header(self, boundary: str, start: int, end: int, size: int) -> bytes:
+        return (
+            f"--{boundary}\r\n"
+            f"Content-Type: {self.media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("latin-1")
+
+    async def _multipart_ranges(self, ranges: List[Tuple[int, int]], size: int, boundary: str) -> AsyncIterator[bytes]:
+        for start, end in ranges:
+            yield self._part_header(boundary, start, end, size)
+            async for chunk in self._read_range(start, end):
+                yield chunk
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode("latin-1")
+
+    def _partial_response(
+        self,
+        ranges: List[Tuple[int, int]],
+        size: int,
+        headers: dict,
+        local_path: Optional[str] = None,
+    ) -> Response:
+        if not ranges:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers, background=self.background)
+
+        headers["content-disposition"] = content_disposition(self.filename)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            if local_path is not None and not self.compression:
+                return SendfileResponse(
+                    local_path,
+                    end - start + 1,
+                    offset=start,
+                    status_code=206,
+                    media_type=self.media_type,
+                    headers=headers,
+                    background=self.background,
+                )
+            headers["content-length"] = str(end - start + 1)
+            return StreamingResponse(
+                self._read_range(start, end),
+                status_code=206,
+                media_type=self.media_type,
+                headers=headers,
+                background=self.background,
+            )
+
+        boundary = unique_name()
+        length = len(f"--{boundary}--\r\n")
+        for start, end in ranges:
+            length += len(self._part_header(boundary, start, end, size)) + end - start + 1 + len(b"\r\n")
+        headers["content-length"] = str(length)
+        return StreamingResponse(
+            self._multipart_ranges(ranges, size, boundary),
+            status_code=206,
+            media_type=f"multipart/byteranges; boundary={boundary}",
+            headers=headers,
+            background=self.background,
+        )
+
+    def _accel_redirect_response(self, headers: dict) -> Response:
+        """Hand the file over to nginx, which keeps the content type and disposition of this response"""
+        headers["x-accel-redirect"] = DOWNLOAD_ACCEL_LOCATION.rstrip("/") + "/" + quote(self.key)
+        headers["content-disposition"] = content_disposition(self.filename)
+        return Response(media_type=self.media_type, headers=headers, background=self.background)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        storage = get_storage()
+        stored = await storage.stat(self.key)
+        if stored is None:
+            response = JSONResponse(
+                {"detail": "File not found on disk"},
+                status_code=404,
+                background=self.background,
+            )
+            await response(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        headers = self._validator_headers()
+        if self._is_not_modified(request_headers):
+            await Response(status_code=304, headers=headers, background=self.background)(scope, receive, send)
+            return
+
+        local_path = storage.local_path(self.key)
+        if DOWNLOAD_MODE == "x-accel" and local_path is not None and not self.compression:
+            # nginx answers range requests itself, they are counted as the worker would count them
+            ranges = None
+            if self._range_applies(request_headers):
+                ranges = parse_range_header(request_headers["range"], stored.size)
+            self._count_download(ranges)
+            await self._accel_redirect_response(headers)(scope, receive, send)
+            return
+
+        size = self.size if self.compression else stored.size
+        if size is not None:
+            headers["accept-ranges"] = "bytes"
+            if self._range_applies(request_headers):
+                ranges = parse_range_header(request_headers["range"], size)
+                if ranges is not None:
+                    self._count_download(ranges)
+                    await self._partial_response(ranges, size, headers, local_path)(scope, receive, send)
+                    return
+
+        self._count_download(None)
+        headers["content-disposition"] = content_disposition(self.filename)
+        if local_path is not None and not self.compression:
+            response = SendfileResponse(
+                local_path,
+                stored.size,
+                media_type=self.media_type,
+                headers=headers,
+                background=self.background,
+            )
+        else:
+            if size is not None:
+                headers["content-length"] = str(size)
+            response = StreamingResponse(
+                decompress_stream(storage.open_stream(self.key), self.compression),
+                media_type=self.media_type,
+                headers=headers,
+                background=self.background,
+            )
+        await response(scope, receive, send)
@@ -0,0 +1,186 @@
+import asyncio
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+import aiofiles
+import aiofiles.os
+
+from logger import logger
+from settings import (
+    UPLOAD_CHUNK_SIZE,
+    S3_MULTIPART_CHUNK_SIZE,
+)
+from .base import (
+    StorageBackend,
+    StoredObject,
+)
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    Storage backend keeping objects in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    A single aiobotocore client is shared by all requests of a worker, so its
+    connection pool is reused instead of opening a connection per operation.
+    aiobotocore is only needed when this backend is selected.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        max_pool_connections: int = 10,
+        multipart_chunk_size: int = S3_MULTIPART_CHUNK_SIZE,
+    ):
+        try:
+            from aiobotocore.config import AioConfig
+            from aiobotocore.session import get_session
+        except ImportError as e:
+            raise RuntimeError("The S3 storage backend requires the aiobotocore package") from e
+
+        self.bucket = bucket
+        self.multipart_chunk_size = multipart_chunk_size
+        self._session = get_session()
+        self._client_kwargs = {
+            "endpoint_url": endpoint_url,
+            "region_name": region_name,
+            "aws_access_key_id": access_key_id,
+            "aws_secret_access_key": secret_access_key,
+            "config": AioConfig(max_pool_connections=max_pool_connections),
+        }
+        self._client = None
+        self._client_context = None
+        self._client_loop = None
+        self._client_lock = None
+
+    async def _get_client(self):
+        """
+        Get the pooled client, creating it on first use.
+
+        The client is bound to the event loop it was created in,
+        so a new one is created when the backend is used from another loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._client_loop is loop:
+            return self._client
+
+        if self._client_lock is None or self._client_loop is not loop:
+            self._client_lock = asyncio.Lock()
+            self._client_loop = loop
+            self._client = None
+
+        async with self._client_lock:
+            if self._client is None:
+                self._client_context = self._session.create_client("s3", **self._client_kwargs)
+                self._client = await self._client_context.__aenter__()
+        return self._client
+
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    async def put_file(self, key: str, source_path: str) -> StoredObject:
+        client = await self._get_client()
+        size = (await aiofiles.os.stat(source_path)).st_size
+
+        async with aiofiles.open(source_path, "rb") as f:
+            if size <= self.multipart_chunk_size:
+                await client.put_object(Bucket=self.bucket, Key=key, Body=await f.read())
+            else:
+                # Large files are sent in parts, so only one part is held in memory at a time
+                upload = await client.create_multipart_upload(Bucket=self.bucket, Key=key)
+                upload_id = upload["UploadId"]
+                parts = []
+                try:
+                    while True:
+                        chunk = await f.read(self.multipart_chunk_size)
+                        if not chunk:
+                            break
+                        part_number = len(parts) + 1
+                        part = await client.upload_part(
+                            Bucket=self.bucket,
+                            Key=key,
+                            UploadId=upload_id,
+                            PartNumber=part_number,
+                            Body=chunk
+                        )
+                        parts.append({"ETag": part["ETag"], "PartNumber": part_number})
+                    await client.complete_multipart_upload(
+                        Bucket=self.bucket,
+                        Key=key,
+                        UploadId=upload_id,
+                        MultipartUpload={"Parts": parts}
+                    )
+                except Exception:
+                    await client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+                    raise
+
+        await aiofiles.os.remove(source_path)
+        return await self.stat(key)
+
+    async def _stream_body(self, chunk_size: int, **get_kwargs) -> AsyncIterator[bytes]:
+        client = await self._get_client()
+        response = await client.get_object(Bucket=self.bucket, **get_kwargs)
+        async with response["Body"] as body:
+            while True:
+                chunk = await body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def open_stream(self, key: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        return self._stream_body(chunk_size, Key=key)
+
+    def get_range(
+        self,
+        key: str,
+        start: int,
+        end: int,
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        return self._stream_body(chunk_size, Key=key, Range=f"bytes={start}-{end}")
+
+    async def delete(self, key: str) -> None:
+        client = await self._get_client()
+        await client.delete_object(Bucket=self.bucket, Key=key)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        client = await self._get_client()
+        try:
+            response = await client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if self._is_not_found(e):
+                return None
+            raise
+        return StoredObject(
+            key=key,
+            size=response["ContentLength"],
+            modified_at=response["LastModified"].replace(tzinfo=None)
+        )
+
+    async def list_objects(self) -> AsyncIterator[StoredObject]:
+        client = await self._get_client()
+        paginator = client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.bucket):
+            for item in page.get("Contents", []):
+                yield StoredObject(
+                    key=item["Key"],
+                    size=item["Size"],
+                    modified_at=item["LastModified"].replace(tzinfo=None)
+                )
+
+    async def close(self) -> None:
+        if self._client_context is not None:
+            try:
+                await self._client_context.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Could not close the S3 client: {e}")
+        self._client = None
+        self._client_context = None
+        self._client_loop = None
@@ -0,0 +1,102 @@
+import os
+from typing import (
+    Mapping,
+    Optional,
+)
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import (
+    Receive,
+    Scope,
+    Send,
+)
+
+from settings import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_ZEROCOPY,
+)
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+def supports_zerocopy(scope: Scope) -> bool:
+    """Whether the server handling the request takes files to send with os.sendfile"""
+    return DOWNLOAD_ZEROCOPY and ZEROCOPY_EXTENSION in (scope.get("extensions") or {})
+
+
+def without_zerocopy(scope: Scope) -> Scope:
+    """Copy of a scope not advertising the zerocopysend extension, for wrappers that need to see the bytes sent"""
+    extensions = scope.get("extensions")
+    if not extensions or ZEROCOPY_EXTENSION not in extensions:
+        return scope
+    return {**scope, "extensions": {name: value for name, value in extensions.items() if name != ZEROCOPY_EXTENSION}}
+
+
+class SendfileResponse(Response):
+    """
+    Response sending count bytes of a local file from offset, without copying them through Python when possible.
+
+    Servers implementing the ASGI zerocopysend extension get the open file and send it with os.sendfile,
+    the bytes go from the page cache to the socket within the kernel. Other servers get the bytes in
+    DOWNLOAD_CHUNK_SIZE chunks, each read with a single pread in the threadpool.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        count: int,
+        offset: int = 0,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.path = path
+        self.count = count
+        self.offset = offset
+        headers = dict(headers or {})
+        headers["content-length"] = str(count)
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type, background=background)
+
+    async def _zerocopy_send(self, send: Send) -> None:
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file,
+                "offset": self.offset,
+                "count": self.count,
+                "more_body": False,
+            })
+        finally:
+            file.close()
+
+    async def _chunked_send(self, send: Send) -> None:
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            position, end = self.offset, self.offset + self.count
+            while position < end:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(DOWNLOAD_CHUNK_SIZE, end - position), position)
+                if not chunk:
+                    # The file was truncated after its size was taken
+                    break
+                position += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": position < end})
+            if position < end:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method", "GET").upper() == "HEAD" or self.count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif supports_zerocopy(scope):
+            await self._zerocopy_send(send)
+        else:
+            await self._chunked_send(send)
+
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,178 @@
+import os
+import hashlib
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    BinaryIO,
+    Tuple,
+)
+
+import aiofiles
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from settings import (
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_SESSIONS_DIRECTORY,
+    UPLOAD_TEMP_DIRECTORY,
+)
+from .naming import unique_name
+
+
+@dataclass
+class StoredUpload:
+    """
+    Result of copying an upload to disk.
+
+    Attrs:
+        - path: The path the upload was written to
+        - size: Number of bytes written
+        - checksum: Hex encoded SHA-256 digest of the written bytes
+    """
+    path: str
+    size: int
+    checksum: str
+
+
+def temp_upload_path() -> str:
+    """Build a unique temporary path for an upload whose checksum is not known yet"""
+    os.makedirs(UPLOAD_TEMP_DIRECTORY, exist_ok=True)
+    return os.path.join(UPLOAD_TEMP_DIRECTORY, unique_name())
+
+
+def _checksum_stream(source: BinaryIO, chunk_size: int) -> Tuple[int, str]:
+    """Compute the size and SHA-256 checksum of a file object in fixed-size chunks"""
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+        size += len(chunk)
+    return size, hasher.hexdigest()
+
+
+def _copy_stream(source: BinaryIO, destination: str, chunk_size: int) -> StoredUpload:
+    """
+    Copy a file object to disk in fixed-size chunks.
+
+    Size and checksum are computed while copying, so the data is read only once
+    and at most one chunk is held in memory at a time.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+
+    source.seek(0)
+    try:
+        with open(destination, "wb") as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+    except Exception:
+        # Do not leave a truncated file behind
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+
+    return StoredUpload(path=destination, size=size, checksum=hasher.hexdigest())
+
+
+async def save_upload_file(
+    upload: UploadFile,
+    destination: str,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    Stream an uploaded file to disk without loading it into memory.
+
+    The upload is already spooled by Starlette, so the whole copy runs in the threadpool
+    and the event loop stays free for other requests while the bytes are written.
+    """
+    return await run_in_threadpool(_copy_stream, upload.file, destination, chunk_size)
+
+
+def session_part_path(session_id: int) -> str:
+    """Path of the partial file holding the bytes received so far by an upload session"""
+    return os.path.join(UPLOAD_SESSIONS_DIRECTORY, f"{session_id}.part")
+
+
+async def write_stream_at(
+    stream: AsyncIterator[bytes],
+    destination: str,
+    offset: int,
+    limit: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> int:
+    """
+    Write a request body stream into a partial file starting at the given offset.
+
+    Small network chunks are buffered up to chunk_size before they are written.
+    If the client disconnects mid-body, whatever was received is kept, so the caller
+    can commit the new offset and the client only has to resend the missing bytes.
+    Returns the number of bytes written.
+
+    Raises:
+        - ValueError if the stream carries more than limit bytes
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    mode = "r+b" if os.path.exists(destination) else "wb"
+    written = 0
+    buffer = bytearray()
+
+    async with aiofiles.open(destination, mode) as out:
+        await out.seek(offset)
+        try:
+            async for chunk in stream:
+                if written + len(buffer) + len(chunk) > limit:
+                    await out.truncate(offset)
+                    raise ValueError("Request body is larger than the announced chunk")
+                buffer.extend(chunk)
+                if len(buffer) >= chunk_size:
+                    await out.write(bytes(buffer))
+                    written += len(buffer)
+                    buffer.clear()
+        except ClientDisconnect:
+            pass
+
+        if buffer:
+            await out.write(bytes(buffer))
+            written += len(buffer)
+        # Drop any stale bytes past the new offset left by an earlier attempt
+        await out.truncate(offset + written)
+
+    return written
+
+
+def _checksum_upload(source: BinaryIO, chunk_size: int) -> Tuple[int, str]:
+    source.seek(0)
+    return _checksum_stream(source, chunk_size)
+
+
+async def checksum_upload_file(upload: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[int, str]:
+    """
+    Compute the size and SHA-256 checksum of a spooled upload without writing it anywhere.
+
+    Lets the caller find out whether the content is already stored before paying for a disk write.
+    """
+    return await run_in_threadpool(_checksum_upload, upload.file, chunk_size)
+
+
+def _checksum_path(path: str, chunk_size: int) -> StoredUpload:
+    with open(path, "rb") as f:
+        size, checksum = _checksum_stream(f, chunk_size)
+    return StoredUpload(path=path, size=size, checksum=checksum)
+
+
+async def checksum_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> StoredUpload:
+    """
+    Compute the size and SHA-256 checksum of a file on disk, e.g. a completed upload session.
+
+    The checksum pass reads the whole file, so it runs in the threadpool.
+    """
+    return await run_in_threadpool(_checksum_path, path, chunk_size)
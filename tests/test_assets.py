@@ -0,0 +1,143 @@
+"""
+Unit tests for the build and serving of the static frontend using unittest.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from fastapi import status
+
+from assets import (
+    build_assets,
+    negotiate_encoding,
+)
+from settings import STATIC_DIRECTORY
+from tests.unittest_base import BaseTestCase
+
+
+class TestAssetBuild(unittest.TestCase):
+    """Tests for building the frontend."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.output = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, "js"))
+        self.write("index.html", '<script src="js/app.js"></script><script src=\'./js/app.js\'></script>')
+        self.write("js/app.js", "console.log('app');\n" * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.output)
+
+    def write(self, path, content):
+        with open(os.path.join(self.source, path), "w") as f:
+            f.write(content)
+
+    def read(self, manifest, path, mode="r"):
+        with open(os.path.join(manifest.directory, path), mode) as f:
+            return f.read()
+
+    def test_build_fingerprints_and_rewrites_references(self):
+        """Test that scripts get fingerprinted names the pages point to."""
+        manifest = build_assets(self.source, self.output)
+        fingerprinted = manifest.fingerprinted["js/app.js"]
+        self.assertRegex(fingerprinted, r"^js/app\.[0-9a-f]{12}\.js$")
+        self.assertTrue(manifest.is_immutable(fingerprinted))
+        self.assertFalse(manifest.is_immutable("index.html"))
+
+        index = self.read(manifest, "index.html")
+        self.assertNotIn('"js/app.js"', index)
+        self.assertEqual(index.count(fingerprinted), 2)
+        self.assertEqual(self.read(manifest, fingerprinted), self.read(manifest, "js/app.js"))
+
+    def test_build_precompresses_text_files(self):
+        """Test that compressible files get a gzip variant with its own ETag."""
+        manifest = build_assets(self.source, self.output)
+        fingerprinted = manifest.fingerprinted["js/app.js"]
+        built = manifest.files[fingerprinted]
+        self.assertIn("gzip", built.encodings)
+        self.assertNotEqual(built.encodings["gzip"], built.etag)
+        compressed = self.read(manifest, fingerprinted + ".gz", "rb")
+        self.assertEqual(gzip.decompress(compressed), self.read(manifest, fingerprinted, "rb"))
+        # Too small to be worth it
+        self.assertEqual(manifest.files["index.html"].encodings, {})
+
+    def test_build_is_reused_until_sources_change(self):
+        """Test that building the same sources again reuses the build, and changed sources get a new one."""
+        manifest = build_assets(self.source, self.output)
+        self.assertEqual(build_assets(self.source, self.output).directory, manifest.directory)
+
+        self.write("js/app.js", "console.log('changed');\n" * 100)
+        changed = build_assets(self.source, self.output)
+        self.assertNotEqual(changed.directory, manifest.directory)
+        self.assertNotEqual(changed.fingerprinted["js/app.js"], manifest.fingerprinted["js/app.js"])
+        self.assertEqual(sorted(os.listdir(self.output)), sorted([
+            os.path.basename(manifest.directory), os.path.basename(changed.directory)
+        ]))
+
+    def test_negotiate_encoding(self):
+        """Test picking the precompressed variant from Accept-Encoding."""
+        available = {"br": "a", "gzip": "b"}
+        self.assertEqual(negotiate_encoding("gzip, deflate, br", available), "br")
+        self.assertEqual(negotiate_encoding("gzip, br;q=0.5", available), "gzip")
+        self.assertEqual(negotiate_encoding("br;q=0, gzip", available), "gzip")
+        self.assertEqual(negotiate_encoding("gzip", {"gzip": "b"}), "gzip")
+        self.assertEqual(negotiate_encoding("*", {"gzip": "b"}), "gzip")
+        self.assertIsNone(negotiate_encoding("identity", available))
+        self.assertIsNone(negotiate_encoding("", available))
+
+
+class TestAssetServing(BaseTestCase):
+    """Tests for the cache headers and encodings of the served frontend."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The build the application serves, built when main was imported
+        cls.manifest = build_assets(STATIC_DIRECTORY)
+
+    def test_index_is_revalidated(self):
+        """Test that the index page is revalidated with its ETag."""
+        response = self.client.get("/", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+        self.assertEqual(response.headers["etag"], f'"{self.manifest.files["index.html"].etag}"')
+        self.assertIn(self.manifest.fingerprinted["js/app.js"], response.text)
+
+        response = self.client.get("/", headers={
+            "Accept-Encoding": "identity", "If-None-Match": response.headers["etag"]
+        })
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_fingerprinted_asset_is_immutable(self):
+        """Test that fingerprinted assets may be cached forever."""
+        path = self.manifest.fingerprinted["css/style.css"]
+        response = self.client.get(f"/{path}", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertTrue(response.headers["content-type"].startswith("text/css"))
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_precompressed_variant_is_sent(self):
+        """Test that clients accepting gzip get the precompressed variant."""
+        path = self.manifest.fingerprinted["js/app.js"]
+        plain = self.client.get(f"/{path}", headers={"Accept-Encoding": "identity"})
+        response = self.client.get(f"/{path}", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertLess(int(response.headers["content-length"]), int(plain.headers["content-length"]))
+        self.assertEqual(response.content, plain.content)
+        self.assertNotEqual(response.headers["etag"], plain.headers["etag"])
+
+    def test_plain_names_are_revalidated(self):
+        """Test that assets requested by their plain name are served, but revalidated."""
+        response = self.client.get("/js/app.js", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+
+
+if __name__ == '__main__':
+    unittest.main()
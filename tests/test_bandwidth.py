@@ -0,0 +1,222 @@
+"""
+Unit tests for download bandwidth shaping using unittest.
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from fastapi import status
+
+from bandwidth import (
+    BucketRegistry,
+    FairShare,
+    ThrottledResponse,
+    TokenBucket,
+)
+from models import User
+from storage import SendfileResponse
+from tests.unittest_base import BaseTestCase
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests for the token buckets and their registry."""
+
+    def test_reserve_within_burst(self):
+        """Test that a full bucket lets a burst through without waiting."""
+        bucket = TokenBucket(rate=1000, burst=5000)
+        self.assertEqual(bucket.reserve(3000), 0.0)
+        self.assertEqual(bucket.reserve(2000), 0.0)
+
+    def test_reserve_into_debt(self):
+        """Test that reserving past the burst waits for the debt to be paid."""
+        bucket = TokenBucket(rate=1000, burst=1000)
+        bucket.reserve(1000)
+        self.assertAlmostEqual(bucket.reserve(500), 0.5, places=2)
+        # Later reservations queue up behind the debt
+        self.assertAlmostEqual(bucket.reserve(500), 1.0, places=2)
+        self.assertFalse(bucket.is_full)
+
+    def test_registry_shares_and_sweeps_buckets(self):
+        """Test that downloads of one owner share a bucket, kept until it refilled."""
+        registry = BucketRegistry()
+        bucket = registry.acquire("user:1", 1000)
+        self.assertIs(registry.acquire("user:1", 1000), bucket)
+        registry.acquire("user:2", 1000)
+        bucket.reserve(bucket.burst + 1000)
+        registry.release("user:1")
+        registry.release("user:1")
+        registry.release("user:2")
+
+        registry.sweep()
+        # user:2 is idle and full, user:1 still owes tokens
+        self.assertEqual(len(registry), 1)
+        self.assertIs(registry.acquire("user:1", 1000), bucket)
+
+
+class TestFairShare(unittest.TestCase):
+    """Tests for sharing the worker bandwidth between owners."""
+
+    def test_owners_are_served_round_robin(self):
+        """Test that an owner with many downloads does not starve an owner with one."""
+        order = []
+
+        async def _run():
+            share = FairShare(rate=10 ** 9)
+
+            async def _download(owner):
+                await share.acquire(owner, 1024)
+                order.append(owner)
+
+            await asyncio.gather(_download("bulk"), _download("bulk"), _download("bulk"), _download("interactive"))
+
+        asyncio.run(_run())
+        self.assertEqual(order, ["bulk", "interactive", "bulk", "bulk"])
+
+    def test_bandwidth_is_limited(self):
+        """Test that grants past the burst wait for the worker bandwidth."""
+        async def _run():
+            share = FairShare(rate=1024 * 1024)
+            share.bucket.tokens = 0
+            started = time.monotonic()
+            await asyncio.gather(share.acquire("a", 128 * 1024), share.acquire("b", 128 * 1024))
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(_run()), 0.2)
+
+    def test_cancelled_waiter_is_skipped(self):
+        """Test that a download cancelled while waiting does not hold the others."""
+        async def _run():
+            share = FairShare(rate=10 ** 9)
+            cancelled = asyncio.create_task(share.acquire("a", 1024))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.wait_for(share.acquire("b", 1024), timeout=1)
+
+        asyncio.run(_run())
+
+
+class TestThrottledResponse(unittest.TestCase):
+    """Tests for the wrapper pacing download responses."""
+
+    def test_throttled_file_is_not_zero_copied(self):
+        """Test that throttled files are sent in paced chunks even if the server supports zerocopysend."""
+        fd, path = tempfile.mkstemp()
+        os.write(fd, b"x" * 1000)
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        messages = []
+
+        async def _send(message):
+            messages.append(message["type"])
+
+        scope = {"type": "http", "method": "GET", "extensions": {"http.response.zerocopysend": {}}}
+        response = ThrottledResponse(SendfileResponse(path, 1000), ("test:zerocopy", 10 ** 9))
+        asyncio.run(response(scope, None, _send))
+        self.assertEqual(messages, ["http.response.start", "http.response.body"])
+
+
+@patch("bandwidth.buckets.DOWNLOAD_BURST_BYTES", 64 * 1024)
+class TestThrottledDownloads(BaseTestCase):
+    """Tests for the download limits of users and share links."""
+
+    def setUp(self):
+        super().setUp()
+        # 512KB, compressing it at rest would not matter
+        self.content = b"%PDF-1.4\n" + bytes(range(256)) * 2048
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Large",
+            headers=self.auth_headers,
+            files={"file": ("large.pdf", BytesIO(self.content), "application/pdf")}
+        )
+        self.file_id = response.json()["id"]
+
+    def timed_get(self, url, headers=None):
+        started = time.monotonic()
+        response = self.client.get(url, headers=headers)
+        return response, time.monotonic() - started
+
+    def test_unlimited_download(self):
+        """Test that downloads are not slowed down without limits."""
+        response, elapsed = self.timed_get(f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers)
+        self.assertEqual(response.content, self.content)
+        self.assertLess(elapsed, 0.3)
+
+    def test_user_limit(self):
+        """Test that the limit of a user paces its downloads."""
+        user = self.db.query(User).filter(User.id == self.test_user.id).one()
+        user.download_rate_limit = 1024 * 1024
+        self.db.commit()
+
+        response, elapsed = self.timed_get(f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.content)
+        # 512KB at 1MB/s, less the 64KB burst
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    def test_default_user_limit(self):
+        """Test that users without their own limit get the default one."""
+        with patch("bandwidth.responses.DOWNLOAD_USER_BYTES_PER_SECOND", 1024 * 1024):
+            response, elapsed = self.timed_get(
+                f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers
+            )
+        self.assertEqual(response.content, self.content)
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    def test_share_limit(self):
+        """Test that the limit given to a share link paces its downloads."""
+        share = self.client.post(
+            f"/api/v0/files/{self.file_id}/share",
+            headers=self.auth_headers,
+            json={"download_rate_limit": 1024 * 1024}
+        ).json()
+        self.assertEqual(share["download_rate_limit"], 1024 * 1024)
+
+        response, elapsed = self.timed_get(f"/api/v0/files/share/{share['token']}/download")
+        self.assertEqual(response.content, self.content)
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    def test_signed_share_limit(self):
+        """Test that signed share links carry their limit."""
+        signed = self.client.post(
+            f"/api/v0/files/{self.file_id}/signed-share",
+            headers=self.auth_headers,
+            json={"download_rate_limit": 1024 * 1024}
+        ).json()
+
+        response, elapsed = self.timed_get(f"/api/v0/files/signed/{signed['token']}/download")
+        self.assertEqual(response.content, self.content)
+        self.assertGreaterEqual(elapsed, 0.4)
+
+    def test_invalid_share_limit(self):
+        """Test that share limits must be positive."""
+        response = self.client.post(
+            f"/api/v0/files/{self.file_id}/share",
+            headers=self.auth_headers,
+            json={"download_rate_limit": 0}
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_accel_redirect_gets_nginx_limit(self):
+        """Test that downloads handed to nginx carry the limit for nginx to apply."""
+        with patch("bandwidth.responses.DOWNLOAD_USER_BYTES_PER_SECOND", 1024 * 1024), \
+                patch("storage.responses.DOWNLOAD_MODE", "x-accel"):
+            response = self.client.get(f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers)
+        self.assertIn("x-accel-redirect", response.headers)
+        self.assertEqual(response.headers["x-accel-limit-rate"], str(1024 * 1024))
+
+    def test_worker_bandwidth(self):
+        """Test that the worker bandwidth applies to every download."""
+        with patch("bandwidth.buckets.DOWNLOAD_WORKER_BYTES_PER_SECOND", 1024 * 1024):
+            response, elapsed = self.timed_get(
+                f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers
+            )
+        self.assertEqual(response.content, self.content)
+        self.assertGreaterEqual(elapsed, 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
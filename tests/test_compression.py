@@ -0,0 +1,216 @@
+"""
+Unit tests for compression at rest of stored contents using unittest.
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from fastapi import status
+from pypdf import PdfWriter
+
+from models import Blob
+from settings import DOWNLOAD_CHUNK_SIZE
+from storage import get_storage
+from storage.compression import (
+    COMPRESSION_ZLIB,
+    COMPRESSION_ZSTD,
+    compress_file,
+    decompress_stream,
+    probe_compression_ratio,
+)
+from tests.unittest_base import BaseTestCase
+
+try:
+    import zstandard  # noqa: F401
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+# Uncompressed scans and exports repeat a lot, random bytes stand for already compressed streams
+COMPRESSIBLE_CONTENT = b"%PDF-1.4\n" + b"0 0 0 rg 72 720 Td (Quarterly report) Tj\n" * 20000
+INCOMPRESSIBLE_CONTENT = b"%PDF-1.4\n" + os.urandom(512 * 1024)
+
+
+class TestCompressionHelpers(unittest.TestCase):
+    """Tests for the compression helpers, for every codec."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.destination = self.path + ".compressed"
+
+    def tearDown(self):
+        for path in (self.path, self.destination):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write(self, content):
+        with open(self.path, "wb") as f:
+            f.write(content)
+
+    def decompressed_chunks(self, codec, read_size=1000):
+        async def _chunks():
+            with open(self.destination, "rb") as f:
+                while True:
+                    chunk = f.read(read_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        async def _collect():
+            return [chunk async for chunk in decompress_stream(_chunks(), codec)]
+        return asyncio.run(_collect())
+
+    def decompress(self, codec):
+        return b"".join(self.decompressed_chunks(codec))
+
+    def check_round_trip(self, codec):
+        self.write(COMPRESSIBLE_CONTENT)
+        size = compress_file(self.path, self.destination, codec, chunk_size=4096)
+        self.assertEqual(size, os.path.getsize(self.destination))
+        self.assertLess(size, len(COMPRESSIBLE_CONTENT) // 10)
+        self.assertEqual(self.decompress(codec), COMPRESSIBLE_CONTENT)
+
+    def test_zlib_round_trip(self):
+        """Test that zlib compressed contents stream back to the original bytes."""
+        self.check_round_trip(COMPRESSION_ZLIB)
+
+    @unittest.skipUnless(HAS_ZSTANDARD, "zstandard is not installed")
+    def test_zstd_round_trip(self):
+        """Test that zstd compressed contents stream back to the original bytes."""
+        self.check_round_trip(COMPRESSION_ZSTD)
+
+    def check_bounded_chunks(self, codec):
+        # 32MB of zeros shrink to a few KB, read back as a single stored chunk
+        with open(self.path, "wb") as f:
+            for _ in range(32):
+                f.write(bytes(1024 * 1024))
+        compress_file(self.path, self.destination, codec)
+        self.assertLess(os.path.getsize(self.destination), 1024 * 1024)
+
+        sizes = [len(chunk) for chunk in self.decompressed_chunks(codec, read_size=1024 * 1024)]
+        self.assertEqual(sum(sizes), 32 * 1024 * 1024)
+        self.assertLessEqual(max(sizes), DOWNLOAD_CHUNK_SIZE)
+
+    def test_zlib_chunks_are_bounded(self):
+        """Test that highly compressible zlib contents are decompressed in bounded chunks."""
+        self.check_bounded_chunks(COMPRESSION_ZLIB)
+
+    @unittest.skipUnless(HAS_ZSTANDARD, "zstandard is not installed")
+    def test_zstd_chunks_are_bounded(self):
+        """Test that highly compressible zstd contents are decompressed in bounded chunks."""
+        self.check_bounded_chunks(COMPRESSION_ZSTD)
+
+    def test_probe_ratio(self):
+        """Test that the probe tells compressible contents from compressed ones."""
+        self.write(COMPRESSIBLE_CONTENT)
+        self.assertLess(probe_compression_ratio(self.path, COMPRESSION_ZLIB, probe_size=64 * 1024), 0.1)
+
+        self.write(INCOMPRESSIBLE_CONTENT)
+        self.assertGreater(probe_compression_ratio(self.path, COMPRESSION_ZLIB, probe_size=64 * 1024), 0.95)
+
+    def test_uncompressed_stream_passes_through(self):
+        """Test that streams of uncompressed contents are left as they are."""
+        async def _chunks():
+            yield b"abc"
+            yield b"def"
+
+        async def _collect():
+            return b"".join([chunk async for chunk in decompress_stream(_chunks(), None)])
+        self.assertEqual(asyncio.run(_collect()), b"abcdef")
+
+
+@patch("storage.compression.STORAGE_COMPRESSION", COMPRESSION_ZLIB)
+class TestFileCompression(BaseTestCase):
+    """Tests for uploading and downloading files compressed at rest."""
+
+    def upload(self, content):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Scan",
+            headers=self.auth_headers,
+            files={"file": ("scan.pdf", BytesIO(content), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_compressible_upload_is_stored_compressed(self):
+        """Test that a compressible upload is compressed in storage and keeps its original size."""
+        data = self.upload(COMPRESSIBLE_CONTENT)
+        self.assertEqual(data["file_size"], len(COMPRESSIBLE_CONTENT))
+        self.assertLess(data["stored_size"], len(COMPRESSIBLE_CONTENT) // 10)
+
+        blob = self.db.query(Blob).filter(Blob.file_path == data["file_path"]).first()
+        self.assertEqual(blob.compression, COMPRESSION_ZLIB)
+        self.assertEqual(os.path.getsize(get_storage().local_path(data["file_path"])), data["stored_size"])
+
+    def test_incompressible_upload_is_stored_as_is(self):
+        """Test that an upload which does not compress is stored as uploaded."""
+        data = self.upload(INCOMPRESSIBLE_CONTENT)
+        self.assertEqual(data["stored_size"], len(INCOMPRESSIBLE_CONTENT))
+
+        blob = self.db.query(Blob).filter(Blob.file_path == data["file_path"]).first()
+        self.assertIsNone(blob.compression)
+
+    def test_download_returns_original_bytes(self):
+        """Test that downloading a compressed file returns the uploaded bytes."""
+        data = self.upload(COMPRESSIBLE_CONTENT)
+        response = self.client.get(f"/api/v0/files/{data['id']}/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["content-length"], str(len(COMPRESSIBLE_CONTENT)))
+        self.assertEqual(response.content, COMPRESSIBLE_CONTENT)
+
+    def test_download_range_of_compressed_file(self):
+        """Test that byte ranges of a compressed file refer to the original bytes."""
+        data = self.upload(COMPRESSIBLE_CONTENT)
+        response = self.client.get(
+            f"/api/v0/files/{data['id']}/download",
+            headers={**self.auth_headers, "Range": "bytes=100000-100099"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content, COMPRESSIBLE_CONTENT[100000:100100])
+
+    def test_compressed_download_is_not_handed_to_nginx(self):
+        """Test that compressed files are streamed by the worker even in x-accel mode."""
+        data = self.upload(COMPRESSIBLE_CONTENT)
+        with patch("storage.responses.DOWNLOAD_MODE", "x-accel"):
+            response = self.client.get(f"/api/v0/files/{data['id']}/download", headers=self.auth_headers)
+        self.assertNotIn("x-accel-redirect", response.headers)
+        self.assertEqual(response.content, COMPRESSIBLE_CONTENT)
+
+    def test_shared_download_returns_original_bytes(self):
+        """Test that downloading a compressed file through a share returns the uploaded bytes."""
+        data = self.upload(COMPRESSIBLE_CONTENT)
+        share = self.client.post(f"/api/v0/files/{data['id']}/share", headers=self.auth_headers, json={}).json()
+
+        response = self.client.get(f"/api/v0/files/share/{share['token']}/download")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, COMPRESSIBLE_CONTENT)
+
+    def test_compressed_upload_is_processed(self):
+        """Test that the processing pipeline reads the decompressed content."""
+        writer = PdfWriter()
+        for _ in range(40):
+            writer.add_blank_page(width=612, height=792)
+        buffer = BytesIO()
+        writer.write(buffer)
+
+        data = self.upload(buffer.getvalue())
+        self.assertLess(data["stored_size"], data["file_size"])
+
+        processing = self.client.get(f"/api/v0/files/{data['id']}/processing", headers=self.auth_headers).json()
+        self.assertEqual(processing["processing_status"], "done")
+        self.assertEqual(processing["page_count"], 40)
+
+    def test_duplicate_upload_shares_compressed_blob(self):
+        """Test that a duplicate of a compressed upload points at the same compressed content."""
+        first = self.upload(COMPRESSIBLE_CONTENT)
+        second = self.upload(COMPRESSIBLE_CONTENT)
+        self.assertEqual(first["file_path"], second["file_path"])
+        self.assertEqual(first["stored_size"], second["stored_size"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,17 @@
 import unittest
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
 from fastapi import status
-from tests.unittest_base import BaseTestCase
+from sqlalchemy import event
+from models.data_room import (
+    File,
+    Folder,
+)
+from tests.unittest_base import (
+    BaseTestCase,
+    engine,
+)
 
 
 class TestDataRoomList(BaseTestCase):
@@ -33,6 +44,34 @@ class TestDataRoomList(BaseTestCase):
         data = response.json()
         self.assertEqual(len(data), 0)
 
+    def test_list_datarooms_pages(self):
+        """Test walking the datarooms a page at a time with the cursors."""
+        for index in range(4):
+            self.client.post("/api/v0/datarooms", headers=self.auth_headers, json={"name": f"Room {index}"})
+
+        ids, url = [], "/api/v0/datarooms?limit=2"
+        for _ in range(3):
+            response = self.client.get(url, headers=self.auth_headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.json()), 2)
+            ids.extend(dataroom["id"] for dataroom in response.json())
+            if "x-next-cursor" not in response.headers:
+                break
+            url = f"/api/v0/datarooms?limit=2&cursor={response.headers['x-next-cursor']}"
+
+        self.assertNotIn("x-next-cursor", response.headers)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(ids, sorted(ids))
+
+    def test_list_datarooms_invalid_page(self):
+        """Test that forged cursors and page sizes over the cap are rejected."""
+        for cursor in ("not-a-cursor", "eyJpZCI6IDF9", "WyIxIl0"):
+            response = self.client.get(f"/api/v0/datarooms?cursor={cursor}", headers=self.auth_headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get("/api/v0/datarooms?limit=100000", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
 
 class TestDataRoomCreate(BaseTestCase):
     """Tests for the POST /datarooms endpoint."""
@@ -92,6 +131,72 @@ class TestDataRoomGet(BaseTestCase):
         self.assertEqual(data["id"], self.test_dataroom.id)
         self.assertEqual(data["name"], self.test_dataroom.name)
 
+    def build_tree(self, depth=3, width=3):
+        """Add width subfolders with a file each below the subfolder, depth levels deep"""
+        parents = [self.test_subfolder]
+        for level in range(depth):
+            children = []
+            for parent in parents:
+                for index in range(width):
+                    folder = Folder(name=f"Level {level} #{index}", dataroom_id=self.test_dataroom.id, parent_id=parent.id)
+                    self.db.add(folder)
+                    children.append(folder)
+            self.db.flush()
+            for folder in children:
+                self.db.add(File(name=f"File of {folder.id}", folder_id=folder.id, file_path="2026/1/1/test.pdf"))
+            parents = children
+        self.db.commit()
+
+    def get_counting_queries(self, url):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = self.client.get(url, headers=self.auth_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        return response, len(statements)
+
+    def test_get_dataroom_tree(self):
+        """Test that only top level folders are listed, the others nested in their parents."""
+        self.build_tree(depth=2, width=2)
+        response = self.client.get(f"/api/v0/datarooms/{self.test_dataroom.id}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        folders = response.json()["folders"]
+        self.assertEqual([folder["id"] for folder in folders], [self.test_folder.id])
+
+        subfolder = folders[0]["subfolders"][0]
+        self.assertEqual(subfolder["id"], self.test_subfolder.id)
+        self.assertEqual(len(subfolder["subfolders"]), 2)
+        for child in subfolder["subfolders"]:
+            self.assertEqual(len(child["files"]), 1)
+            self.assertEqual(len(child["subfolders"]), 2)
+            for leaf in child["subfolders"]:
+                self.assertEqual([file["name"] for file in leaf["files"]], [f"File of {leaf['id']}"])
+                self.assertEqual(leaf["subfolders"], [])
+
+    def test_get_dataroom_fixed_queries(self):
+        """Test that the number of queries does not grow with the tree."""
+        url = f"/api/v0/datarooms/{self.test_dataroom.id}"
+        _, small = self.get_counting_queries(url)
+        self.build_tree(depth=3, width=3)
+        response, large = self.get_counting_queries(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(large, small)
+        self.assertLessEqual(large, 4)
+
+    def test_get_folder_fixed_queries(self):
+        """Test that a folder is loaded with its subtree in a fixed number of queries."""
+        self.build_tree(depth=3, width=3)
+        response, queries = self.get_counting_queries(f"/api/v0/folders/{self.test_subfolder.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data["subfolders"]), 3)
+        self.assertEqual(len(data["subfolders"][0]["subfolders"][0]["subfolders"][0]["files"]), 1)
+        self.assertLessEqual(queries, 4)
+
     def test_get_dataroom_not_found(self):
         """Test retrieving non-existent dataroom."""
         response = self.client.get(
@@ -168,6 +273,62 @@ class TestDataRoomUpdate(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class TestDataRoomDownload(BaseTestCase):
+    """Tests for the GET /datarooms/{dataroom_id}/download endpoint."""
+
+    def test_download_dataroom_archive(self):
+        """Test that a data room is downloaded as a ZIP with its folders as directories."""
+        self.client.post(
+            f"/api/v0/files?folder_id={self.test_subfolder.id}&name=Nested",
+            headers=self.auth_headers,
+            files={"file": ("nested.pdf", BytesIO(b"%PDF-1.4\n%Nested"), "application/pdf")}
+        )
+
+        response = self.client.get(
+            f"/api/v0/datarooms/{self.test_dataroom.id}/download",
+            headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            self.assertEqual(sorted(archive.namelist()), [
+                "Test DataRoom/",
+                "Test DataRoom/Test Folder/",
+                "Test DataRoom/Test Folder/Test SubFolder/",
+                "Test DataRoom/Test Folder/Test SubFolder/Nested.pdf",
+            ])
+            self.assertEqual(archive.read("Test DataRoom/Test Folder/Test SubFolder/Nested.pdf"), b"%PDF-1.4\n%Nested")
+
+    def test_download_compressed_content(self):
+        """Test that contents compressed at rest are archived as uploaded."""
+        content = b"%PDF-1.4\n" + b"0 0 0 rg 72 720 Td (Quarterly report) Tj\n" * 5000
+        with patch("storage.compression.STORAGE_COMPRESSION", "zlib"):
+            self.client.post(
+                f"/api/v0/files?folder_id={self.test_folder.id}&name=Scan",
+                headers=self.auth_headers,
+                files={"file": ("scan.pdf", BytesIO(content), "application/pdf")}
+            )
+
+        response = self.client.get(
+            f"/api/v0/datarooms/{self.test_dataroom.id}/download",
+            headers=self.auth_headers
+        )
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            self.assertEqual(archive.read("Test DataRoom/Test Folder/Scan.pdf"), content)
+
+    def test_download_dataroom_not_found(self):
+        """Test downloading non-existent data room."""
+        response = self.client.get("/api/v0/datarooms/99999/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_download_dataroom_unauthorized(self):
+        """Test downloading data room owned by another user."""
+        response = self.client.get(
+            f"/api/v0/datarooms/{self.test_dataroom.id}/download",
+            headers=self.auth_headers_2
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class TestDataRoomDelete(BaseTestCase):
     """Tests for the DELETE /datarooms/{dataroom_id} endpoint."""
 
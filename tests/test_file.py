@@ -1,8 +1,34 @@
+import os
+import asyncio
+import hashlib
+import time
 import unittest
+from datetime import (
+    datetime,
+    timedelta,
+)
 from io import BytesIO
+from unittest.mock import patch
 from fastapi import status
-from tests.unittest_base import BaseTestCase
-from models.data_room import File
+from tests.unittest_base import (
+    BaseTestCase,
+    engine,
+)
+from storage import get_storage
+from sharing import (
+    CachedShare,
+    ShareCache,
+    share_cache,
+    verify_signed_share,
+)
+from sqlalchemy import event
+from models.data_room import (
+    DataRoom,
+    File,
+    Folder,
+)
+from models.blob import Blob
+from main import app
 
 
 class TestFileList(BaseTestCase):
@@ -44,6 +70,67 @@ class TestFileList(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_list_files_of_user_and_dataroom(self):
+        """Test that files are only listed for their owner, optionally by dataroom."""
+        other_dataroom = DataRoom(name="Other DataRoom", owner_id=self.test_user_2.id)
+        self.db.add(other_dataroom)
+        self.db.flush()
+        other_folder = Folder(name="Other Folder", dataroom_id=other_dataroom.id)
+        self.db.add(other_folder)
+        self.db.flush()
+        for name, folder in (("Mine", self.test_subfolder), ("Theirs", other_folder)):
+            self.db.add(File(name=name, folder_id=folder.id, file_path="2026/1/1/test.pdf", file_type="pdf"))
+        self.db.commit()
+
+        response = self.client.get("/api/v0/files", headers=self.auth_headers)
+        self.assertEqual([file["name"] for file in response.json()], ["Mine"])
+        response = self.client.get(f"/api/v0/files?dataroom_id={self.test_dataroom.id}", headers=self.auth_headers)
+        self.assertEqual([file["name"] for file in response.json()], ["Mine"])
+        response = self.client.get(f"/api/v0/files?dataroom_id={other_dataroom.id}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_files_pages(self):
+        """Test that the files of a folder are listed by id, a page at a time."""
+        for index in range(5):
+            self.db.add(File(name=f"Page {index}", folder_id=self.test_folder.id, file_path="2026/1/1/test.pdf",
+                             file_type="pdf"))
+        self.db.commit()
+
+        names, cursor = [], None
+        while True:
+            url = f"/api/v0/files?folder_id={self.test_folder.id}&limit=2"
+            response = self.client.get(f"{url}&cursor={cursor}" if cursor else url, headers=self.auth_headers)
+            names.extend(file["name"] for file in response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        self.assertEqual(names, [f"Page {index}" for index in range(5)])
+
+    def test_file_location_follows_folder(self):
+        """Test that the dataroom and owner of a file are copied from its folder, also when it moves."""
+        test_file = File(name="Moved", folder_id=self.test_subfolder.id, file_path="2026/1/1/test.pdf", file_type="pdf")
+        self.db.add(test_file)
+        self.db.commit()
+        self.assertEqual(test_file.dataroom_id, self.test_dataroom.id)
+        self.assertEqual(test_file.owner_id, self.test_user.id)
+        self.assertEqual(self.test_subfolder.owner_id, self.test_user.id)
+
+        other_dataroom = DataRoom(name="Other DataRoom", owner_id=self.test_user_2.id)
+        self.db.add(other_dataroom)
+        self.db.flush()
+        other_folder = Folder(name="Other Folder", dataroom_id=other_dataroom.id)
+        self.db.add(other_folder)
+        self.db.flush()
+        test_file.folder_id = other_folder.id
+        self.db.commit()
+        self.assertEqual(test_file.dataroom_id, other_dataroom.id)
+        self.assertEqual(test_file.owner_id, self.test_user_2.id)
+
+        response = self.client.get(f"/api/v0/files/{test_file.id}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(f"/api/v0/files/{test_file.id}", headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_list_files_unauthorized_folder(self):
         """Test listing files in folder from dataroom owned by another user."""
         response = self.client.get(
@@ -70,6 +157,38 @@ class TestFileUpload(BaseTestCase):
         self.assertEqual(data["name"], "Test File")
         self.assertEqual(data["folder_id"], self.test_folder.id)
 
+    def test_upload_file_records_size_and_checksum(self):
+        """Test that upload streams the content and records its size and SHA-256 checksum."""
+        pdf_content = b"%PDF-1.4\n" + b"0123456789" * 250000
+
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Big+File",
+            headers=self.auth_headers,
+            files={"file": ("big.pdf", BytesIO(pdf_content), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["file_size"], len(pdf_content))
+        self.assertEqual(data["checksum"], hashlib.sha256(pdf_content).hexdigest())
+
+    def test_upload_duplicate_content_shares_blob(self):
+        """Test that uploading identical content twice stores it only once."""
+        pdf_content = b"%PDF-1.4\n%Duplicated PDF content"
+
+        paths = []
+        for name in ("First", "Second"):
+            response = self.client.post(
+                f"/api/v0/files?folder_id={self.test_folder.id}&name={name}",
+                headers=self.auth_headers,
+                files={"file": ("same.pdf", BytesIO(pdf_content), "application/pdf")}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            paths.append(response.json()["file_path"])
+
+        self.assertEqual(paths[0], paths[1])
+        blob = self.db.query(Blob).filter(Blob.checksum == hashlib.sha256(pdf_content).hexdigest()).one()
+        self.assertEqual(blob.ref_count, 2)
+
     def test_upload_non_pdf_file(self):
         """Test uploading non-PDF file."""
         response = self.client.post(
@@ -102,6 +221,72 @@ class TestFileUpload(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class TestFileBatchUpload(BaseTestCase):
+    """Tests for the POST /files/batch endpoint."""
+
+    def test_batch_upload_success(self):
+        """Test uploading several files with per-file results in request order."""
+        shared_content = b"%PDF-1.4\n%Shared batch content"
+        response = self.client.post(
+            f"/api/v0/files/batch?folder_id={self.test_folder.id}",
+            headers=self.auth_headers,
+            files=[
+                ("files", ("first.pdf", BytesIO(shared_content), "application/pdf")),
+                ("files", ("notes.txt", BytesIO(b"Not a PDF"), "text/plain")),
+                ("files", ("second.pdf", BytesIO(shared_content), "application/pdf")),
+                ("files", ("third.pdf", BytesIO(b"%PDF-1.4\n%Third"), "application/pdf")),
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["uploaded"], 3)
+        self.assertEqual(data["failed"], 1)
+        self.assertEqual([result["filename"] for result in data["results"]],
+                         ["first.pdf", "notes.txt", "second.pdf", "third.pdf"])
+        self.assertFalse(data["results"][1]["success"])
+        self.assertEqual(data["results"][0]["file"]["name"], "first")
+
+        # Identical contents of one batch share a single blob
+        blob = self.db.query(Blob).filter(Blob.checksum == hashlib.sha256(shared_content).hexdigest()).one()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(self.db.query(File).filter(File.folder_id == self.test_folder.id).count(), 3)
+
+    def test_batch_upload_adds_references_to_existing_content(self):
+        """Test that a batch reuses content stored by earlier uploads."""
+        content = b"%PDF-1.4\n%Already stored"
+        self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Existing",
+            headers=self.auth_headers,
+            files={"file": ("existing.pdf", BytesIO(content), "application/pdf")}
+        )
+        response = self.client.post(
+            f"/api/v0/files/batch?folder_id={self.test_folder.id}",
+            headers=self.auth_headers,
+            files=[("files", ("again.pdf", BytesIO(content), "application/pdf"))]
+        )
+        self.assertEqual(response.json()["uploaded"], 1)
+        blob = self.db.query(Blob).filter(Blob.checksum == hashlib.sha256(content).hexdigest()).one()
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_batch_upload_unauthorized_folder(self):
+        """Test batch uploading to folder in dataroom owned by another user."""
+        response = self.client.post(
+            f"/api/v0/files/batch?folder_id={self.test_folder.id}",
+            headers=self.auth_headers_2,
+            files=[("files", ("first.pdf", BytesIO(b"%PDF-1.4"), "application/pdf"))]
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_upload_invalid_folder(self):
+        """Test batch uploading to non-existent folder."""
+        response = self.client.post(
+            "/api/v0/files/batch?folder_id=99999",
+            headers=self.auth_headers,
+            files=[("files", ("first.pdf", BytesIO(b"%PDF-1.4"), "application/pdf"))]
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class TestFileGet(BaseTestCase):
     """Tests for the GET /files/{file_id} endpoint."""
 
@@ -154,6 +339,31 @@ class TestFileGet(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_get_file_single_query(self):
+        """Test that the file is looked up and authorized in one query, besides loading the user."""
+        test_file = File(
+            name="Test PDF",
+            folder_id=self.test_subfolder.id,
+            file_path="/uploads/2026/1/1/test.pdf",
+            file_size=1024,
+            file_type="pdf"
+        )
+        self.db.add(test_file)
+        self.db.commit()
+        self.db.refresh(test_file)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = self.client.get(f"/api/v0/files/{test_file.id}", headers=self.auth_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(statements), 2)
+
 
 class TestFileUpdate(BaseTestCase):
     """Tests for the PATCH /files/{file_id} endpoint."""
@@ -232,6 +442,29 @@ class TestFileDelete(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_delete_file_releases_blob(self):
+        """Test that shared content is only collected from disk with its last file."""
+        pdf_content = b"%PDF-1.4\n%Shared PDF content"
+        file_ids = []
+        for name in ("First", "Second"):
+            response = self.client.post(
+                f"/api/v0/files?folder_id={self.test_folder.id}&name={name}",
+                headers=self.auth_headers,
+                files={"file": ("shared.pdf", BytesIO(pdf_content), "application/pdf")}
+            )
+            file_ids.append(response.json()["id"])
+        file_path = get_storage().local_path(response.json()["file_path"])
+
+        self.client.delete(f"/api/v0/files/{file_ids[0]}", headers=self.auth_headers)
+        self.assertTrue(os.path.exists(file_path))
+
+        self.client.delete(f"/api/v0/files/{file_ids[1]}", headers=self.auth_headers)
+        self.assertEqual(self.db.query(Blob).count(), 0)
+        # The delete only queues the content, the garbage collector removes it
+        self.assertTrue(os.path.exists(file_path))
+        self.collect_garbage()
+        self.assertFalse(os.path.exists(file_path))
+
     def test_delete_file_not_found(self):
         """Test deleting non-existent file."""
         response = self.client.delete(
@@ -295,6 +528,27 @@ class TestFileShare(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_delete_file_share_unauthorized(self):
+        """Test that a share can only be deleted by the owner of the dataroom of its file."""
+        test_file = File(
+            name="Test PDF",
+            folder_id=self.test_folder.id,
+            file_path="/uploads/2026/1/1/test.pdf",
+            file_size=1024,
+            file_type="pdf"
+        )
+        self.db.add(test_file)
+        self.db.commit()
+        self.db.refresh(test_file)
+        share = self.client.post(f"/api/v0/files/{test_file.id}/share", headers=self.auth_headers, json={}).json()
+
+        response = self.client.delete(f"/api/v0/files/share/{share['id']}", headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete("/api/v0/files/share/99999", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.delete(f"/api/v0/files/share/{share['id']}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_list_file_shares_success(self):
         """Test listing file shares."""
         test_file = File(
@@ -321,3 +575,480 @@ class TestFileShare(BaseTestCase):
             headers=self.auth_headers
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestFileDownload(BaseTestCase):
+    """Tests for the file download endpoints."""
+
+    pdf_content = b"%PDF-1.4\n%Downloadable PDF content"
+
+    def upload(self, content=None):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Download+Me",
+            headers=self.auth_headers,
+            files={"file": ("download.pdf", BytesIO(content or self.pdf_content), "application/pdf")}
+        )
+        return response.json()
+
+    def test_download_file_success(self):
+        """Test downloading the content of an uploaded file."""
+        file_id = self.upload()["id"]
+        response = self.client.get(f"/api/v0/files/{file_id}/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.pdf_content)
+        self.assertIn("attachment", response.headers["content-disposition"])
+
+    def test_download_file_unauthorized(self):
+        """Test downloading a file from dataroom owned by another user."""
+        file_id = self.upload()["id"]
+        response = self.client.get(f"/api/v0/files/{file_id}/download", headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_download_file_missing_content(self):
+        """Test downloading a file whose content is not in storage."""
+        test_file = File(
+            name="Test PDF",
+            folder_id=self.test_folder.id,
+            file_path="2026/1/1/missing.pdf",
+            file_size=1024,
+            file_type="pdf"
+        )
+        self.db.add(test_file)
+        self.db.commit()
+        self.db.refresh(test_file)
+
+        response = self.client.get(f"/api/v0/files/{test_file.id}/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_download_shared_file_success(self):
+        """Test downloading a file through a share token without authentication."""
+        file_id = self.upload()["id"]
+        share = self.client.post(f"/api/v0/files/{file_id}/share", headers=self.auth_headers, json={}).json()
+
+        response = self.client.get(f"/api/v0/files/share/{share['token']}/download")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.pdf_content)
+
+    def test_download_file_validators(self):
+        """Test that downloads carry the checksum as ETag and a Last-Modified date."""
+        data = self.upload()
+        response = self.client.get(f"/api/v0/files/{data['id']}/download", headers=self.auth_headers)
+        self.assertEqual(response.headers["etag"], f'"{data["checksum"]}"')
+        self.assertIn("last-modified", response.headers)
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+
+    def test_download_file_not_modified(self):
+        """Test that a matching If-None-Match or If-Modified-Since is answered with 304."""
+        file_id = self.upload()["id"]
+        first = self.client.get(f"/api/v0/files/{file_id}/download", headers=self.auth_headers)
+
+        response = self.client.get(
+            f"/api/v0/files/{file_id}/download",
+            headers={**self.auth_headers, "If-None-Match": first.headers["etag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["etag"], first.headers["etag"])
+
+        response = self.client.get(
+            f"/api/v0/files/{file_id}/download",
+            headers={**self.auth_headers, "If-Modified-Since": first.headers["last-modified"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_download_file_modified(self):
+        """Test that a stale ETag gets the whole file."""
+        file_id = self.upload()["id"]
+        response = self.client.get(
+            f"/api/v0/files/{file_id}/download",
+            headers={**self.auth_headers, "If-None-Match": '"stale"'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.pdf_content)
+
+    def test_download_file_range(self):
+        """Test downloading a single byte range."""
+        file_id = self.upload()["id"]
+        size = len(self.pdf_content)
+        for header, expected, content_range in (
+            ("bytes=0-3", self.pdf_content[:4], f"bytes 0-3/{size}"),
+            ("bytes=9-", self.pdf_content[9:], f"bytes 9-{size - 1}/{size}"),
+            ("bytes=-5", self.pdf_content[-5:], f"bytes {size - 5}-{size - 1}/{size}"),
+        ):
+            response = self.client.get(
+                f"/api/v0/files/{file_id}/download",
+                headers={**self.auth_headers, "Range": header}
+            )
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(response.content, expected)
+            self.assertEqual(response.headers["content-range"], content_range)
+
+    def test_download_file_multiple_ranges(self):
+        """Test downloading several byte ranges as multipart/byteranges."""
+        file_id = self.upload()["id"]
+        response = self.client.get(
+            f"/api/v0/files/{file_id}/download",
+            headers={**self.auth_headers, "Range": "bytes=0-3,9-12"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertTrue(response.headers["content-type"].startswith("multipart/byteranges"))
+        self.assertEqual(int(response.headers["content-length"]), len(response.content))
+        self.assertIn(b"Content-Range: bytes 0-3/", response.content)
+        self.assertIn(self.pdf_content[:4], response.content)
+        self.assertIn(self.pdf_content[9:13], response.content)
+
+    def test_download_file_unsatisfiable_range(self):
+        """Test that a range past the end of the file is answered with 416."""
+        file_id = self.upload()["id"]
+        response = self.client.get(
+            f"/api/v0/files/{file_id}/download",
+            headers={**self.auth_headers, "Range": "bytes=100000-"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response.headers["content-range"], f"bytes */{len(self.pdf_content)}")
+
+    def test_download_file_if_range_mismatch(self):
+        """Test that a range is ignored when the If-Range validator no longer matches."""
+        file_id = self.upload()["id"]
+        response = self.client.get(
+            f"/api/v0/files/{file_id}/download",
+            headers={**self.auth_headers, "Range": "bytes=0-3", "If-Range": '"stale"'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.pdf_content)
+
+    def test_download_shared_file_range(self):
+        """Test downloading a byte range through a share token."""
+        file_id = self.upload()["id"]
+        share = self.client.post(f"/api/v0/files/{file_id}/share", headers=self.auth_headers, json={}).json()
+
+        response = self.client.get(f"/api/v0/files/share/{share['token']}/download", headers={"Range": "bytes=1-4"})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content, self.pdf_content[1:5])
+
+    def test_download_file_x_accel_redirect(self):
+        """Test that in x-accel mode the download is handed over to nginx."""
+        data = self.upload()
+        with patch("storage.responses.DOWNLOAD_MODE", "x-accel"):
+            response = self.client.get(f"/api/v0/files/{data['id']}/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["x-accel-redirect"], f"/protected-uploads/{data['file_path']}")
+        self.assertEqual(response.headers["content-type"], "application/pdf")
+        self.assertIn("attachment", response.headers["content-disposition"])
+        self.assertEqual(response.headers["etag"], f'"{data["checksum"]}"')
+
+    def test_download_shared_file_x_accel_redirect(self):
+        """Test that in x-accel mode shared downloads are handed over to nginx too."""
+        data = self.upload()
+        share = self.client.post(f"/api/v0/files/{data['id']}/share", headers=self.auth_headers, json={}).json()
+        with patch("storage.responses.DOWNLOAD_MODE", "x-accel"):
+            response = self.client.get(f"/api/v0/files/share/{share['token']}/download")
+        self.assertEqual(response.headers["x-accel-redirect"], f"/protected-uploads/{data['file_path']}")
+
+    def test_download_file_x_accel_still_authorizes(self):
+        """Test that in x-accel mode unauthorized downloads are not redirected."""
+        file_id = self.upload()["id"]
+        with patch("storage.responses.DOWNLOAD_MODE", "x-accel"):
+            response = self.client.get(f"/api/v0/files/{file_id}/download", headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn("x-accel-redirect", response.headers)
+
+    def asgi_get(self, path, headers, extensions):
+        """Send a GET request straight to the application, as a server advertising the extensions would"""
+        messages = []
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+            "extensions": extensions,
+        }
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            if message["type"] == "http.response.zerocopysend":
+                # What the server would pass to os.sendfile
+                sent = os.pread(message["file"].fileno(), message["count"], message["offset"])
+                message = {**message, "sent": sent}
+            messages.append(message)
+
+        asyncio.run(app(scope, receive, send))
+        return messages
+
+    def test_download_file_zerocopy(self):
+        """Test that servers supporting zerocopysend get the file to send instead of its bytes."""
+        file_id = self.upload()["id"]
+        start, zerocopy = self.asgi_get(
+            f"/api/v0/files/{file_id}/download", self.auth_headers, {"http.response.zerocopysend": {}}
+        )
+        self.assertEqual(start["status"], status.HTTP_200_OK)
+        self.assertIn((b"content-length", str(len(self.pdf_content)).encode()), start["headers"])
+        self.assertEqual(zerocopy["type"], "http.response.zerocopysend")
+        self.assertEqual(zerocopy["sent"], self.pdf_content)
+        self.assertFalse(zerocopy["more_body"])
+        self.assertTrue(zerocopy["file"].closed)
+
+    def test_download_file_range_zerocopy(self):
+        """Test that a single range is sent with zerocopysend from its offset."""
+        file_id = self.upload()["id"]
+        start, zerocopy = self.asgi_get(
+            f"/api/v0/files/{file_id}/download",
+            {**self.auth_headers, "Range": "bytes=9-"},
+            {"http.response.zerocopysend": {}}
+        )
+        self.assertEqual(start["status"], status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(zerocopy["offset"], 9)
+        self.assertEqual(zerocopy["sent"], self.pdf_content[9:])
+
+    def test_download_file_zerocopy_disabled(self):
+        """Test that with DOWNLOAD_ZEROCOPY off the bytes are sent even if the server supports zerocopysend."""
+        file_id = self.upload()["id"]
+        with patch("storage.sendfile.DOWNLOAD_ZEROCOPY", False):
+            messages = self.asgi_get(
+                f"/api/v0/files/{file_id}/download", self.auth_headers, {"http.response.zerocopysend": {}}
+            )
+        self.assertEqual([message["type"] for message in messages[1:]], ["http.response.body"])
+        self.assertEqual(messages[1]["body"], self.pdf_content)
+
+    def test_download_file_in_chunks(self):
+        """Test that without zerocopysend the file is sent in DOWNLOAD_CHUNK_SIZE chunks."""
+        file_id = self.upload()["id"]
+        with patch("storage.sendfile.DOWNLOAD_CHUNK_SIZE", 8):
+            messages = self.asgi_get(f"/api/v0/files/{file_id}/download", self.auth_headers, {})
+            response = self.client.get(
+                f"/api/v0/files/{file_id}/download",
+                headers={**self.auth_headers, "Range": "bytes=2-20"}
+            )
+        bodies = [message["body"] for message in messages[1:]]
+        self.assertEqual(len(bodies), -(-len(self.pdf_content) // 8))
+        self.assertEqual(b"".join(bodies), self.pdf_content)
+        self.assertFalse(messages[-1]["more_body"])
+        self.assertEqual(response.content, self.pdf_content[2:21])
+
+    def test_download_shared_file_invalid_token(self):
+        """Test downloading a file with an unknown share token."""
+        response = self.client.get("/api/v0/files/share/invalid-token/download")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestShareCache(BaseTestCase):
+    """Tests for the cache of share token resolutions."""
+
+    pdf_content = b"%PDF-1.4\n%Cached share content"
+
+    def setUp(self):
+        super().setUp()
+        share_cache.clear()
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_subfolder.id}&name=Cached",
+            headers=self.auth_headers,
+            files={"file": ("cached.pdf", BytesIO(self.pdf_content), "application/pdf")}
+        )
+        self.file_id = response.json()["id"]
+        self.share = self.client.post(
+            f"/api/v0/files/{self.file_id}/share", headers=self.auth_headers, json={}
+        ).json()
+
+    def download(self):
+        return self.client.get(f"/api/v0/files/share/{self.share['token']}/download")
+
+    def count_queries(self, func):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            result = func()
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        return result, len(statements)
+
+    def test_repeated_download_skips_database(self):
+        """Test that only the first download through a token queries the database."""
+        response, queries = self.count_queries(self.download)
+        self.assertEqual(response.content, self.pdf_content)
+        self.assertGreater(queries, 0)
+
+        response, queries = self.count_queries(self.download)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.pdf_content)
+        self.assertEqual(queries, 0)
+
+    def test_delete_share_invalidates(self):
+        """Test that a deleted share is not served from the cache."""
+        self.download()
+        self.client.delete(f"/api/v0/files/share/{self.share['id']}", headers=self.auth_headers)
+        self.assertEqual(self.download().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_file_invalidates(self):
+        """Test that the shares of a deleted file are not served from the cache."""
+        self.download()
+        self.client.delete(f"/api/v0/files/{self.file_id}", headers=self.auth_headers)
+        self.assertEqual(self.download().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_folder_invalidates(self):
+        """Test that the shares of files in a deleted folder are not served from the cache."""
+        self.download()
+        self.client.delete(f"/api/v0/folders/{self.test_folder.id}", headers=self.auth_headers)
+        self.assertEqual(self.download().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_dataroom_invalidates(self):
+        """Test that the shares of files in a deleted data room are not served from the cache."""
+        self.download()
+        self.client.delete(f"/api/v0/datarooms/{self.test_dataroom.id}", headers=self.auth_headers)
+        self.assertEqual(self.download().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rename_file_invalidates(self):
+        """Test that downloads after a rename carry the new name."""
+        self.download()
+        self.client.patch(f"/api/v0/files/{self.file_id}", headers=self.auth_headers, json={"name": "Renamed"})
+        self.assertIn("Renamed.pdf", self.download().headers["content-disposition"])
+
+    def test_lru_eviction(self):
+        """Test that the least recently used token is evicted first."""
+        cache = ShareCache(max_entries=2, ttl=60)
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        for token in ("a", "b"):
+            cache.put(token, CachedShare(1, 1, "key", "a.pdf", None, 1, None, None, expires_at))
+        cache.get("a")
+        cache.put("c", CachedShare(2, 2, "key", "c.pdf", None, 1, None, None, expires_at))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_ttl_capped_at_share_expiry(self):
+        """Test that an entry is never used past the expiry of its share."""
+        cache = ShareCache(max_entries=10, ttl=60)
+        cache.put("expired", CachedShare(1, 1, "key", "a.pdf", None, 1, None, None, datetime.utcnow()))
+        self.assertIsNone(cache.get("expired"))
+
+        cache.put("soon", CachedShare(1, 1, "key", "a.pdf", None, 1, None, None, datetime.utcnow() + timedelta(seconds=1)))
+        with patch("sharing.cache.time.time", return_value=time.time() + 2):
+            self.assertIsNone(cache.get("soon"))
+
+
+class TestSignedFileShare(BaseTestCase):
+    """Tests for the signed share link endpoints."""
+
+    pdf_content = b"%PDF-1.4\n%Signed share content"
+
+    def upload(self, folder_id=None):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={folder_id or self.test_folder.id}&name=Signed",
+            headers=self.auth_headers,
+            files={"file": ("signed.pdf", BytesIO(self.pdf_content), "application/pdf")}
+        )
+        return response.json()["id"]
+
+    def sign(self, file_id, **data):
+        return self.client.post(f"/api/v0/files/{file_id}/signed-share", headers=self.auth_headers, json=data)
+
+    def test_download_signed_file(self):
+        """Test downloading a file through a signed share token, without database queries."""
+        file_id = self.upload()
+        share = self.sign(file_id).json()
+        self.assertEqual(share["file_id"], file_id)
+
+        with patch("sharing.signed._load_revocations") as load_revocations, \
+                patch("sharing.signed._revoked_loaded_at", float("inf")):
+            response = self.client.get(f"/api/v0/files/signed/{share['token']}/download")
+        load_revocations.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.pdf_content)
+        self.assertIn('filename="Signed.pdf"', response.headers["content-disposition"])
+
+    def test_tampered_token(self):
+        """Test that a token whose payload was changed is rejected."""
+        token = self.sign(self.upload()).json()["token"]
+        body, signature = token.split(".")
+        tampered = body[:-2] + ("AA" if body[-2:] != "AA" else "BB") + "." + signature
+
+        response = self.client.get(f"/api/v0/files/signed/{tampered}/download")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get("/api/v0/files/signed/not-a-token/download")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_token(self):
+        """Test that a signed link cannot be used after its expiry."""
+        share = verify_signed_share(self.sign(self.upload()).json()["token"])
+        share.expires_at = int(time.time()) - 60
+
+        response = self.client.get(f"/api/v0/files/signed/{share.sign()}/download")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_expiry_is_bounded(self):
+        """Test that signed links cannot expire in the past or too far in the future."""
+        file_id = self.upload()
+        response = self.sign(file_id, expires_at=(datetime.utcnow() - timedelta(hours=1)).isoformat())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.sign(file_id, expires_at=(datetime.utcnow() + timedelta(days=365)).isoformat())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_signed_shares(self):
+        """Test that revoking the signed links of a file rejects the links issued so far only."""
+        file_id = self.upload()
+        token = self.sign(file_id).json()["token"]
+
+        response = self.client.delete(f"/api/v0/files/{file_id}/signed-shares", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"/api/v0/files/signed/{token}/download")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        token = self.sign(file_id).json()["token"]
+        response = self.client.get(f"/api/v0/files/signed/{token}/download")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revocation_reaches_other_workers(self):
+        """Test that revocations are picked up from the database when they are reloaded."""
+        file_id = self.upload()
+        token = self.sign(file_id).json()["token"]
+        self.client.delete(f"/api/v0/files/{file_id}/signed-shares", headers=self.auth_headers)
+
+        # A worker which never saw the revocation in memory
+        with patch("sharing.signed._revoked", {}), patch("sharing.signed._revoked_loaded_at", None):
+            response = self.client.get(f"/api/v0/files/signed/{token}/download")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleted_file_link_is_revoked(self):
+        """Test that the link of a deleted file stops working even if its content is still stored."""
+        file_id = self.upload()
+        self.upload()  # Same content, the blob stays
+        token = self.sign(file_id).json()["token"]
+
+        self.client.delete(f"/api/v0/files/{file_id}", headers=self.auth_headers)
+        response = self.client.get(f"/api/v0/files/signed/{token}/download")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleted_folder_link_is_revoked(self):
+        """Test that deleting a folder revokes the signed links of the files below it."""
+        file_id = self.upload(self.test_subfolder.id)
+        self.upload()
+        token = self.sign(file_id).json()["token"]
+
+        self.client.delete(f"/api/v0/folders/{self.test_folder.id}", headers=self.auth_headers)
+        with patch("sharing.signed._revoked", {}), patch("sharing.signed._revoked_loaded_at", None):
+            response = self.client.get(f"/api/v0/files/signed/{token}/download")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create_signed_share_unauthorized(self):
+        """Test creating a signed link for a file owned by another user."""
+        file_id = self.upload()
+        response = self.client.post(f"/api/v0/files/{file_id}/signed-share", headers=self.auth_headers_2, json={})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete(f"/api/v0/files/{file_id}/signed-shares", headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
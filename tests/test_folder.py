@@ -1,6 +1,14 @@
+import os
 import unittest
+import zipfile
+from io import BytesIO
 from fastapi import status
+from models import (
+    File,
+    Folder,
+)
 from tests.unittest_base import BaseTestCase
+from storage import get_storage
 
 
 class TestFolderList(BaseTestCase):
@@ -16,6 +24,21 @@ class TestFolderList(BaseTestCase):
         data = response.json()
         self.assertGreaterEqual(len(data), 1)
 
+    def test_list_folders_pages(self):
+        """Test that folders are listed by id, a page at a time."""
+        response = self.client.get(
+            f"/api/v0/folders?dataroom_id={self.test_dataroom.id}&limit=1",
+            headers=self.auth_headers
+        )
+        self.assertEqual([folder["id"] for folder in response.json()], [self.test_folder.id])
+
+        response = self.client.get(
+            f"/api/v0/folders?dataroom_id={self.test_dataroom.id}&limit=1&cursor={response.headers['x-next-cursor']}",
+            headers=self.auth_headers
+        )
+        self.assertEqual([folder["id"] for folder in response.json()], [self.test_subfolder.id])
+        self.assertNotIn("x-next-cursor", response.headers)
+
     def test_list_folders_unauthenticated(self):
         """Test listing folders without authentication."""
         response = self.client.get(
@@ -197,6 +220,199 @@ class TestFolderUpdate(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class TestFolderMove(BaseTestCase):
+    """Tests for the POST /folders/{folder_id}/move endpoint and the folder paths."""
+
+    def create_folder(self, name, parent_id):
+        response = self.client.post(
+            "/api/v0/folders",
+            headers=self.auth_headers,
+            json={"name": name, "dataroom_id": self.test_dataroom.id, "parent_id": parent_id}
+        )
+        return response.json()["id"]
+
+    def path_of(self, folder_id):
+        self.db.expire_all()
+        return self.db.query(Folder).filter(Folder.id == folder_id).one().path
+
+    def test_paths_of_new_folders(self):
+        """Test that folders store the ids of their ancestors."""
+        leaf_id = self.create_folder("Leaf", self.test_subfolder.id)
+        self.assertEqual(self.path_of(self.test_folder.id), "/")
+        self.assertEqual(self.path_of(self.test_subfolder.id), f"/{self.test_folder.id}/")
+        self.assertEqual(self.path_of(leaf_id), f"/{self.test_folder.id}/{self.test_subfolder.id}/")
+
+    def test_move_folder_with_subtree(self):
+        """Test that moving a folder moves its subfolders along."""
+        other_id = self.create_folder("Other", None)
+        leaf_id = self.create_folder("Leaf", self.test_subfolder.id)
+
+        response = self.client.post(
+            f"/api/v0/folders/{self.test_subfolder.id}/move",
+            headers=self.auth_headers,
+            json={"parent_id": other_id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["parent_id"], other_id)
+        self.assertEqual([folder["id"] for folder in data["subfolders"]], [leaf_id])
+        self.assertEqual(self.path_of(leaf_id), f"/{other_id}/{self.test_subfolder.id}/")
+
+        # And back to the top level
+        response = self.client.post(
+            f"/api/v0/folders/{self.test_subfolder.id}/move",
+            headers=self.auth_headers,
+            json={"parent_id": None}
+        )
+        self.assertIsNone(response.json()["parent_id"])
+        self.assertEqual(self.path_of(self.test_subfolder.id), "/")
+        self.assertEqual(self.path_of(leaf_id), f"/{self.test_subfolder.id}/")
+
+        response = self.client.get(f"/api/v0/folders/{self.test_folder.id}", headers=self.auth_headers)
+        self.assertEqual(response.json()["subfolders"], [])
+
+    def test_move_folder_into_its_subtree(self):
+        """Test that a folder cannot be moved into itself or below itself."""
+        leaf_id = self.create_folder("Leaf", self.test_subfolder.id)
+        for parent_id in (self.test_folder.id, self.test_subfolder.id, leaf_id):
+            response = self.client.post(
+                f"/api/v0/folders/{self.test_folder.id}/move",
+                headers=self.auth_headers,
+                json={"parent_id": parent_id}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_folder_invalid_parent(self):
+        """Test moving a folder under a non-existent folder."""
+        response = self.client.post(
+            f"/api/v0/folders/{self.test_subfolder.id}/move",
+            headers=self.auth_headers,
+            json={"parent_id": 99999}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_move_folder_unauthorized(self):
+        """Test moving a folder in a dataroom owned by another user."""
+        response = self.client.post(
+            f"/api/v0/folders/{self.test_subfolder.id}/move",
+            headers=self.auth_headers_2,
+            json={"parent_id": None}
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_folder_ancestors(self):
+        """Test getting the breadcrumbs of a folder."""
+        leaf_id = self.create_folder("Leaf", self.test_subfolder.id)
+        response = self.client.get(f"/api/v0/folders/{leaf_id}/ancestors", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(folder["id"], folder["name"]) for folder in response.json()],
+            [(self.test_folder.id, "Test Folder"), (self.test_subfolder.id, "Test SubFolder")]
+        )
+
+        response = self.client.get(f"/api/v0/folders/{self.test_folder.id}/ancestors", headers=self.auth_headers)
+        self.assertEqual(response.json(), [])
+
+
+class TestFolderDownload(BaseTestCase):
+    """Tests for the GET /folders/{folder_id}/download endpoint."""
+
+    def upload(self, folder_id, name, content):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={folder_id}&name={name}",
+            headers=self.auth_headers,
+            files={"file": ("document.pdf", BytesIO(content), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_download_folder_archive(self):
+        """Test that a folder is downloaded as a ZIP of its subtree, with stored PDF entries."""
+        self.upload(self.test_folder.id, "Report", b"%PDF-1.4\n%Report")
+        self.upload(self.test_subfolder.id, "Nested", b"%PDF-1.4\n%Nested")
+
+        response = self.client.get(
+            f"/api/v0/folders/{self.test_folder.id}/download",
+            headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        self.assertIn("Test%20Folder.zip", response.headers["content-disposition"])
+
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(sorted(archive.namelist()), [
+                "Test Folder/",
+                "Test Folder/Report.pdf",
+                "Test Folder/Test SubFolder/",
+                "Test Folder/Test SubFolder/Nested.pdf",
+            ])
+            self.assertEqual(archive.read("Test Folder/Test SubFolder/Nested.pdf"), b"%PDF-1.4\n%Nested")
+            self.assertEqual(archive.getinfo("Test Folder/Report.pdf").compress_type, zipfile.ZIP_STORED)
+
+    def test_download_folder_sizes_of_content(self):
+        """Test that archive entries record the bytes sent, whatever size the file rows carry."""
+        self.upload(self.test_folder.id, "Report", b"%PDF-1.4\n%Report")
+        self.db.query(File).filter(File.name == "Report").update({"file_size": 3})
+        # A file stored before blobs existed, without size
+        legacy_path = get_storage().local_path("legacy/archive-size.pdf")
+        os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+        with open(legacy_path, "wb") as f:
+            f.write(b"%PDF-1.4\n%Legacy")
+        self.addCleanup(os.remove, legacy_path)
+        self.db.add(File(name="Legacy", folder_id=self.test_folder.id, file_path="legacy/archive-size.pdf",
+                         file_size=None, file_type="pdf"))
+        self.db.commit()
+
+        response = self.client.get(
+            f"/api/v0/folders/{self.test_folder.id}/download",
+            headers=self.auth_headers
+        )
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read("Test Folder/Report.pdf"), b"%PDF-1.4\n%Report")
+            self.assertEqual(archive.getinfo("Test Folder/Report.pdf").file_size, len(b"%PDF-1.4\n%Report"))
+            self.assertEqual(archive.read("Test Folder/Legacy.pdf"), b"%PDF-1.4\n%Legacy")
+
+    def test_download_subfolder_archive(self):
+        """Test that downloading a subfolder leaves its parent's files out."""
+        self.upload(self.test_folder.id, "Report", b"%PDF-1.4\n%Report")
+        self.upload(self.test_subfolder.id, "Nested", b"%PDF-1.4\n%Nested")
+
+        response = self.client.get(
+            f"/api/v0/folders/{self.test_subfolder.id}/download",
+            headers=self.auth_headers
+        )
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            self.assertEqual(sorted(archive.namelist()), ["Test SubFolder/", "Test SubFolder/Nested.pdf"])
+
+    def test_download_folder_duplicate_names(self):
+        """Test that files with the same name in a folder get distinct archive paths."""
+        self.upload(self.test_folder.id, "Report", b"%PDF-1.4\n%First")
+        self.upload(self.test_folder.id, "Report", b"%PDF-1.4\n%Second")
+
+        response = self.client.get(
+            f"/api/v0/folders/{self.test_folder.id}/download",
+            headers=self.auth_headers
+        )
+        with zipfile.ZipFile(BytesIO(response.content)) as archive:
+            names = archive.namelist()
+            self.assertIn("Test Folder/Report.pdf", names)
+            self.assertIn("Test Folder/Report (2).pdf", names)
+
+    def test_download_folder_not_found(self):
+        """Test downloading non-existent folder."""
+        response = self.client.get("/api/v0/folders/99999/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_download_folder_unauthorized(self):
+        """Test downloading folder in dataroom owned by another user."""
+        response = self.client.get(
+            f"/api/v0/folders/{self.test_folder.id}/download",
+            headers=self.auth_headers_2
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class TestFolderDelete(BaseTestCase):
     """Tests for the DELETE /folders/{folder_id} endpoint."""
 
@@ -208,6 +424,24 @@ class TestFolderDelete(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_delete_folder_releases_file_content(self):
+        """Test that deleting a folder removes the content of its files from disk."""
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_subfolder.id}&name=Nested+File",
+            headers=self.auth_headers,
+            files={"file": ("nested.pdf", BytesIO(b"%PDF-1.4\n%Nested PDF"), "application/pdf")}
+        )
+        file_path = get_storage().local_path(response.json()["file_path"])
+        self.assertTrue(os.path.exists(file_path))
+
+        response = self.client.delete(
+            f"/api/v0/folders/{self.test_folder.id}",
+            headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.collect_garbage()
+        self.assertFalse(os.path.exists(file_path))
+
     def test_delete_folder_not_found(self):
         """Test deleting non-existent folder."""
         response = self.client.delete(
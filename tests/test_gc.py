@@ -0,0 +1,168 @@
+"""
+Unit tests for the storage garbage collector using unittest.
+"""
+import asyncio
+import os
+import time
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from fastapi import status
+
+from storage import (
+    collect_released,
+    get_storage,
+    sweep,
+)
+from storage.gc import _Throttle
+from tests.unittest_base import (
+    BaseTestCase,
+    engine,
+)
+
+# Modification time of objects written before the grace period
+LONG_AGO = time.time() - 7 * 24 * 60 * 60
+
+
+class TestGarbageCollector(BaseTestCase):
+    """Tests for collecting released and unreferenced contents."""
+
+    def upload(self, content, folder_id=None):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={folder_id or self.test_folder.id}&name=Document",
+            headers=self.auth_headers,
+            files={"file": ("document.pdf", BytesIO(content), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def write_object(self, key, content=b"orphan", mtime=LONG_AGO):
+        path = get_storage().local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def write_local(self, directory, name, mtime=LONG_AGO):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(b"leftover")
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def sweep(self, **kwargs):
+        kwargs.setdefault("grace_period", 0)
+        kwargs.setdefault("max_deletes_per_second", None)
+        return asyncio.run(sweep(engine, **kwargs))
+
+    def test_delete_dataroom_only_queues_contents(self):
+        """Test that deleting a dataroom leaves its contents to the garbage collector."""
+        paths = [
+            get_storage().local_path(self.upload(f"%PDF-1.4\n%Document {i}".encode())["file_path"])
+            for i in range(3)
+        ]
+
+        response = self.client.delete(f"/api/v0/datarooms/{self.test_dataroom.id}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        report = self.collect_garbage()
+        self.assertEqual(len(report.removed), 3)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_reuploaded_content_is_kept(self):
+        """Test that content uploaded again before the collector runs is not removed."""
+        content = b"%PDF-1.4\n%Uploaded twice"
+        data = self.upload(content)
+        self.client.delete(f"/api/v0/files/{data['id']}", headers=self.auth_headers)
+        data = self.upload(content)
+
+        report = self.collect_garbage()
+        self.assertEqual(report.removed, [])
+        response = self.client.get(f"/api/v0/files/{data['id']}/download", headers=self.auth_headers)
+        self.assertEqual(response.content, content)
+
+    def test_content_uploaded_again_during_throttled_batch_is_kept(self):
+        """Test that content stored again after the batch check but before its throttled delete is kept."""
+        contents = [f"%PDF-1.4\n%Released {i}".encode() for i in range(2)]
+        for content in contents:
+            data = self.upload(content)
+            os.utime(get_storage().local_path(data["file_path"]), (LONG_AGO, LONG_AGO))
+            self.client.delete(f"/api/v0/files/{data['id']}", headers=self.auth_headers)
+
+        waits, uploaded = [], []
+        original_wait = _Throttle.wait
+
+        async def _wait(throttle):
+            # While the second delete waits for the throttle, its content is uploaded again
+            waits.append(throttle)
+            if len(waits) == 2:
+                uploaded.append(self.upload(contents[-1]))
+            await original_wait(throttle)
+
+        with patch.object(_Throttle, "wait", _wait):
+            report = asyncio.run(collect_released(engine, grace_period=0, max_deletes_per_second=20))
+
+        self.assertEqual(len(report.removed), 1)
+        self.assertEqual(len(uploaded), 1)
+        response = self.client.get(f"/api/v0/files/{uploaded[0]['id']}/download", headers=self.auth_headers)
+        self.assertEqual(response.content, contents[-1])
+
+    def test_sweep_dry_run_reports_orphans(self):
+        """Test that a dry run reports unreferenced objects without removing them."""
+        path = self.write_object("blobs/zz/zz/dry-run-orphan")
+
+        report = self.sweep(dry_run=True)
+        self.assertTrue(report.dry_run)
+        self.assertIn("blobs/zz/zz/dry-run-orphan", report.removed)
+        self.assertTrue(os.path.exists(path))
+
+    def test_sweep_removes_orphans_and_keeps_referenced_contents(self):
+        """Test that a sweep removes unreferenced objects only."""
+        orphan_path = self.write_object("blobs/zz/zz/orphan")
+        data = self.upload(b"%PDF-1.4\n%Referenced")
+        referenced_path = get_storage().local_path(data["file_path"])
+        os.utime(referenced_path, (LONG_AGO, LONG_AGO))
+
+        report = self.sweep()
+        self.assertIn("blobs/zz/zz/orphan", report.removed)
+        self.assertNotIn(data["file_path"], report.removed)
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertTrue(os.path.exists(referenced_path))
+
+    def test_sweep_keeps_recent_orphans(self):
+        """Test that objects written within the grace period are kept."""
+        path = self.write_object("blobs/zz/zz/recent-orphan", mtime=time.time())
+
+        report = self.sweep(grace_period=3600)
+        self.assertNotIn("blobs/zz/zz/recent-orphan", report.removed)
+        self.assertGreaterEqual(report.skipped_recent, 1)
+        self.assertTrue(os.path.exists(path))
+
+    def test_sweep_removes_stale_upload_leftovers(self):
+        """Test that stale temporary uploads and parts of missing upload sessions are removed."""
+        temp_path = self.write_local(self.upload_temp_directory, "interrupted-upload")
+        part_path = self.write_local(self.upload_sessions_directory, "999999.part")
+
+        report = self.sweep()
+        self.assertIn(temp_path, report.removed)
+        self.assertIn(part_path, report.removed)
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertFalse(os.path.exists(part_path))
+
+    def test_sweep_throttles_deletes(self):
+        """Test that deletes are spaced out to the configured rate."""
+        for i in range(3):
+            self.write_object(f"blobs/zz/zz/throttled-{i}")
+
+        began = time.monotonic()
+        report = self.sweep(max_deletes_per_second=20)
+        self.assertGreaterEqual(len(report.removed), 3)
+        self.assertGreaterEqual(time.monotonic() - began, (len(report.removed) - 1) / 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Unit tests for page range extracts using unittest.
+"""
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from fastapi import status
+from pypdf import (
+    PdfReader,
+    PdfWriter,
+)
+from pypdf.generic import (
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+)
+
+from models import (
+    Blob,
+    PageIndex,
+)
+from storage.compression import COMPRESSION_ZLIB
+from tests.unittest_base import BaseTestCase
+
+
+def build_pdf(pages=5):
+    """Build a PDF document with the text "Page N" on every page, sharing one font."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for number in range(1, pages + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 24 Tf 72 720 Td (Page {number}) Tj ET".encode("ascii"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class TestFilePages(BaseTestCase):
+    """Tests for downloading some pages of a file as a standalone PDF."""
+
+    def upload(self, content=None):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Report",
+            headers=self.auth_headers,
+            files={"file": ("report.pdf", BytesIO(content or build_pdf()), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def get_pages(self, file_id, query, headers=None):
+        return self.client.get(f"/api/v0/files/{file_id}/pages?{query}", headers=headers or self.auth_headers)
+
+    def get_processing(self, file_id):
+        return self.client.get(f"/api/v0/files/{file_id}/processing", headers=self.auth_headers).json()
+
+    def assert_pages(self, response, numbers):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["content-type"], "application/pdf")
+        self.assertEqual(int(response.headers["content-length"]), len(response.content))
+        reader = PdfReader(BytesIO(response.content), strict=True)
+        self.assertEqual([page.extract_text() for page in reader.pages], [f"Page {number}" for number in numbers])
+
+    def test_upload_indexes_pages(self):
+        """Test that processing an upload indexes every page."""
+        data = self.upload()
+        db_file = self.get_processing(data["id"])
+        self.assertEqual(db_file["processing_status"], "done")
+        rows = self.db.query(PageIndex).order_by(PageIndex.page_number).all()
+        self.assertEqual([row.page_number for row in rows], [1, 2, 3, 4, 5])
+        # The shared font is needed by every page
+        self.assertTrue(all(len(row.objects) == 2 for row in rows))
+
+    def test_extract_single_page(self):
+        """Test extracting one page from the index."""
+        data = self.upload()
+        response = self.get_pages(data["id"], "first=3")
+        self.assert_pages(response, [3])
+        self.assertIn("Report%20%28page%203%29.pdf", response.headers["content-disposition"])
+
+    def test_extract_page_range(self):
+        """Test extracting consecutive pages from the index."""
+        data = self.upload()
+        self.assert_pages(self.get_pages(data["id"], "first=2&last=4"), [2, 3, 4])
+        self.assert_pages(self.get_pages(data["id"], "first=1&last=5"), [1, 2, 3, 4, 5])
+
+    def test_extract_does_not_parse_the_document(self):
+        """Test that indexed documents are assembled without pypdf."""
+        data = self.upload()
+        with patch("api.v0.endpoints.file.extract_file_pages", side_effect=AssertionError("document parsed")):
+            self.assert_pages(self.get_pages(data["id"], "first=5"), [5])
+
+    def test_extract_without_index(self):
+        """Test that documents without page index are parsed instead."""
+        data = self.upload()
+        self.db.query(PageIndex).delete()
+        self.db.commit()
+        self.assert_pages(self.get_pages(data["id"], "first=2&last=3"), [2, 3])
+        self.assertEqual(self.get_pages(data["id"], "first=6").status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch("storage.compression.STORAGE_COMPRESSION", COMPRESSION_ZLIB)
+    def test_extract_compressed_content(self):
+        """Test extracting pages of a content compressed at rest."""
+        data = self.upload(build_pdf(pages=40))
+        self.assertEqual(self.db.query(Blob).one().compression, COMPRESSION_ZLIB)
+        self.assertEqual(self.db.query(PageIndex).count(), 40)
+        self.assert_pages(self.get_pages(data["id"], "first=38&last=39"), [38, 39])
+
+    def test_extract_out_of_range(self):
+        """Test extracting pages past the end of the document."""
+        data = self.upload()
+        response = self.get_pages(data["id"], "first=4&last=6")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_extract_inverted_range(self):
+        """Test extracting a range whose last page comes before the first one."""
+        data = self.upload()
+        response = self.get_pages(data["id"], "first=3&last=2")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_extract_unauthorized(self):
+        """Test extracting pages of a file owned by another user."""
+        data = self.upload()
+        response = self.get_pages(data["id"], "first=1", headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_extract_not_found(self):
+        """Test extracting pages of a non-existent file."""
+        response = self.get_pages(99999, "first=1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_index_deleted_with_blob(self):
+        """Test that the page index goes away with the last file of its content."""
+        data = self.upload()
+        self.client.delete(f"/api/v0/files/{data['id']}", headers=self.auth_headers)
+        self.assertEqual(self.db.query(PageIndex).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
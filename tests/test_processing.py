@@ -0,0 +1,115 @@
+"""
+Unit tests for the post-upload processing pipeline using unittest.
+"""
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from io import BytesIO
+from unittest.mock import patch
+from fastapi import status
+from pypdf import PdfWriter
+from models import (
+    File,
+    PageIndex,
+)
+from processing import process_file
+from storage import local_copy
+from tests.unittest_base import (
+    BaseTestCase,
+    engine,
+)
+
+
+def build_pdf(pages=2, title="Quarterly Report"):
+    """Build a small but valid PDF document."""
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    writer.add_metadata({"/Title": title, "/Author": "Finance"})
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class TestFileProcessing(BaseTestCase):
+    """Tests for the background processing of uploaded files."""
+
+    def upload(self, content, filename="document.pdf"):
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Document",
+            headers=self.auth_headers,
+            files={"file": (filename, BytesIO(content), "application/pdf")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def get_processing(self, file_id, headers=None):
+        return self.client.get(
+            f"/api/v0/files/{file_id}/processing",
+            headers=headers or self.auth_headers
+        )
+
+    def test_processing_extracts_page_count_and_metadata(self):
+        """Test that a valid PDF gets its page count and metadata after upload."""
+        data = self.upload(build_pdf(pages=3))
+        self.assertEqual(data["processing_status"], "pending")
+
+        # The test client runs background tasks before returning the response
+        response = self.get_processing(data["id"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        processing = response.json()
+        self.assertEqual(processing["processing_status"], "done")
+        self.assertEqual(processing["page_count"], 3)
+        self.assertEqual(processing["document_metadata"]["Title"], "Quarterly Report")
+        self.assertIsNotNone(processing["processed_at"])
+
+    def test_processing_rejects_fake_pdf(self):
+        """Test that a file named .pdf without the PDF header fails validation."""
+        data = self.upload(b"This is not a PDF document")
+        processing = self.get_processing(data["id"]).json()
+        self.assertEqual(processing["processing_status"], "failed")
+        self.assertIn("not a PDF", processing["processing_error"])
+
+    def test_processing_reuses_results_of_identical_content(self):
+        """Test that uploading the same content again copies the results."""
+        content = build_pdf(pages=2, title="Shared")
+        self.upload(content)
+        data = self.upload(content)
+        processing = self.get_processing(data["id"]).json()
+        self.assertEqual(processing["processing_status"], "done")
+        self.assertEqual(processing["page_count"], 2)
+
+    def test_file_deleted_during_processing(self):
+        """Test that the results of a file deleted while it is processed are dropped quietly."""
+        data = self.upload(build_pdf(pages=2, title="Deleted"))
+        blob_id = self.db.query(File.blob_id).filter(File.id == data["id"]).scalar()
+
+        @asynccontextmanager
+        async def _local_copy(key, compression):
+            # Deleted once the pipeline started, after the file was marked as processing
+            response = self.client.delete(f"/api/v0/files/{data['id']}", headers=self.auth_headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            async with local_copy(key, compression) as path:
+                yield path
+
+        with patch("processing.runner.local_copy", _local_copy):
+            asyncio.run(process_file(engine, data["id"]))
+
+        self.db.expire_all()
+        self.assertIsNone(self.db.get(File, data["id"]))
+        self.assertEqual(self.db.query(PageIndex).filter(PageIndex.blob_id == blob_id).count(), 0)
+
+    def test_get_processing_unauthorized(self):
+        """Test polling the processing of a file owned by another user."""
+        data = self.upload(build_pdf(pages=1))
+        response = self.get_processing(data["id"], headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_processing_not_found(self):
+        """Test polling the processing of a non-existent file."""
+        response = self.get_processing(99999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+if __name__ == '__main__':
+    unittest.main()
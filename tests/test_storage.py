@@ -0,0 +1,165 @@
+"""
+Unit tests for the storage backends.
+
+The S3 backend runs against a local moto server, so no AWS account is needed.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage.local import LocalStorageBackend
+
+try:
+    import aiobotocore  # noqa: F401
+    from moto.server import ThreadedMotoServer
+    HAS_S3_DEPENDENCIES = True
+except ImportError:
+    HAS_S3_DEPENDENCIES = False
+
+
+class StorageBackendTests:
+    """Behaviour shared by all storage backends, mixed into a TestCase per backend."""
+
+    content = b"%PDF-1.4\n" + bytes(range(256)) * 64
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def collect(self, stream):
+        async def _collect():
+            return b"".join([chunk async for chunk in stream])
+        return self.run_async(_collect())
+
+    def put_content(self, key, content=None):
+        fd, path = tempfile.mkstemp(dir=self.scratch_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content if content is not None else self.content)
+        return self.run_async(self.storage.put_file(key, path)), path
+
+    def test_put_and_stat(self):
+        """Test storing a file consumes the local copy and reports its size."""
+        stored, source_path = self.put_content("blobs/aa/bb/object")
+        self.assertEqual(stored.size, len(self.content))
+        self.assertFalse(os.path.exists(source_path))
+
+        stat = self.run_async(self.storage.stat("blobs/aa/bb/object"))
+        self.assertEqual(stat.size, len(self.content))
+
+    def test_stat_missing(self):
+        """Test that a missing object has no metadata."""
+        self.assertIsNone(self.run_async(self.storage.stat("blobs/missing")))
+
+    def test_open_stream(self):
+        """Test streaming a whole object in small chunks."""
+        self.put_content("blobs/stream")
+        data = self.collect(self.storage.open_stream("blobs/stream", chunk_size=1000))
+        self.assertEqual(data, self.content)
+
+    def test_get_range(self):
+        """Test streaming a byte range of an object."""
+        self.put_content("blobs/range")
+        data = self.collect(self.storage.get_range("blobs/range", 100, 5099, chunk_size=1000))
+        self.assertEqual(data, self.content[100:5100])
+
+    def test_delete(self):
+        """Test deleting an object, twice."""
+        self.put_content("blobs/delete")
+        self.run_async(self.storage.delete("blobs/delete"))
+        self.run_async(self.storage.delete("blobs/delete"))
+        self.assertIsNone(self.run_async(self.storage.stat("blobs/delete")))
+
+    def test_list_objects(self):
+        """Test listing every stored object with its size."""
+        self.put_content("blobs/aa/bb/first")
+        self.put_content("blobs/cc/dd/second", b"second")
+
+        async def _list():
+            return {stored.key: stored.size async for stored in self.storage.list_objects()}
+        listed = self.run_async(_list())
+        self.assertEqual(listed.get("blobs/aa/bb/first"), len(self.content))
+        self.assertEqual(listed.get("blobs/cc/dd/second"), len(b"second"))
+
+
+class TestLocalStorageBackend(StorageBackendTests, unittest.TestCase):
+    """Tests for the local filesystem backend."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.root = tempfile.mkdtemp()
+        self.scratch_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(self.scratch_dir)
+        self.storage = LocalStorageBackend(self.root)
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.root)
+
+    def test_local_path(self):
+        """Test that keys map to paths below the root directory."""
+        self.put_content("blobs/aa/bb/local")
+        path = self.storage.local_path("blobs/aa/bb/local")
+        self.assertEqual(path, os.path.join(self.root, "blobs", "aa", "bb", "local"))
+        self.assertTrue(os.path.exists(path))
+
+
+@unittest.skipUnless(HAS_S3_DEPENDENCIES, "aiobotocore and moto[server] are required for S3 tests")
+class TestS3StorageBackend(StorageBackendTests, unittest.TestCase):
+    """Tests for the S3-compatible backend, against a local moto server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadedMotoServer(port=0, verbose=False)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        cls.endpoint_url = f"http://{host}:{port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        from storage.s3 import S3StorageBackend
+
+        self.loop = asyncio.new_event_loop()
+        self.scratch_dir = tempfile.mkdtemp()
+        self.storage = S3StorageBackend(
+            bucket="test-bucket",
+            endpoint_url=self.endpoint_url,
+            region_name="us-east-1",
+            access_key_id="testing",
+            secret_access_key="testing",
+            # Small parts so the multipart upload path is exercised
+            multipart_chunk_size=5 * 1024 * 1024,
+        )
+
+        async def _create_bucket():
+            client = await self.storage._get_client()
+            try:
+                await client.create_bucket(Bucket="test-bucket")
+            except client.exceptions.BucketAlreadyOwnedByYou:
+                pass
+
+        self.run_async(_create_bucket())
+
+    def tearDown(self):
+        self.run_async(self.storage.close())
+        self.loop.close()
+        shutil.rmtree(self.scratch_dir)
+
+    def test_local_path(self):
+        """Test that S3 objects are never served from the local filesystem."""
+        self.assertIsNone(self.storage.local_path("blobs/anything"))
+
+    def test_multipart_upload(self):
+        """Test storing a file larger than one multipart chunk."""
+        content = os.urandom(11 * 1024 * 1024)
+        stored, _ = self.put_content("blobs/large", content)
+        self.assertEqual(stored.size, len(content))
+        data = self.collect(self.storage.open_stream("blobs/large"))
+        self.assertEqual(data, content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import hashlib
+import unittest
+from unittest.mock import patch
+from fastapi import status
+from models.upload_session import UploadSession
+from storage import session_part_path
+from tests.unittest_base import BaseTestCase, TestingSessionLocal
+
+
+class UploadSessionTestCase(BaseTestCase):
+    """Common helpers for upload session tests."""
+
+    pdf_content = b"%PDF-1.4\n" + b"0123456789" * 1000
+
+    def create_session(self, headers=None, **overrides):
+        payload = {
+            "folder_id": self.test_folder.id,
+            "name": "Resumable File",
+            "filename": "resumable.pdf",
+            "total_size": len(self.pdf_content),
+        }
+        payload.update(overrides)
+        return self.client.post(
+            "/api/v0/upload-sessions",
+            headers=headers or self.auth_headers,
+            json=payload
+        )
+
+    def put_chunk(self, session_id, first, last, headers=None):
+        chunk_headers = dict(headers or self.auth_headers)
+        chunk_headers["Content-Range"] = f"bytes {first}-{last}/{len(self.pdf_content)}"
+        return self.client.put(
+            f"/api/v0/upload-sessions/{session_id}",
+            headers=chunk_headers,
+            content=self.pdf_content[first:last + 1]
+        )
+
+
+class TestUploadSessionCreate(UploadSessionTestCase):
+    """Tests for the POST /upload-sessions endpoint."""
+
+    def test_create_session_success(self):
+        """Test starting an upload session."""
+        response = self.create_session()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["received_size"], 0)
+        self.assertEqual(data["total_size"], len(self.pdf_content))
+
+    def test_create_session_non_pdf(self):
+        """Test starting an upload session for a non-PDF file."""
+        response = self.create_session(filename="test.txt")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_session_invalid_folder(self):
+        """Test starting an upload session into a non-existent folder."""
+        response = self.create_session(folder_id=99999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_session_unauthorized_folder(self):
+        """Test starting an upload session into a folder owned by another user."""
+        response = self.create_session(headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestUploadSessionChunks(UploadSessionTestCase):
+    """Tests for the PUT /upload-sessions/{id} and completion endpoints."""
+
+    def test_resumable_upload_success(self):
+        """Test uploading a file in two ranges and finalizing it."""
+        session_id = self.create_session().json()["id"]
+        middle = len(self.pdf_content) // 2
+
+        response = self.put_chunk(session_id, 0, middle - 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["received_size"], middle)
+
+        # The committed offset can be queried to resume after a dropped connection
+        response = self.client.get(f"/api/v0/upload-sessions/{session_id}", headers=self.auth_headers)
+        self.assertEqual(response.json()["received_size"], middle)
+
+        response = self.put_chunk(session_id, middle, len(self.pdf_content) - 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(
+            f"/api/v0/upload-sessions/{session_id}/complete",
+            headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["name"], "Resumable File")
+        self.assertEqual(data["file_size"], len(self.pdf_content))
+        self.assertEqual(data["checksum"], hashlib.sha256(self.pdf_content).hexdigest())
+
+        # The session is gone once it has been finalized
+        response = self.client.get(f"/api/v0/upload-sessions/{session_id}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_chunk_not_at_offset(self):
+        """Test that a chunk must start at the committed offset."""
+        session_id = self.create_session().json()["id"]
+        response = self.put_chunk(session_id, 100, 199)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_chunk_racing_another_chunk(self):
+        """Test that a chunk does not move the offset when another chunk committed meanwhile."""
+        session_id = self.create_session().json()["id"]
+
+        async def write_racing_chunk(stream, destination, offset, limit):
+            # Another request commits the same range while this one is written
+            with TestingSessionLocal() as db:
+                db.query(UploadSession).filter(UploadSession.id == session_id).update({"received_size": limit})
+                db.commit()
+            return limit
+
+        with patch("api.v0.endpoints.upload_session.write_stream_at", write_racing_chunk):
+            response = self.put_chunk(session_id, 0, 99)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self.client.get(f"/api/v0/upload-sessions/{session_id}", headers=self.auth_headers)
+        self.assertEqual(response.json()["received_size"], 100)
+
+    def test_chunk_invalid_content_range(self):
+        """Test uploading a chunk with a malformed Content-Range header."""
+        session_id = self.create_session().json()["id"]
+        headers = dict(self.auth_headers)
+        headers["Content-Range"] = "invalid"
+        response = self.client.put(
+            f"/api/v0/upload-sessions/{session_id}",
+            headers=headers,
+            content=b"data"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_unauthorized(self):
+        """Test uploading a chunk into a session of another user."""
+        session_id = self.create_session().json()["id"]
+        response = self.put_chunk(session_id, 0, 99, headers=self.auth_headers_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_complete_incomplete_upload(self):
+        """Test finalizing a session before all bytes have been received."""
+        session_id = self.create_session().json()["id"]
+        self.put_chunk(session_id, 0, 99)
+        response = self.client.post(
+            f"/api/v0/upload-sessions/{session_id}/complete",
+            headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_complete_truncated_upload(self):
+        """Test finalizing a session whose partial file lost bytes after they were received."""
+        session_id = self.create_session().json()["id"]
+        self.put_chunk(session_id, 0, len(self.pdf_content) - 1)
+        with open(session_part_path(session_id), "r+b") as f:
+            f.truncate(100)
+
+        response = self.client.post(
+            f"/api/v0/upload-sessions/{session_id}/complete",
+            headers=self.auth_headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_delete_session(self):
+        """Test aborting an upload session."""
+        session_id = self.create_session().json()["id"]
+        self.put_chunk(session_id, 0, 99)
+        response = self.client.delete(f"/api/v0/upload-sessions/{session_id}", headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+if __name__ == '__main__':
+    unittest.main()
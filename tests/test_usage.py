@@ -0,0 +1,155 @@
+"""
+Unit tests for the write-behind download counters using unittest.
+"""
+import asyncio
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from models import (
+    File,
+    FileShare,
+)
+from usage import (
+    flush_usage,
+    pending_events,
+    record_download,
+    run_usage_flusher,
+)
+from tests.unittest_base import (
+    BaseTestCase,
+    engine,
+)
+
+
+class TestDownloadCounters(BaseTestCase):
+    """Tests for counting downloads in memory and writing them in batches."""
+
+    def setUp(self):
+        # Start from an empty buffer, whatever earlier tests downloaded
+        flush_usage(engine)
+        super().setUp()
+        response = self.client.post(
+            f"/api/v0/files?folder_id={self.test_folder.id}&name=Counted",
+            headers=self.auth_headers,
+            files={"file": ("counted.pdf", BytesIO(b"%PDF-1.4\n%Counted"), "application/pdf")}
+        )
+        self.file_id = response.json()["id"]
+        self.share = self.client.post(
+            f"/api/v0/files/{self.file_id}/share", headers=self.auth_headers, json={}
+        ).json()
+
+    def get_file(self):
+        self.db.expire_all()
+        return self.db.query(File).filter(File.id == self.file_id).one()
+
+    def get_share(self):
+        self.db.expire_all()
+        return self.db.query(FileShare).filter(FileShare.id == self.share["id"]).one()
+
+    def test_downloads_are_buffered(self):
+        """Test that downloads are only written to the database when flushed."""
+        updated_at = self.get_file().updated_at
+        for _ in range(3):
+            self.client.get(f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers)
+        for _ in range(2):
+            self.client.get(f"/api/v0/files/share/{self.share['token']}/download")
+
+        self.assertEqual(pending_events(), 5)
+        self.assertEqual(self.get_file().download_count, 0)
+
+        self.assertEqual(flush_usage(engine), 5)
+        db_file = self.get_file()
+        self.assertEqual(db_file.download_count, 5)
+        self.assertIsNotNone(db_file.last_downloaded_at)
+        # Downloads do not change the Last-Modified date of the content
+        self.assertEqual(db_file.updated_at, updated_at)
+        db_share = self.get_share()
+        self.assertEqual(db_share.download_count, 2)
+        self.assertEqual(db_share.last_accessed_at, db_file.last_downloaded_at)
+
+    def test_only_sent_files_are_counted(self):
+        """Test that revalidations and the later ranges of a file being read are not counted as downloads."""
+        url = f"/api/v0/files/{self.file_id}/download"
+        etag = self.client.get(url, headers=self.auth_headers).headers["etag"]
+        self.assertEqual(pending_events(), 1)
+
+        response = self.client.get(url, headers={**self.auth_headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        # A viewer reading the file in parts, the first part only counts
+        for byte_range in ("bytes=0-3", "bytes=4-7", "bytes=8-"):
+            response = self.client.get(url, headers={**self.auth_headers, "Range": byte_range})
+            self.assertEqual(response.status_code, 206)
+        response = self.client.get(url, headers={**self.auth_headers, "Range": "bytes=1000-"})
+        self.assertEqual(response.status_code, 416)
+        response = self.client.get(
+            f"/api/v0/files/share/{self.share['token']}/download", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(pending_events(), 2)
+        self.assertEqual(flush_usage(engine), 2)
+        self.assertEqual(self.get_file().download_count, 2)
+        self.assertEqual(self.get_share().download_count, 0)
+
+    def test_missing_content_is_not_counted(self):
+        """Test that a download failing on missing content is not counted."""
+        db_file = self.get_file()
+        db_file.file_path = "blobs/zz/zz/missing"
+        self.db.commit()
+
+        response = self.client.get(f"/api/v0/files/{self.file_id}/download", headers=self.auth_headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(pending_events(), 0)
+
+    def test_flushes_add_up(self):
+        """Test that counters are incremented, not overwritten, by successive flushes."""
+        record_download(self.file_id)
+        flush_usage(engine)
+        record_download(self.file_id)
+        record_download(self.file_id)
+        flush_usage(engine)
+        self.assertEqual(self.get_file().download_count, 3)
+
+        response = self.client.get(f"/api/v0/files/{self.file_id}", headers=self.auth_headers)
+        self.assertEqual(response.json()["download_count"], 3)
+
+    def test_failed_flush_keeps_increments(self):
+        """Test that increments of a failed flush are written by the next one."""
+        record_download(self.file_id, self.share["id"])
+        with patch.object(engine, "begin", side_effect=RuntimeError("database unavailable")):
+            with self.assertRaises(RuntimeError):
+                flush_usage(engine)
+        self.assertEqual(pending_events(), 1)
+
+        flush_usage(engine)
+        self.assertEqual(self.get_file().download_count, 1)
+        self.assertEqual(self.get_share().download_count, 1)
+
+    def test_flusher_wakes_up_when_buffer_is_full(self):
+        """Test that the flusher writes as soon as enough downloads are waiting."""
+        async def _run():
+            with patch("usage.counters.USAGE_FLUSH_MAX_EVENTS", 2), \
+                    patch("usage.counters.USAGE_FLUSH_INTERVAL_SECONDS", 3600):
+                task = asyncio.create_task(run_usage_flusher(engine))
+                await asyncio.sleep(0)
+                await asyncio.to_thread(record_download, self.file_id)
+                await asyncio.to_thread(record_download, self.file_id)
+                for _ in range(100):
+                    if pending_events() == 0:
+                        break
+                    await asyncio.sleep(0.05)
+                # Cancelling waits for a flush in progress to finish
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        asyncio.run(_run())
+        self.assertEqual(pending_events(), 0)
+        self.assertEqual(self.get_file().download_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import os
+import asyncio
 import shutil
 import unittest
 import tempfile
 from pathlib import Path
+from unittest.mock import patch
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
@@ -10,7 +12,13 @@ from main import app
 from database import Base, get_db
 from models.user import User
 from models.data_room import DataRoom, Folder, File
+from models.upload_session import UploadSession
+from models.blob import Blob
+from models.share_revocation import ShareRevocation
+from models.page_index import PageIndex
 from auth import hash_password, create_access_token
+from storage import collect_released, set_storage
+from storage.local import LocalStorageBackend
 
 
 # Create a temporary file for SQLite test database
@@ -51,6 +59,22 @@ class BaseTestCase(unittest.TestCase):
         # Override the dependency BEFORE creating the client
         app.dependency_overrides[get_db] = override_get_db
 
+        # Keep the contents written by the tests in a directory of their own
+        cls.uploads_dir = tempfile.mkdtemp(prefix="dataroom-uploads-")
+        cls.upload_temp_directory = os.path.join(cls.uploads_dir, ".tmp")
+        cls.upload_sessions_directory = os.path.join(cls.uploads_dir, ".sessions")
+        set_storage(LocalStorageBackend(cls.uploads_dir))
+        cls.upload_patches = [
+            patch(f"{module}.{name}", directory)
+            for module in ("storage.uploads", "storage.gc")
+            for name, directory in (
+                ("UPLOAD_TEMP_DIRECTORY", cls.upload_temp_directory),
+                ("UPLOAD_SESSIONS_DIRECTORY", cls.upload_sessions_directory),
+            )
+        ]
+        for upload_patch in cls.upload_patches:
+            upload_patch.start()
+
         # Create test client
         cls.client = TestClient(app)
 
@@ -60,6 +84,12 @@ class BaseTestCase(unittest.TestCase):
         Base.metadata.drop_all(bind=engine)
         app.dependency_overrides.clear()
         engine.dispose()
+
+        for upload_patch in cls.upload_patches:
+            upload_patch.stop()
+        set_storage(None)
+        shutil.rmtree(cls.uploads_dir, ignore_errors=True)
+
         # Delete the temporary database file
         try:
             os.unlink(test_db_path)
@@ -140,13 +170,21 @@ class BaseTestCase(unittest.TestCase):
     def tearDown(self):
         """Tear down after each test."""
         # Clean up test data
+        self.db.query(UploadSession).delete()
+        self.db.query(ShareRevocation).delete()
         self.db.query(File).delete()
+        self.db.query(PageIndex).delete()
+        self.db.query(Blob).delete()
         self.db.query(Folder).delete()
         self.db.query(DataRoom).delete()
         self.db.query(User).delete()
         self.db.commit()
         self.db.close()
 
+    def collect_garbage(self):
+        """Run the garbage collector on the contents released so far, without grace period."""
+        return asyncio.run(collect_released(engine, grace_period=0, max_deletes_per_second=None))
+
 
 class TestCase(BaseTestCase):
     """Alias for BaseTestCase for easier use."""
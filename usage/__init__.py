@@ -0,0 +1,12 @@
+"""
+Usage Module
+
+Download counts and last access times of files and shares, aggregated in memory
+and written to the database in batches.
+"""
+from .counters import (
+    record_download,
+    pending_events,
+    flush_usage,
+    run_usage_flusher,
+)
@@ -0,0 +1,169 @@
+"""
+Write-behind download counters.
+
+Downloads are the hottest read path, a write transaction on every one of them would cost more than
+the download itself. Instead, every download is recorded in memory, and the increments are written
+in batches: every USAGE_FLUSH_INTERVAL_SECONDS, as soon as USAGE_FLUSH_MAX_EVENTS downloads are waiting,
+and once more when the worker shuts down.
+
+- One UPDATE per table and flush, whatever the number of downloads aggregated
+- Counters are incremented in SQL, so workers flushing concurrently never overwrite each other
+- Increments of a failed flush are kept for the next one
+- Downloads recorded by a worker that is killed before its next flush are lost
+"""
+import asyncio
+import threading
+from datetime import datetime
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import (
+    bindparam,
+    case,
+    update,
+)
+from sqlalchemy.engine import Engine
+
+from logger import logger
+from models import (
+    File as FileModel,
+    FileShare,
+)
+from settings import (
+    USAGE_FLUSH_INTERVAL_SECONDS,
+    USAGE_FLUSH_MAX_EVENTS,
+)
+
+# Id -> [number of downloads, last download] not written yet
+_files: Dict[int, list] = {}
+_shares: Dict[int, list] = {}
+_events = 0
+_lock = threading.Lock()
+
+# Set by the running flusher, woken up early once USAGE_FLUSH_MAX_EVENTS downloads are waiting
+_wakeup: Optional[asyncio.Event] = None
+_wakeup_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _add(counters: Dict[int, list], key: int, count: int, at: datetime) -> None:
+    counter = counters.get(key)
+    if counter is None:
+        counters[key] = [count, at]
+    else:
+        counter[0] += count
+        counter[1] = max(counter[1], at)
+
+
+def record_download(file_id: int, share_id: Optional[int] = None) -> None:
+    """Count a download of a file, through a share if share_id is given. Only touches memory."""
+    global _events
+    now = datetime.utcnow()
+    with _lock:
+        _add(_files, file_id, 1, now)
+        if share_id is not None:
+            _add(_shares, share_id, 1, now)
+        _events += 1
+        full = _events >= USAGE_FLUSH_MAX_EVENTS
+
+    # Read once, the flusher clears both when it stops
+    wakeup, loop = _wakeup, _wakeup_loop
+    if full and wakeup is not None and loop is not None:
+        # Downloads are recorded from the threadpool, the flusher waits on the event loop
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # The loop closed while the worker shut down, the final flush writes the downloads
+            pass
+
+
+def pending_events() -> int:
+    """Number of downloads recorded and not written yet"""
+    return _events
+
+
+def _increments(counters: Dict[int, list]) -> List[dict]:
+    return [{"row_id": key, "count": count, "at": at} for key, (count, at) in counters.items()]
+
+
+def flush_usage(bind: Engine) -> int:
+    """
+    Write the downloads recorded so far to the database, in one transaction.
+
+    Returns the number of downloads written. If the transaction fails, the increments
+    are merged back into the buffer for the next flush and the error is raised.
+    """
+    global _events
+    with _lock:
+        files, shares, events = dict(_files), dict(_shares), _events
+        _files.clear()
+        _shares.clear()
+        _events = 0
+    if not events:
+        return 0
+
+    # updated_at is kept as it is, it is the Last-Modified date of the content and downloads do not modify it
+    update_files = update(FileModel).where(FileModel.id == bindparam("row_id")).values(
+        download_count=FileModel.download_count + bindparam("count"),
+        last_downloaded_at=case(
+            (FileModel.last_downloaded_at.is_(None), bindparam("at")),
+            (FileModel.last_downloaded_at < bindparam("at"), bindparam("at")),
+            else_=FileModel.last_downloaded_at,
+        ),
+        updated_at=FileModel.updated_at,
+    )
+    update_shares = update(FileShare).where(FileShare.id == bindparam("row_id")).values(
+        download_count=FileShare.download_count + bindparam("count"),
+        last_accessed_at=case(
+            (FileShare.last_accessed_at.is_(None), bindparam("at")),
+            (FileShare.last_accessed_at < bindparam("at"), bindparam("at")),
+            else_=FileShare.last_accessed_at,
+        ),
+    )
+    try:
+        with bind.begin() as connection:
+            if files:
+                connection.execute(update_files, _increments(files))
+            if shares:
+                connection.execute(update_shares, _increments(shares))
+    except Exception:
+        with _lock:
+            for file_id, (count, at) in files.items():
+                _add(_files, file_id, count, at)
+            for share_id, (count, at) in shares.items():
+                _add(_shares, share_id, count, at)
+            _events += events
+        raise
+    return events
+
+
+async def run_usage_flusher(bind: Engine) -> None:
+    """
+    Write the recorded downloads every USAGE_FLUSH_INTERVAL_SECONDS, or as soon as
+    USAGE_FLUSH_MAX_EVENTS of them are waiting, until cancelled.
+
+    Runs as a task of the worker's event loop, started and cancelled by the application lifespan,
+    which flushes one last time after cancelling it.
+    """
+    global _wakeup, _wakeup_loop
+    _wakeup = asyncio.Event()
+    _wakeup_loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=USAGE_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            try:
+                await run_in_threadpool(flush_usage, bind)
+            except Exception:
+                logger.exception("Writing download counters failed")
+                # Do not retry on every download while the database is unavailable
+                await asyncio.sleep(USAGE_FLUSH_INTERVAL_SECONDS)
+    finally:
+        _wakeup = None
+        _wakeup_loop = None